@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cinema.profiling.ProfilingMiddleware',     # primero: mide la petición completa
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,7 +56,7 @@ ROOT_URLCONF = 'cine.urls'
 
 TEMPLATES = [
    {
-       'BACKEND': 'django.template.backends.django.DjangoTemplates',
+       'BACKEND': 'cinema.profiling.ProfilingTemplates',   # DjangoTemplates + tiempo de render
        "DIRS": [BASE_DIR / "templates"],      #  ← plantillas globales
        'APP_DIRS': True,
        'OPTIONS': {
@@ -96,6 +97,21 @@ DATABASES = {
 }
 
 }
+# Cache
+# LocMemCache sirve para un solo proceso; con varios workers use un caché
+# compartido, p. ej. FileBasedCache (LOCATION: BASE_DIR / 'cache') o
+# DatabaseCache (tras `manage.py createcachetable`).  Los índices en memoria
+# (búsqueda, facetas) y las tablas de precios se invalidan entre workers con
+# un número de versión guardado aquí: con LocMemCache cada worker sólo ve
+# sus propios cambios.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+CARTELERA_CACHE = 'default'     # alias de CACHES usado por la cartelera de inicio
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -138,8 +154,63 @@ STATIC_ROOT = BASE_DIR / "staticfiles"         #  ← destino collectstatic
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Hilos que generan PDF/QR de boletos al pagar (0 = en la misma petición)
+TICKET_PDF_WORKERS = 2
+# Procesos para la exportación masiva de boletos (0 = sin procesos)
+TICKET_EXPORT_WORKERS = 2
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Máximo de consultas SQL por vista (nombre de URL); se vigila en
+# cinema.profiling y se hace cumplir en las pruebas.  Ver /metrics/.
+# Es el peor caso, la primera visita con el mapa de la función y su tabla de
+# precios aún sin construir; en caliente cuestan menos (QueryBudgetTests.WARM).
+QUERY_BUDGETS = {
+    'home': 4,
+    'peliculas': 3,
+    'estrenos': 3,
+    'snack_list': 4,
+    'POST snack_detail': 6,         # sólo sesión y usuario; el catálogo de snacks en frío
+    'cart': 2,
+    'POST cart': 14,                # orden pendiente, revalidación, totales y líneas en bloque, sesión (fijo)
+    'showtime_detail': 3,
+    'seat_selection': 9,            # en caliente 3; en frío se construyen mapa y precios
+    'POST seat_selection': 24,      # reserva: bloqueo, bulk_create, orden y mapa (fijo en butacas; en caliente 18)
+    'order_confirm': 6,             # orden + líneas de boletos y de snacks
+    'POST order_confirm': 18,       # pago: orden, boletos a PAGADO, libro de puntos y mapa (fijo)
+    'order_success': 5,
+    'orders_list': 5,
+    'ticket_pdf': 7,                # 4 con el PDF ya generado; si falta se genera una vez aquí
+}
+# Con True, una petición que rebasa su presupuesto falla en vez de sólo avisar
+# (cinema.tests lo activa para toda la suite)
+QUERY_BUDGETS_STRICT = False
+INTERNAL_IPS = ['127.0.0.1']
+
+# MySQL ignora los índices parciales (condition=...); en SQLite/PostgreSQL sí se crean
+SILENCED_SYSTEM_CHECKS = ['models.W037']
+
+# Minutos que un asiento queda apartado (RESERVED) antes de liberarse
+SEAT_HOLD_MINUTES = 10
+
+# Pasarela de pago (cinema.checkout): clase y argumentos.  FakeGateway aprueba
+# todo tras `latency` segundos; en producción va la integración real.
+PAYMENT_GATEWAY = 'cinema.checkout.FakeGateway'
+PAYMENT_GATEWAY_OPTIONS = {'latency': 0}
+# Lealtad (cinema.loyalty): un punto por cada N pesos pagados, valor de un
+# punto al pagar con puntos y días antes de que venza cada lote
+LOYALTY_PESOS_PER_POINT = 10
+LOYALTY_POINT_VALUE = '1.00'
+LOYALTY_POINTS_TTL_DAYS = 365
+
+# Canal en vivo del mapa de asientos: 'local' (un solo proceso ASGI) o
+# 'spool' (archivos compartidos por varios workers de la misma máquina)
+SEAT_EVENTS_BROKER = 'local'
+SEAT_EVENTS_SPOOL_DIR = BASE_DIR / 'var' / 'seat_events'
+
+# Minutos de limpieza entre el fin de una función y la siguiente en la misma sala
+SHOWTIME_CLEANING_MINUTES = 15
+
 LOGIN_URL          = 'login'
 LOGIN_REDIRECT_URL = 'home'    # o donde quieras llevar al usuario tras entrar
 LOGOUT_REDIRECT_URL= 'home'   # tras cerrar sesión
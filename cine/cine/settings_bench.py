@@ -0,0 +1,24 @@
+# cine/settings_bench.py
+"""Ajustes para ``manage.py bench_funnel``: la misma app sobre un SQLite desechable.
+
+    python manage.py bench_funnel --settings=cine.settings_bench
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'var' / 'bench.sqlite3',
+        # Compradores simultáneos: esperan el candado de escritura desde el BEGIN
+        # (sin interbloqueos al pasar de lectura a escritura) y leen sin bloquear (WAL)
+        'OPTIONS': {
+            'timeout': 30,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL;',
+        },
+    }
+}
+MEDIA_ROOT = BASE_DIR / 'var' / 'bench-media'
+SEAT_EVENTS_SPOOL_DIR = BASE_DIR / 'var' / 'bench-seat-events'
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -1,10 +1,19 @@
 # cinema/admin.py
 from __future__ import annotations
-from django.contrib import admin
-from django.db.models import Sum
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.timezone import now
 
-from . import models
+from . import importer, models
+from .layout import sync_seats
 
 
 # ────────────────────────────── ACCIONES ──────────────────────────────
@@ -16,6 +25,54 @@ def make_active(modeladmin, request, queryset):
 def make_inactive(modeladmin, request, queryset):
     queryset.update(is_active=False)
 
+@admin.action(description='Regenerar butacas según el layout')
+def regenerate_seats(modeladmin, request, queryset):
+    for aud in queryset:
+        result = sync_seats(aud)
+        modeladmin.message_user(request, f'{aud}: {result}')
+
+
+# ─────────────────────────── IMPORTACIÓN MASIVA ───────────────────────────
+class ImportForm(forms.Form):
+    file    = forms.FileField(label='Archivo', help_text='CSV, JSON Lines (.jsonl) o JSON.')
+    dry_run = forms.BooleanField(label='Sólo validar', required=False)
+    partial = forms.BooleanField(label='Importar las filas válidas aunque haya errores', required=False)
+
+
+class ImportMixin:
+    """Agrega "Importar" a la lista del admin; ver ``cinema.importer``."""
+    import_kind = None
+    change_list_template = 'admin/cinema/change_list_import.html'
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('importar/', self.admin_site.admin_view(self.import_view), name='%s_%s_import' % info),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        form = ImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            text = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            result = importer.import_file(self.import_kind, text, importer.detect_format(upload.name),
+                                          dry_run=form.cleaned_data['dry_run'],
+                                          partial=form.cleaned_data['partial'])
+            if result.committed:
+                self.message_user(request, str(result), messages.SUCCESS)
+                return redirect('admin:%s_%s_changelist' % (self.model._meta.app_label, self.model._meta.model_name))
+        return TemplateResponse(request, 'admin/cinema/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Importar {self.model._meta.verbose_name_plural}',
+            'form': form,
+            'result': result,
+            'errors': result.errors[:200] if result else [],
+        })
+
 
 # ─────────────────────────────── INLINES ───────────────────────────────
 class SeatInline(admin.TabularInline):
@@ -53,17 +110,22 @@ class CinemaAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.Auditorium)
-class AuditoriumAdmin(admin.ModelAdmin):
+class AuditoriumAdmin(ImportMixin, admin.ModelAdmin):
+    import_kind         = 'auditoriums'
     list_display        = ('name', 'cinema', 'total_rows', 'total_cols', 'seat_count')
     list_filter         = ('cinema',)
     search_fields       = ('name',)
     list_select_related = ('cinema',)
     inlines             = (SeatInline,)
+    actions             = (regenerate_seats,)
     ordering            = ('cinema__name', 'name')
 
-    @admin.display(description='Asientos')
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(seat_count=Count('seats'))
+
+    @admin.display(description='Asientos', ordering='seat_count')
     def seat_count(self, obj):
-        return obj.seats.count()
+        return obj.seat_count
 
 
 @admin.register(models.Seat)
@@ -83,13 +145,15 @@ class SeatAdmin(admin.ModelAdmin):
 
 # ──────────────────────────── PELÍCULAS ─────────────────────────────
 @admin.register(models.Genre)
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(ImportMixin, admin.ModelAdmin):
+    import_kind         = 'genres'
     search_fields = ('name',)
     ordering      = ('name',)
 
 
 @admin.register(models.Movie)
-class MovieAdmin(admin.ModelAdmin):
+class MovieAdmin(ImportMixin, admin.ModelAdmin):
+    import_kind         = 'movies'
     list_display        = ('title', 'rating', 'duration_min', 'release_date', 'is_active', 'created')
     list_filter         = ('rating', 'is_active', 'release_date', 'genres')
     search_fields       = ('title', 'original_title')
@@ -102,24 +166,66 @@ class MovieAdmin(admin.ModelAdmin):
 
 # ─────────────────────────── CARTELERA ──────────────────────────────
 @admin.register(models.Showtime)
-class ShowtimeAdmin(admin.ModelAdmin):
-    list_display        = ('movie', 'auditorium', 'start_time', 'language', 'format', 'base_price', 'tickets_sold', 'is_past')
+class ShowtimeAdmin(ImportMixin, admin.ModelAdmin):
+    import_kind         = 'showtimes'
+    list_display        = ('movie', 'auditorium', 'start_time', 'language', 'format', 'base_price',
+                           'tickets_sold', 'occupancy', 'is_past')
     list_filter         = ('language', 'format', 'auditorium__cinema')
     search_fields       = ('movie__title',)
     list_select_related = ('movie', 'auditorium', 'auditorium__cinema')
     date_hierarchy      = 'start_time'
     autocomplete_fields = ('movie', 'auditorium')
     ordering            = ('-start_time',)
-
-    @admin.display(description='Vendidos')
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Vendidos y ocupación anotados: una consulta por página, y se puede ordenar por ellos.
+        # Las butacas van en subconsulta para no multiplicar filas con el JOIN de boletos.
+        seats = (
+            models.Seat.objects
+            .filter(auditorium=OuterRef('auditorium'))
+            .order_by().values('auditorium')
+            .annotate(n=Count('id')).values('n')
+        )
+        return super().get_queryset(request).annotate(
+            tickets_sold=Count('tickets', filter=Q(tickets__status=models.ReservationStatus.PAID)),
+            seat_total=Coalesce(Subquery(seats), 0),
+        ).annotate(
+            occupancy=Case(
+                When(seat_total=0, then=Value(0.0)),
+                default=F('tickets_sold') * 100.0 / F('seat_total'),
+                output_field=FloatField(),
+            ),
+        )
+
+    @admin.display(description='Vendidos', ordering='tickets_sold')
     def tickets_sold(self, obj):
-        return obj.tickets.filter(status=models.ReservationStatus.PAID).count()
+        return obj.tickets_sold
+
+    @admin.display(description='Ocupación', ordering='occupancy')
+    def occupancy(self, obj):
+        return f'{obj.occupancy:.0f}%'
 
     @admin.display(boolean=True, description='En el pasado')
     def is_past(self, obj):
         return obj.start_time < now()
 
 
+@admin.register(models.PricingRule)
+class PricingRuleAdmin(admin.ModelAdmin):
+    list_display        = ('name', 'priority', 'action', 'amount', 'seat_type', 'format', 'weekdays',
+                           'cinema', 'min_occupancy', 'is_active')
+    list_editable       = ('priority', 'is_active')
+    list_filter         = ('is_active', 'action', 'format', 'cinema')
+    search_fields       = ('name', 'seat_type')
+    list_select_related = ('cinema',)
+    fieldsets = (
+        (None, {'fields': ('name', 'priority', 'is_active', 'action', 'amount')}),
+        ('Condiciones', {'fields': ('seat_type', 'format', 'weekdays', 'cinema',
+                                    ('starts_from', 'starts_until'), 'min_occupancy')}),
+    )
+
+
 # ─────────────────────────── CLIENTES ───────────────────────────────
 @admin.register(models.Customer)
 class CustomerAdmin(admin.ModelAdmin):
@@ -127,9 +233,31 @@ class CustomerAdmin(admin.ModelAdmin):
     search_fields       = ('user__username', 'user__first_name', 'user__last_name', 'phone')
     list_filter         = ('created',)
     autocomplete_fields = ('user',)
+    list_select_related = ('user',)
+    readonly_fields     = ('loyalty_pts',)      # sólo cambia con movimientos del libro (cinema.loyalty)
     ordering            = ('-created',)
 
 
+@admin.register(models.LoyaltyEntry)
+class LoyaltyEntryAdmin(admin.ModelAdmin):
+    """El libro de puntos es de sólo lectura: se agregan filas desde ``cinema.loyalty``."""
+    list_display        = ('customer', 'kind', 'points', 'remaining', 'order', 'expires_at', 'created')
+    list_filter         = ('kind',)
+    search_fields       = ('customer__user__username',)
+    list_select_related = ('customer__user', 'order')
+    date_hierarchy      = 'created'
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # ─────────────────────────── BOLETOS ───────────────────────────────
 @admin.register(models.Ticket)
 class TicketAdmin(admin.ModelAdmin):
@@ -137,9 +265,11 @@ class TicketAdmin(admin.ModelAdmin):
     list_filter         = ('status', 'showtime__auditorium__cinema')
     search_fields       = ('customer__user__username', 'showtime__movie__title')
     autocomplete_fields = ('showtime', 'seat', 'customer')
-    list_select_related = ('showtime', 'seat', 'customer')
+    list_select_related = ('showtime__movie', 'showtime__auditorium__cinema',
+                           'seat__auditorium__cinema', 'customer__user')
     date_hierarchy      = 'created'
     ordering            = ('-created',)
+    show_full_result_count = False
 
 
 # ─────────────────────── SNACKS & CATEGORÍAS ───────────────────────
@@ -163,17 +293,25 @@ class SnackItemAdmin(admin.ModelAdmin):
 # ───────────────────────────── ÓRDENES ─────────────────────────────
 @admin.register(models.Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display        = ('id', 'customer', 'total_amount', 'payment_method', 'status', 'paid_at', 'created')
+    list_display        = ('id', 'customer', 'total_amount', 'snack_units_display', 'payment_method', 'status', 'paid_at', 'created')
     list_filter         = ('status', 'payment_method', 'created')
     search_fields       = ('id', 'customer__user__username')
     autocomplete_fields = ('customer',)
+    list_select_related = ('customer__user',)
     inlines             = (OrderTicketInline, OrderSnackInline)
     date_hierarchy      = 'created'
     ordering            = ('-created',)
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            snack_units=Coalesce(Sum('order_snacks__qty'), 0),
+        )
 
-    @admin.display(description='Snacks totales')
-    def snack_total(self, obj):
-        return obj.order_snacks.aggregate(total=Sum('qty'))['total'] or 0
+    # No puede llamarse ``snack_total``: el admin resolvería el campo Order.snack_total (dinero)
+    @admin.display(description='Snacks totales', ordering='snack_units')
+    def snack_units_display(self, obj):
+        return obj.snack_units
 
 
 # ───────────────────── CONFIGURACIÓN GLOBAL ────────────────────────
@@ -0,0 +1,150 @@
+# cinema/bench.py
+"""Banco de carga en proceso para comparar WSGI contra ASGI.
+
+Llama directamente a ``cine.wsgi.application`` (un hilo por petición
+concurrente, como un servidor con hilos) y a ``cine.asgi.application`` (un
+solo loop con N corrutinas), sin red de por medio, y reporta peticiones por
+segundo y latencias p50/p99.  Lo usa ``manage.py bench_catalog``.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import cycle, islice
+from typing import Sequence
+
+CATALOG_PATHS = ('/peliculas/', '/estrenos/', '/snacks/')
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+@dataclass
+class BenchResult:
+    name: str
+    latencies: list[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rps(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f'{self.name}: {len(self.latencies)} peticiones, {self.rps:.0f} req/s, '
+                f'p50 {percentile(self.latencies, 50) * 1000:.1f} ms, '
+                f'p99 {percentile(self.latencies, 99) * 1000:.1f} ms, {self.errors} errores')
+
+
+def _split(path: str) -> tuple[str, str]:
+    path, _, query = path.partition('?')
+    return path, query
+
+
+# ──────────────────────────────── WSGI ────────────────────────────────
+def wsgi_get(app, path: str) -> int:
+    path, query = _split(path)
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '127.0.0.1', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    status = []
+    body = app(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(status[0].split()[0])
+
+
+def run_wsgi(paths: Sequence[str], requests: int, concurrency: int) -> BenchResult:
+    from cine.wsgi import application
+    result = BenchResult('WSGI')
+
+    def one(path):
+        started = time.perf_counter()
+        ok = wsgi_get(application, path) < 400
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for ok, latency in pool.map(one, islice(cycle(paths), requests)):
+            result.latencies.append(latency)
+            result.errors += not ok
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+# ──────────────────────────────── ASGI ────────────────────────────────
+async def asgi_get(app, path: str) -> int:
+    path, query = _split(path)
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+        'query_string': query.encode(), 'headers': [(b'host', b'localhost')],
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+    }
+    status = []
+    done = asyncio.Event()
+    sent_body = False
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await done.wait()       # Django escucha aquí la desconexión del cliente
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif not message.get('more_body'):
+            done.set()
+
+    await app(scope, receive, send)
+    await done.wait()
+    return status[0]
+
+
+async def _run_asgi(paths: Sequence[str], requests: int, concurrency: int) -> BenchResult:
+    from cine.asgi import application
+    result = BenchResult('ASGI')
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(path):
+        async with gate:
+            started = time.perf_counter()
+            ok = await asgi_get(application, path) < 400
+            result.latencies.append(time.perf_counter() - started)
+            result.errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(path) for path in islice(cycle(paths), requests)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def run_asgi(paths: Sequence[str], requests: int, concurrency: int) -> BenchResult:
+    return asyncio.run(_run_asgi(paths, requests, concurrency))
+
+
+def compare(paths: Sequence[str] = CATALOG_PATHS, requests: int = 500,
+            concurrency: int = 32) -> list[BenchResult]:
+    """Misma carga contra ambos stacks; se hace una vuelta de calentamiento antes."""
+    run_wsgi(paths, len(paths), 1)
+    run_asgi(paths, len(paths), 1)
+    return [run_wsgi(paths, requests, concurrency), run_asgi(paths, requests, concurrency)]
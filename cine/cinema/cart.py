@@ -0,0 +1,210 @@
+# cinema/cart.py
+"""Carrito de snacks guardado en la sesión.
+
+Agregar un snack no toca la base: la línea ``{snack_id: cantidad}`` vive en
+la sesión y el nombre, precio y disponibilidad salen del catálogo en caché
+(:func:`catalog`, una consulta cuando cambia algún ``SnackItem``).  Las líneas
+se escriben sólo al pagar (:func:`checkout`): una consulta revalida precios y
+disponibilidad contra la base y las líneas se suman a la orden de boletos
+pendiente del cliente (o, si no tiene, a una orden nueva de sólo snacks) con
+sus totales ya calculados.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Customer, Order, OrderSnack, SnackItem
+
+VERSION_KEY = 'cart:catalog:version'
+SESSION_KEY = 'cart'
+MAX_QTY = 20        # por línea
+
+
+class CartError(Exception):
+    """El carrito no se puede pagar (vacío o con snacks que ya no están disponibles)."""
+
+
+@dataclass(frozen=True)
+class SnackInfo:
+    name: str
+    price: Decimal
+
+
+@dataclass(frozen=True)
+class CartLine:
+    snack_id: int
+    name: str
+    qty: int
+    price: Decimal
+    available: bool = True
+
+    @property
+    def line_total(self) -> Decimal:
+        return self.qty * self.price
+
+
+# ─────────────────────────────── CATÁLOGO ───────────────────────────────
+def _version() -> int:
+    return cache.get_or_set(VERSION_KEY, time.time_ns, timeout=None)
+
+
+def invalidate() -> None:
+    """Descarta el catálogo; las señales lo llaman tras cada commit."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def catalog() -> dict[int, SnackInfo]:
+    """Snacks disponibles ``id → SnackInfo``, del caché o en una consulta."""
+    key = f'cart:catalog:{_version()}'
+    snacks = cache.get(key)
+    if snacks is None:
+        snacks = {
+            pk: SnackInfo(name, price)
+            for pk, name, price in (
+                SnackItem.objects.filter(is_available=True).order_by().values_list('id', 'name', 'price')
+            )
+        }
+        cache.set(key, snacks, timeout=None)
+    return snacks
+
+
+# ─────────────────────────────── CARRITO ───────────────────────────────
+class Cart:
+    """Líneas ``{snack_id: cantidad}`` en ``session[SESSION_KEY]``."""
+
+    def __init__(self, session):
+        self.session = session
+        self.lines: dict[str, int] = session.get(SESSION_KEY, {})
+
+    def __len__(self):
+        return sum(self.lines.values())
+
+    def _save(self):
+        self.session[SESSION_KEY] = self.lines
+        self.session.modified = True
+
+    def add(self, snack_id: int, qty: int = 1) -> int:
+        """Suma ``qty`` (hasta ``MAX_QTY``) y devuelve la cantidad de la línea."""
+        key = str(snack_id)
+        self.lines[key] = max(1, min(self.lines.get(key, 0) + qty, MAX_QTY))
+        self._save()
+        return self.lines[key]
+
+    def set(self, snack_id: int, qty: int) -> None:
+        if qty <= 0:
+            self.lines.pop(str(snack_id), None)
+        else:
+            self.lines[str(snack_id)] = min(qty, MAX_QTY)
+        self._save()
+
+    def clear(self) -> None:
+        self.lines = {}
+        self.session.pop(SESSION_KEY, None)
+
+    def items(self) -> list[CartLine]:
+        """Líneas con nombre y precio del catálogo; las que ya no están disponibles se marcan."""
+        snacks = catalog()
+        lines = []
+        for key, qty in self.lines.items():
+            info = snacks.get(int(key))
+            if info is None:
+                lines.append(CartLine(int(key), '', qty, Decimal('0'), available=False))
+            else:
+                lines.append(CartLine(int(key), info.name, qty, info.price))
+        return sorted(lines, key=lambda line: (not line.available, line.name))
+
+    def total(self) -> Decimal:
+        return sum((line.line_total for line in self.items() if line.available), Decimal('0'))
+
+
+def pending_ticket_order(customer: Customer) -> Order | None:
+    """La orden PENDIENTE más reciente del cliente que ya trae boletos, si la hay."""
+    return (
+        Order.objects
+        .filter(customer=customer, status=Order.Status.PENDING, order_tickets__isnull=False)
+        .order_by('-created', '-id')
+        .first()
+    )
+
+
+def _attach(order: Order, wanted: dict[int, int], current: dict[int, Decimal]) -> bool:
+    """Suma las líneas a ``order`` si sigue PENDIENTE; ``False`` si ya no lo está.
+
+    Las líneas que ya tenía conservan su precio y sólo suben de cantidad.  Los
+    totales se ajustan con ``F()`` en el mismo UPDATE condicional que valida el
+    estado, sin volver a leer los boletos.  Si el pago de la orden ya está en
+    vuelo, :func:`cinema.checkout.settle` ve el total cambiado,
+    reembolsa el cobro y la deja PENDIENTE para cobrarla de nuevo con los snacks.
+    """
+    existing = {
+        snack_id: (pk, qty, price) for pk, snack_id, qty, price in (
+            OrderSnack.objects.filter(order=order, snack_id__in=wanted).order_by()
+            .values_list('id', 'snack_id', 'qty', 'price')
+        )
+    }
+    prices = {**current, **{snack_id: price for snack_id, (_, _, price) in existing.items()}}
+    added = sum((prices[pk] * qty for pk, qty in wanted.items()), Decimal('0'))
+    if not Order.objects.filter(pk=order.pk, status=Order.Status.PENDING).update(
+        snack_total=F('snack_total') + added,
+        total_amount=F('total_amount') + added,
+        item_count=F('item_count') + sum(wanted.values()),
+        updated=timezone.now(),
+    ):
+        return False
+    OrderSnack.objects.bulk_update(
+        [OrderSnack(pk=pk, qty=qty + wanted[snack_id]) for snack_id, (pk, qty, _) in existing.items()], ['qty'],
+    )
+    OrderSnack.objects.bulk_create([
+        OrderSnack(order=order, snack_id=pk, qty=qty, price=current[pk])
+        for pk, qty in wanted.items() if pk not in existing
+    ])
+    return True
+
+
+def checkout(cart: Cart, customer: Customer, order: Order | None = None) -> Order:
+    """Pasa las líneas del carrito a una orden PENDIENTE y lo vacía.
+
+    Con ``order`` (la orden de boletos que el cliente está por pagar, ver
+    :func:`pending_ticket_order`) los snacks se suman a ella, como antes del
+    carrito; así los reportes los atribuyen a su función.  Sin ella, o si ya
+    no está pendiente, se crea una orden sólo de snacks.
+
+    Precio y disponibilidad se releen de la base en una sola consulta: manda
+    la base, no el caché.  Lanza :class:`CartError` sin crear nada si el
+    carrito está vacío o algún snack ya no se vende (y lo quita del carrito).
+    """
+    if not cart.lines:
+        raise CartError('Tu carrito está vacío.')
+    wanted = {int(key): qty for key, qty in cart.lines.items()}
+    current = dict(SnackItem.objects.filter(pk__in=wanted, is_available=True).order_by().values_list('id', 'price'))
+    gone = wanted.keys() - current.keys()
+    if gone:
+        for snack_id in gone:
+            cart.set(snack_id, 0)
+        raise CartError('Algunos snacks ya no están disponibles; los quitamos de tu carrito.')
+
+    with transaction.atomic():
+        if order is None or not _attach(order, wanted, current):
+            snack_total = sum((current[pk] * qty for pk, qty in wanted.items()), Decimal('0'))
+            order = Order.objects.create(
+                customer=customer,
+                total_amount=snack_total,
+                snack_total=snack_total,
+                item_count=sum(wanted.values()),
+                status=Order.Status.PENDING,
+            )
+            OrderSnack.objects.bulk_create([
+                OrderSnack(order=order, snack_id=pk, qty=qty, price=current[pk]) for pk, qty in wanted.items()
+            ])
+    cart.clear()
+    return order
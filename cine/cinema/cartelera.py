@@ -0,0 +1,82 @@
+# cinema/cartelera.py
+"""Caché de la cartelera que muestra ``HomeView``.
+
+El contenido se guarda en el caché de Django indicado por
+``settings.CARTELERA_CACHE`` (alias de ``CACHES``): ``LocMemCache`` para un
+solo proceso o ``FileBasedCache``/``DatabaseCache`` para compartirlo entre
+workers.  Las señales de ``Showtime``, ``Movie``, ``Cinema``, ``Auditorium``
+y ``SnackItem`` incrementan un número de versión, y cada entrada caduca sola
+cuando empieza la primera función que lista, así la cartelera avanza sin
+consultar la base en cada visita.
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import Showtime, SnackItem
+
+VERSION_KEY = 'cartelera:version'
+MAX_AGE = timedelta(minutes=15)     # tope por si algo cambia sin pasar por señales
+SHOWTIMES_LIMIT = 30
+SNACKS_LIMIT = 6
+
+
+def _cache():
+    return caches[getattr(settings, 'CARTELERA_CACHE', 'default')]
+
+
+def _version(cache) -> int:
+    # Si la versión se pierde (desalojo, reinicio) arrancamos en un valor nuevo
+    # para no revivir entradas viejas.
+    return cache.get_or_set(VERSION_KEY, time.time_ns, timeout=None)
+
+
+def invalidate() -> None:
+    """Descarta la cartelera vigente; las señales lo llaman tras cada commit."""
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def build(now: datetime) -> dict:
+    showtimes = list(
+        Showtime.objects
+        .select_related("movie", "auditorium", "auditorium__cinema")
+        .filter(
+            movie__is_active=True,
+            auditorium__cinema__is_active=True,
+            start_time__gte=now,
+        )
+        .order_by("start_time")[:SHOWTIMES_LIMIT]
+    )
+    snacks = list(
+        SnackItem.objects
+        .select_related("category")
+        .filter(is_available=True)
+        .order_by("-updated")[:SNACKS_LIMIT]
+    )
+    # En cuanto empiece la primera función, la lista deja de ser válida
+    valid_until = now + MAX_AGE
+    if showtimes:
+        valid_until = min(valid_until, showtimes[0].start_time)
+    return {'showtimes': showtimes, 'snacks': snacks, 'valid_until': valid_until}
+
+
+def get_cartelera(now: datetime | None = None) -> dict:
+    """Próximas funciones y snacks destacados; consulta la base sólo si algo cambió."""
+    now = now or timezone.now()
+    cache = _cache()
+    key = f'cartelera:{_version(cache)}'
+    data = cache.get(key)
+    if data is None or data['valid_until'] <= now:
+        data = build(now)
+        timeout = max(1, int((data['valid_until'] - now).total_seconds()))
+        cache.set(key, data, timeout=timeout)
+    return data
@@ -0,0 +1,208 @@
+# cinema/checkout.py
+"""Liquidación de órdenes: cobro en la pasarela y asentado de boletos en bloque.
+
+:func:`settle` divide el pago en tres fases para no tener candados de la
+base abiertos mientras se espera a la pasarela (lenta y externa):
+
+1. **Revisión** sin bloqueos: la orden es del cliente, sigue pendiente y sus
+   apartados no han caducado; se toman los ids de sus boletos.
+2. **Cobro** en la pasarela (``settings.PAYMENT_GATEWAY``), fuera de toda
+   transacción.
+3. **Asentado** en una transacción con un número fijo de consultas: se
+   bloquean sus boletos, un ``UPDATE`` condicional pasa la orden a PAGADA
+   (sólo si sigue pendiente y con el total cobrado) y se comprueba que nada cambió durante el cobro
+   (el barrido de ``cinema.holds`` pudo liberar un apartado); luego un
+   ``UPDATE`` pasa los boletos a PAGADO y se abonan los puntos del cliente
+   (``cinema.loyalty``).  El mapa de asientos marca las butacas como vendidas.
+
+Pagar con puntos (``PaymentMethod.POINTS``) no pasa por la pasarela: el
+canje es parte de la misma transacción y, si no alcanzan, nada cambia.
+
+Si el asentado falla tras un cobro aprobado, el cobro se reembolsa.  Las
+pasarelas implementan :class:`PaymentGateway` (métodos ``async``);
+:class:`FakeGateway` es la local para desarrollo y pruebas.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Protocol
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import loyalty, reporting, seatmap, ticket_pdf
+from .models import Customer, Order, PaymentMethod, ReservationStatus, SeatState, Ticket
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutError(Exception):
+    """La orden ya no se puede pagar (no está pendiente, caducó o cambiaron sus boletos)."""
+
+
+class InvalidPaymentMethod(CheckoutError):
+    pass
+
+
+class PaymentDeclined(Exception):
+    """La pasarela rechazó el cobro."""
+
+
+# ─────────────────────────────── PASARELAS ───────────────────────────────
+@dataclass(frozen=True)
+class Charge:
+    reference: str
+    amount: Decimal
+    method: str
+
+
+class PaymentGateway(Protocol):
+    async def charge(self, order_id: int, amount: Decimal, method: str) -> Charge:
+        """Cobra ``amount``; lanza :class:`PaymentDeclined` si no se aprueba."""
+
+    async def refund(self, charge: Charge) -> None:
+        ...
+
+
+class FakeGateway:
+    """Pasarela local: tarda ``latency`` segundos y aprueba todo salvo los métodos en ``decline``."""
+
+    def __init__(self, latency: float = 0.0, decline: tuple[str, ...] = ()):
+        self.latency = latency
+        self.decline = set(decline)
+        self.charges: list[Charge] = []
+        self.refunds: list[Charge] = []
+
+    async def charge(self, order_id: int, amount: Decimal, method: str) -> Charge:
+        await asyncio.sleep(self.latency)
+        if method in self.decline:
+            raise PaymentDeclined(f'Pago rechazado ({method}).')
+        charge = Charge(f'fake-{order_id}-{uuid.uuid4().hex[:12]}', amount, method)
+        self.charges.append(charge)
+        return charge
+
+    async def refund(self, charge: Charge) -> None:
+        await asyncio.sleep(self.latency)
+        self.refunds.append(charge)
+
+
+_gateway = None
+
+
+def get_gateway() -> PaymentGateway:
+    global _gateway
+    if _gateway is None:
+        path = getattr(settings, 'PAYMENT_GATEWAY', 'cinema.checkout.FakeGateway')
+        _gateway = import_string(path)(**getattr(settings, 'PAYMENT_GATEWAY_OPTIONS', {}))
+    return _gateway
+
+
+# ─────────────────────────────── LIQUIDACIÓN ───────────────────────────────
+@dataclass
+class _Review:
+    order: Order
+    ticket_ids: set[int] = field(default_factory=set)
+
+
+def _review(order_id: int, customer: Customer, now) -> _Review:
+    order = Order.objects.get(pk=order_id, customer=customer)     # Order.DoesNotExist → 404 en la vista
+    if order.status != Order.Status.PENDING:
+        raise CheckoutError(f'La orden #{order.pk} ya no está pendiente.')
+    review = _Review(order)
+    for ticket_id, status, expires in (
+        Ticket.objects.filter(orderticket__order_id=order_id).values_list('id', 'status', 'hold_expires_at')
+    ):
+        if status != ReservationStatus.RESERVED or (expires is not None and expires <= now):
+            raise CheckoutError(f'La orden #{order.pk} expiró.')
+        review.ticket_ids.add(ticket_id)
+    return review
+
+
+def _commit(review: _Review, charge: Charge, now) -> Order:
+    """Fase 3; lanza :class:`CheckoutError` si la orden cambió durante el cobro."""
+    order, order_id = review.order, review.order.pk
+    with transaction.atomic():
+        # Primero los boletos y luego la orden: el mismo orden de bloqueo que el
+        # barrido de cinema.holds, para no interbloquearse con él
+        tickets = list(
+            Ticket.objects
+            .select_for_update()
+            .filter(orderticket__order_id=order_id, status=ReservationStatus.RESERVED,
+                    customer_id=order.customer_id)
+            .exclude(hold_expires_at__lte=now)
+            .order_by('id')
+            .values_list('id', 'showtime_id', 'seat__row', 'seat__col')
+        )
+        # UPDATE condicional: gana sólo un pago aunque lleguen dos a la vez, y sólo
+        # si la orden sigue sumando lo cobrado (el carrito pudo agregarle snacks)
+        paid = Order.objects.filter(
+            pk=order_id, status=Order.Status.PENDING, total_amount=charge.amount,
+        ).update(
+            status=Order.Status.PAID, payment_method=charge.method, payment_ref=charge.reference,
+            paid_at=now, updated=now,
+        )
+        if not paid:
+            if Order.objects.filter(pk=order_id, status=Order.Status.PENDING).exists():
+                raise CheckoutError(f'La orden #{order_id} cambió durante el pago; revisa el total.')
+            raise CheckoutError(f'La orden #{order_id} ya no está pendiente.')
+        # Los apartados siguen siendo de esta orden y de este cliente, y no han caducado
+        if {ticket_id for ticket_id, *_ in tickets} != review.ticket_ids:
+            raise CheckoutError(f'La orden #{order_id} expiró.')
+        if charge.method == PaymentMethod.POINTS:
+            try:
+                loyalty.redeem(order.customer_id, loyalty.points_needed(charge.amount), order)
+            except loyalty.InsufficientPoints as exc:
+                raise PaymentDeclined(str(exc)) from exc
+        if tickets:
+            Ticket.objects.filter(id__in=review.ticket_ids).update(
+                status=ReservationStatus.PAID, hold_expires_at=None, updated=now,
+            )
+        if charge.method != PaymentMethod.POINTS and order.customer_id:
+            loyalty.earn(order.customer_id, loyalty.points_earned(charge.amount), order, now)
+
+        changes = defaultdict(list)
+        for _, showtime_id, row, col in tickets:
+            changes[showtime_id].append((row, col, SeatState.SOLD))
+        for showtime_id, cells in changes.items():
+            seatmap.apply(showtime_id, cells)
+
+        reporting.record_paid(order)
+        # PDF y QR se generan una sola vez, fuera de la petición
+        ticket_pdf.schedule_order_assets(order)
+
+    order.status, order.payment_method, order.payment_ref = Order.Status.PAID, charge.method, charge.reference
+    order.paid_at = order.updated = now
+    return order
+
+
+def settle(order_id: int, customer: Customer, method: str,
+           gateway: PaymentGateway | None = None) -> Order:
+    """Cobra y asienta la orden pendiente ``order_id`` de ``customer``; devuelve la orden pagada.
+
+    Lanza ``Order.DoesNotExist``, :class:`InvalidPaymentMethod`,
+    :class:`CheckoutError` o :class:`PaymentDeclined`; en los dos últimos no
+    queda nada cobrado.
+    """
+    if method not in PaymentMethod.values:
+        raise InvalidPaymentMethod(f'Forma de pago inválida: {method!r}.')
+    review = _review(order_id, customer, timezone.now())
+    if method == PaymentMethod.POINTS:
+        # Con puntos no hay pasarela: el canje va dentro de la transacción del asentado
+        return _commit(review, Charge(f'puntos-{order_id}', review.order.total_amount, method), timezone.now())
+
+    gateway = gateway or get_gateway()
+    charge = async_to_sync(gateway.charge)(order_id, review.order.total_amount, method)
+    try:
+        return _commit(review, charge, timezone.now())
+    except Exception:
+        logger.warning('Orden %s: se reembolsa el cobro %s', order_id, charge.reference)
+        async_to_sync(gateway.refund)(charge)
+        raise
@@ -0,0 +1,252 @@
+# cinema/facets.py
+"""Filtros y conteos por faceta de la cartelera (índice de bitsets en memoria).
+
+Cada función próxima ocupa una posición; por cada valor de cada faceta
+(ciudad, cine, fecha, idioma, formato, género) se guarda un entero de Python
+usado como bitset con las posiciones que lo tienen.  Filtrar es hacer AND
+entre facetas y OR dentro de una faceta, y cada conteo es un
+``(bits & máscara).bit_count()``: nada de ``COUNT`` por faceta en la base.
+
+Las posiciones se asignan en orden de ``start_time`` al construir; las
+funciones que llegan después por señales van a una cola ordenada aparte
+(``tail``) y se mezclan al paginar.  Cuando la cola crece, o cuando otro
+proceso cambia la cartelera (versión en el caché, que por eso debe ser
+compartido entre workers), el índice se reconstruye.  Las consultas toman el
+mismo candado que :func:`refresh`, que modifica el índice en sitio.
+"""
+from __future__ import annotations
+
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, Iterator, Mapping
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Movie, Showtime
+
+VERSION_KEY = 'facets:version'
+FACETS = ('city', 'cinema', 'date', 'language', 'format', 'genre')
+MAX_TAIL = 1000
+
+
+def _showtime_rows(now: datetime, showtime_ids: Iterable[int] | None = None) -> list[dict]:
+    """Funciones próximas con los datos de sus facetas, en dos consultas."""
+    queryset = Showtime.objects.filter(
+        start_time__gte=now, movie__is_active=True, auditorium__cinema__is_active=True,
+    )
+    if showtime_ids is not None:
+        queryset = queryset.filter(id__in=list(showtime_ids))
+    rows = list(
+        queryset
+        .order_by('start_time', 'id')
+        .values('id', 'start_time', 'language', 'format', 'base_price', 'movie_id',
+                'movie__title', 'auditorium__name', 'auditorium__cinema_id',
+                'auditorium__cinema__name', 'auditorium__cinema__city')
+    )
+    genres = defaultdict(list)
+    links = Movie.genres.through.objects.filter(
+        movie_id__in={row['movie_id'] for row in rows},
+    )
+    for movie_id, genre_id, name in links.values_list('movie_id', 'genre_id', 'genre__name'):
+        genres[movie_id].append((genre_id, name))
+    for row in rows:
+        row['genres'] = genres[row['movie_id']]
+    return rows
+
+
+def _facet_values(row: dict) -> Iterator[tuple[str, str, str]]:
+    """``(faceta, valor, etiqueta)`` de una función; los valores son strings como en el query string."""
+    local = timezone.localtime(row['start_time'])
+    yield 'city', row['auditorium__cinema__city'], row['auditorium__cinema__city']
+    yield 'cinema', str(row['auditorium__cinema_id']), row['auditorium__cinema__name']
+    yield 'date', local.date().isoformat(), f'{local:%d/%m}'
+    yield 'language', row['language'], row['language']
+    yield 'format', row['format'], row['format']
+    for genre_id, name in row['genres']:
+        yield 'genre', str(genre_id), name
+
+
+def _result(row: dict) -> dict:
+    return {
+        'id': row['id'],
+        'movie': row['movie__title'],
+        'cinema': row['auditorium__cinema__name'],
+        'city': row['auditorium__cinema__city'],
+        'auditorium': row['auditorium__name'],
+        'start_time': row['start_time'].isoformat(),
+        'language': row['language'],
+        'format': row['format'],
+        'base_price': str(row['base_price']),
+    }
+
+
+class FacetIndex:
+    def __init__(self):
+        self.bits: dict[str, dict[str, int]] = {facet: defaultdict(int) for facet in FACETS}
+        self.labels: dict[tuple[str, str], str] = {}
+        self.rows: list[dict | None] = []           # posición → fila (None = borrada)
+        self.position: dict[int, int] = {}          # showtime_id → posición
+        self.starts: list[datetime] = []            # inicio por posición de la parte ordenada
+        self.tail: list[tuple[datetime, int]] = []  # (inicio, posición) de las agregadas después
+        self.alive = 0
+        self.version = None
+
+    # ── escritura ──
+    def _put(self, row: dict) -> int:
+        pos = len(self.rows)
+        self.rows.append(row)
+        self.position[row['id']] = pos
+        bit = 1 << pos
+        self.alive |= bit
+        for facet, value, label in _facet_values(row):
+            self.bits[facet][value] |= bit
+            self.labels[facet, value] = label
+        return pos
+
+    def load(self, rows: Iterable[dict]) -> None:
+        """Carga inicial; ``rows`` debe venir ordenado por ``start_time``."""
+        for row in rows:
+            self._put(row)
+            self.starts.append(row['start_time'])
+
+    def remove(self, showtime_id: int) -> None:
+        pos = self.position.pop(showtime_id, None)
+        if pos is None:
+            return
+        row, bit = self.rows[pos], 1 << pos
+        self.rows[pos] = None
+        self.alive &= ~bit
+        for facet, value, _ in _facet_values(row):
+            self.bits[facet][value] &= ~bit
+        if pos >= len(self.starts):
+            self.tail.remove((row['start_time'], pos))
+
+    def add(self, row: dict) -> None:
+        self.remove(row['id'])
+        insort(self.tail, (row['start_time'], self._put(row)))
+
+    # ── lectura ──
+    def _mask(self, filters: Mapping[str, Iterable[str]], skip: str | None = None) -> int:
+        mask = self.alive
+        for facet, values in filters.items():
+            if facet == skip or not values:
+                continue
+            selected = 0
+            for value in values:
+                selected |= self.bits[facet].get(value, 0)
+            mask &= selected
+        return mask
+
+    def _positions(self, mask: int) -> Iterator[int]:
+        """Posiciones de ``mask`` en orden de inicio."""
+        def ordered():
+            bits = mask & ((1 << len(self.starts)) - 1)
+            while bits:
+                low = bits & -bits
+                pos = low.bit_length() - 1
+                yield self.starts[pos], pos
+                bits ^= low
+
+        late = ((start, pos) for start, pos in self.tail if mask >> pos & 1)
+        for _, pos in heapq.merge(ordered(), late):
+            yield pos
+
+    def _live(self, now: datetime) -> int:
+        """Posiciones vivas que aún no empiezan."""
+        started = (1 << bisect_left(self.starts, now)) - 1
+        for start, pos in self.tail:
+            if start < now:
+                started |= 1 << pos
+        return self.alive & ~started
+
+    def query(self, filters: Mapping[str, Iterable[str]], now: datetime,
+              limit: int = 50, offset: int = 0) -> dict:
+        filters = {facet: [v for v in values if v] for facet, values in filters.items() if facet in FACETS}
+        live = self._live(now)
+        mask = self._mask(filters) & live
+        page = [_result(self.rows[pos]) for pos in islice(self._positions(mask), offset, offset + limit)]
+
+        facets = {}
+        for facet in FACETS:
+            # Conteo "disyuntivo": se ignora el filtro de la propia faceta
+            others = self._mask(filters, skip=facet) & live
+            counts = [
+                {'value': value, 'label': self.labels[facet, value], 'count': (bits & others).bit_count(),
+                 'selected': value in filters.get(facet, ())}
+                for value, bits in self.bits[facet].items()
+            ]
+            facets[facet] = sorted((c for c in counts if c['count'] or c['selected']),
+                                   key=lambda c: (-c['count'], c['label']))
+        return {'count': mask.bit_count(), 'results': page, 'facets': facets}
+
+
+# ─────────────────────────────── CARGA ───────────────────────────────
+def build(now: datetime | None = None) -> FacetIndex:
+    index = FacetIndex()
+    index.version = cache.get_or_set(VERSION_KEY, time.time_ns, timeout=None)
+    index.load(_showtime_rows(now or timezone.now()))
+    return index
+
+
+_index: FacetIndex | None = None
+_lock = threading.Lock()
+
+
+def get_index() -> FacetIndex:
+    global _index
+    version = cache.get(VERSION_KEY)
+    stale = lambda: (_index is None or len(_index.tail) > MAX_TAIL
+                     or (version is not None and version != _index.version))
+    if stale():
+        with _lock:
+            if stale():
+                _index = build()
+    return _index
+
+
+def browse(filters: Mapping[str, Iterable[str]], limit: int = 50, offset: int = 0,
+           now: datetime | None = None) -> dict:
+    index = get_index()
+    with _lock:
+        return index.query(filters, now or timezone.now(), limit, offset)
+
+
+def _bump() -> int | None:
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+        return None
+
+
+def invalidate() -> None:
+    """Reconstrucción completa en todos los procesos (cambió una película, cine, sala…)."""
+    global _index
+    with _lock:
+        _bump()
+        _index = None
+
+
+def refresh(showtime_ids: Iterable[int]) -> None:
+    """Actualiza funciones concretas en el índice local y avisa a los demás procesos."""
+    global _index
+    showtime_ids = set(showtime_ids)
+    with _lock:
+        version = _bump()
+        if _index is None:
+            return
+        if version is None or version != _index.version + 1:
+            _index = None
+            return
+        for row in _showtime_rows(timezone.now(), showtime_ids):
+            _index.add(row)
+            showtime_ids.discard(row['id'])
+        for showtime_id in showtime_ids:        # borradas, ya empezadas o inactivas
+            _index.remove(showtime_id)
+        _index.version = version
@@ -0,0 +1,106 @@
+# cinema/holds.py
+"""Apartados con caducidad para boletos RESERVED.
+
+Cada boleto apartado guarda ``hold_expires_at``; el barrido
+(:func:`release_expired_holds`, expuesto como ``manage.py release_holds``)
+libera en lotes los apartados vencidos y cancela sus órdenes pendientes.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import seatmap
+from .models import Order, OrderTicket, ReservationStatus, SeatState, Ticket
+from .totals import refresh_order_totals
+
+logger = logging.getLogger(__name__)
+
+
+def hold_ttl() -> timedelta:
+    return timedelta(minutes=getattr(settings, 'SEAT_HOLD_MINUTES', 10))
+
+
+def hold_deadline(now: datetime | None = None) -> datetime:
+    """Momento en que caduca un apartado hecho ahora."""
+    return (now or timezone.now()) + hold_ttl()
+
+
+def order_hold_expired(order: Order, now: datetime | None = None) -> bool:
+    """¿Alguno de los boletos de la orden ya superó su apartado?"""
+    return Ticket.objects.filter(
+        orderticket__order=order,
+        status=ReservationStatus.RESERVED,
+        hold_expires_at__lte=now or timezone.now(),
+    ).exists()
+
+
+@dataclass
+class SweepResult:
+    """Métricas de un barrido."""
+    released_seats: int = 0
+    canceled_orders: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+    def __str__(self):
+        return (f'{self.released_seats} asientos liberados, {self.canceled_orders} órdenes '
+                f'canceladas en {self.batches} lotes ({self.elapsed * 1000:.0f} ms)')
+
+
+def release_expired_holds(now: datetime | None = None, batch_size: int = 500) -> SweepResult:
+    """Libera los apartados vencidos en lotes de ``batch_size`` boletos."""
+    now = now or timezone.now()
+    result = SweepResult()
+    started = time.perf_counter()
+
+    while True:
+        with transaction.atomic():
+            # Los boletos que otra transacción tiene bloqueados (p. ej. un pago) se saltan
+            batch = list(
+                Ticket.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=ReservationStatus.RESERVED, hold_expires_at__lte=now)
+                .order_by('hold_expires_at', 'id')
+                .values_list('id', 'showtime_id', 'seat__row', 'seat__col')[:batch_size]
+            )
+            if not batch:
+                break
+            ticket_ids = [tid for tid, *_ in batch]
+            order_ids = set(
+                OrderTicket.objects.filter(ticket_id__in=ticket_ids).values_list('order_id', flat=True)
+            )
+
+            Ticket.objects.filter(id__in=ticket_ids).update(
+                status=ReservationStatus.CANCELED, customer=None, hold_expires_at=None, updated=now,
+            )
+            OrderTicket.objects.filter(ticket_id__in=ticket_ids).delete()
+            canceled = Order.objects.filter(id__in=order_ids, status=Order.Status.PENDING).update(
+                status=Order.Status.CANCELED, updated=now,
+            )
+            # Sin sus líneas de boletos, los totales guardados en la orden ya no cuadran
+            refresh_order_totals(order_ids)
+
+            changes = defaultdict(list)
+            for _, showtime_id, row, col in batch:
+                changes[showtime_id].append((row, col, SeatState.FREE))
+            for showtime_id, cells in changes.items():
+                seatmap.apply(showtime_id, cells)
+
+        result.batches += 1
+        result.released_seats += len(batch)
+        result.canceled_orders += canceled
+        if len(batch) < batch_size:
+            break
+
+    result.elapsed = time.perf_counter() - started
+    if result.released_seats:
+        logger.info('Barrido de apartados: %s', result)
+    return result
@@ -0,0 +1,416 @@
+# cinema/importer.py
+"""Carga masiva de géneros, películas, salas y funciones desde CSV o JSON.
+
+Los archivos se leen fila por fila (CSV con encabezado, JSON Lines o un
+arreglo JSON).  Las llaves foráneas se resuelven contra mapas en memoria
+armados con una consulta por tabla, todo se valida antes de escribir
+(tipos, duplicados dentro del archivo y, para funciones, empalmes con
+:func:`cinema.scheduling.schedule`) y luego se escribe con
+``bulk_create``/``bulk_update`` por lotes dentro de una transacción.
+
+Por omisión es todo o nada: con un solo error no se escribe nada
+(``partial=True`` importa las filas válidas).  Columnas por tipo:
+
+* ``genres``: ``name``
+* ``movies``: ``title``, ``release_date``, ``duration_min``, ``rating`` y
+  opcionales ``original_title``, ``synopsis``, ``trailer_url``,
+  ``is_active``, ``genres`` (nombres separados por ``|``; se crean si faltan).
+  Llave: ``(title, release_date)``.
+* ``auditoriums``: ``cinema`` (nombre) o ``cinema_id``, ``name``,
+  ``total_rows``, ``total_cols`` y opcional ``seat_layout`` (JSON).
+  Llave: ``(cinema, name)``; las butacas se ajustan con ``cinema.layout``.
+* ``showtimes``: ``cinema`` + ``auditorium`` (nombres) o ``auditorium_id``;
+  ``movie`` (título, más ``release_date`` si se repite) o ``movie_id``;
+  ``start_time`` (ISO; sin zona = hora local), ``language``, ``format``,
+  ``base_price``.
+"""
+from __future__ import annotations
+
+import csv
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import IO, Callable, Hashable, Iterable, Iterator
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cartelera, facets, layout, scheduling, search
+from .models import Auditorium, Cinema, Genre, Movie, Showtime
+
+KINDS = ('genres', 'movies', 'auditoriums', 'showtimes')
+FORMATS = ('csv', 'jsonl', 'json')
+BATCH_SIZE = 1000
+MAX_ERRORS = 1000       # se deja de acumular errores pasado este número
+
+
+class RowError(Exception):
+    """Fila inválida; el mensaje va al reporte con su número de línea."""
+
+
+@dataclass
+class ImportResult:
+    kind: str
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+    committed: bool = False
+
+    def error(self, line: int, message: str) -> None:
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def __str__(self):
+        state = 'importado' if self.committed else 'sin escribir'
+        return (f'{self.kind}: {self.rows} filas, {self.created} nuevas, {self.updated} actualizadas, '
+                f'{len(self.errors)} errores ({state})')
+
+
+# ──────────────────────────────── LECTURA ────────────────────────────────
+def detect_format(filename: str) -> str:
+    name = filename.lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'json' if name.endswith('.json') else 'csv'
+
+
+def read_rows(fh: IO[str], fmt: str) -> Iterator[tuple[int, dict]]:
+    """``(línea, fila)`` sin cargar el archivo completo (salvo un arreglo ``json``).
+
+    Lanza ``ValueError`` (archivo ilegible) si el JSON no es un arreglo de
+    objetos o una línea de JSONL no es un objeto.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(fh)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line, text in enumerate(fh, 1):
+            if text.strip():
+                yield line, _object(json.loads(text), line)
+    else:
+        rows = json.load(fh)
+        if not isinstance(rows, list):
+            raise ValueError('se esperaba un arreglo de objetos')
+        for line, row in enumerate(rows, 1):
+            yield line, _object(row, line)
+
+
+def _object(row, line: int) -> dict:
+    if not isinstance(row, dict):
+        raise ValueError(f'la fila {line} no es un objeto')
+    return row
+
+
+def _clean(model, row: dict, names: Iterable[str], required: Iterable[str] = ()) -> dict:
+    """Valida las columnas ``names`` presentes con los campos del modelo."""
+    values, errors = {}, []
+    for name in names:
+        raw = row.get(name)
+        if raw is None or raw == '':
+            if name in required:
+                errors.append(f'falta {name}')
+            continue
+        try:
+            values[name] = model._meta.get_field(name).clean(raw, None)
+        except ValidationError as exc:
+            errors.append(f'{name}: {" ".join(exc.messages)}')
+    if errors:
+        raise RowError('; '.join(errors))
+    return values
+
+
+def _in_batches(items: list, size: int = BATCH_SIZE) -> Iterator[list]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _parse_start(raw, tz) -> datetime:
+    text = str(raw or '').strip()
+    try:
+        value = datetime.fromisoformat(text)        # camino rápido; parse_datetime acepta más variantes
+    except ValueError:
+        value = parse_datetime(text)
+    if value is None:
+        raise RowError(f'start_time inválido: {raw!r}')
+    return timezone.make_aware(value, tz) if value.tzinfo is None else value
+
+
+# ──────────────────────────────── GÉNEROS ────────────────────────────────
+# Cada importador valida todas las filas, llena ``result`` y devuelve la
+# función que escribe lo validado (se llama dentro de una transacción).
+def _ensure_genres(names: set[str]) -> dict[str, int]:
+    """``nombre → id``; crea los que falten."""
+    existing = dict(Genre.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - existing.keys()
+    if missing:
+        Genre.objects.bulk_create([Genre(name=name) for name in sorted(missing)],
+                                  batch_size=BATCH_SIZE, ignore_conflicts=True)
+        existing = dict(Genre.objects.filter(name__in=names).values_list('name', 'id'))
+    return existing
+
+
+def import_genres(rows: Iterable[tuple[int, dict]], result: ImportResult) -> Callable[[], None]:
+    seen = {}
+    for line, row in rows:
+        result.rows += 1
+        try:
+            name = _clean(Genre, row, ['name'], required=['name'])['name'].strip()
+            if name in seen:
+                raise RowError(f'género duplicado (línea {seen[name]})')
+        except RowError as exc:
+            result.error(line, str(exc))
+            continue
+        seen[name] = line
+    names = set(seen)
+    result.created = len(names - set(Genre.objects.filter(name__in=names).values_list('name', flat=True)))
+    return lambda: _ensure_genres(names)
+
+
+# ──────────────────────────────── PELÍCULAS ────────────────────────────────
+MOVIE_FIELDS = ('title', 'original_title', 'synopsis', 'duration_min', 'release_date',
+                'rating', 'trailer_url', 'is_active')
+
+
+def _genre_names(raw) -> list[str]:
+    names = raw if isinstance(raw, list) else str(raw or '').split('|')
+    return list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+
+
+def import_movies(rows: Iterable[tuple[int, dict]], result: ImportResult) -> Callable[[], None]:
+    existing = {(title, released): pk for pk, title, released
+                in Movie.objects.values_list('id', 'title', 'release_date')}
+    seen = {}
+    new, changed = [], []               # (llave, valores, géneros | None)
+    for line, row in rows:
+        result.rows += 1
+        try:
+            values = _clean(Movie, row, MOVIE_FIELDS, required=('title', 'release_date', 'duration_min', 'rating'))
+            key = (values['title'], values['release_date'])
+            if key in seen:
+                raise RowError(f'película duplicada (línea {seen[key]})')
+        except RowError as exc:
+            result.error(line, str(exc))
+            continue
+        seen[key] = line
+        genres = _genre_names(row['genres']) if 'genres' in row else None
+        (changed if key in existing else new).append((key, values, genres))
+    result.created, result.updated = len(new), len(changed)
+
+    def write():
+        genre_ids = _ensure_genres({name for *_, genres in new + changed for name in genres or ()})
+        Movie.objects.bulk_create([Movie(**values) for _, values, _ in new], batch_size=BATCH_SIZE)
+        if new:     # MySQL no devuelve los ids de bulk_create: se releen
+            titles = {key[0] for key, *_ in new}
+            for pk, title, released in (
+                Movie.objects.filter(title__in=titles).values_list('id', 'title', 'release_date')
+            ):
+                existing.setdefault((title, released), pk)
+        now = timezone.now()
+        by_columns = defaultdict(list)      # bulk_update sólo de las columnas que trae cada fila
+        for key, values, _ in changed:
+            by_columns[tuple(sorted(values))].append(Movie(pk=existing[key], updated=now, **values))
+        for columns, movies in by_columns.items():
+            Movie.objects.bulk_update(movies, [*columns, 'updated'], batch_size=BATCH_SIZE)
+
+        # Como signals.movie_saved: con otra duración las funciones ocupan la sala otro tiempo
+        by_duration = defaultdict(list)
+        for key, values, _ in changed:
+            by_duration[values['duration_min']].append(existing[key])
+        for minutes, movie_ids in by_duration.items():
+            occupied = timedelta(minutes=minutes) + scheduling.cleaning_buffer()
+            for batch in _in_batches(movie_ids):
+                Showtime.objects.filter(movie_id__in=batch).update(end_time=F('start_time') + occupied)
+
+        # Géneros: se reemplazan en las películas que traen la columna
+        Through = Movie.genres.through
+        linked = [(existing[key], genres) for key, _, genres in new + changed if genres is not None]
+        for batch in _in_batches([movie_id for movie_id, _ in linked]):
+            Through.objects.filter(movie_id__in=batch).delete()
+        Through.objects.bulk_create(
+            [Through(movie_id=movie_id, genre_id=genre_ids[name]) for movie_id, genres in linked for name in genres],
+            batch_size=BATCH_SIZE,
+        )
+        # bulk_* no mandan señales
+        transaction.on_commit(search.invalidate)
+        transaction.on_commit(facets.invalidate)
+        transaction.on_commit(cartelera.invalidate)
+
+    return write
+
+
+# ──────────────────────────────── SALAS ────────────────────────────────
+def _by_name(pairs: Iterable[tuple[int, Hashable]]) -> dict[Hashable, list[int]]:
+    names = defaultdict(list)
+    for pk, name in pairs:
+        names[name].append(pk)
+    return names
+
+
+def _lookup(row: dict, id_column: str, names: dict[Hashable, list[int]], known: set[int],
+            name: Hashable, what: str) -> int:
+    """Id por la columna ``id_column`` o, si no viene, por nombre (que debe ser único)."""
+    if row.get(id_column):
+        pk = int(row[id_column])
+        if pk not in known:
+            raise RowError(f'no existe {what} {pk}')
+        return pk
+    matches = names.get(name)
+    if not matches:
+        raise RowError(f'no existe {what} {name!r}')
+    if len(matches) > 1:
+        raise RowError(f'{what} {name!r} es ambiguo; usa {id_column}')
+    return matches[0]
+
+
+def _layout(raw) -> dict:
+    if raw in (None, ''):
+        return {}
+    if isinstance(raw, dict):
+        return raw
+    try:
+        return json.loads(raw)
+    except ValueError:
+        raise RowError('seat_layout no es JSON válido')
+
+
+def import_auditoriums(rows: Iterable[tuple[int, dict]], result: ImportResult) -> Callable[[], None]:
+    cinemas = _by_name(Cinema.objects.values_list('id', 'name'))
+    cinema_pks = {pk for pks in cinemas.values() for pk in pks}
+    existing = {(cinema_id, name): pk for pk, cinema_id, name
+                in Auditorium.objects.values_list('id', 'cinema_id', 'name')}
+    seen = {}
+    new, changed = [], []
+    for line, row in rows:
+        result.rows += 1
+        try:
+            values = _clean(Auditorium, row, ('name', 'total_rows', 'total_cols'),
+                            required=('name', 'total_rows', 'total_cols'))
+            cinema_id = _lookup(row, 'cinema_id', cinemas, cinema_pks, row.get('cinema', ''), 'el cine')
+            values['seat_layout'] = _layout(row.get('seat_layout'))
+            layout.validate_layout(values['seat_layout'], values['total_rows'], values['total_cols'])
+            key = (cinema_id, values['name'])
+            if key in seen:
+                raise RowError(f'sala duplicada (línea {seen[key]})')
+        except ValidationError as exc:
+            result.error(line, ' '.join(exc.messages))
+            continue
+        except (RowError, ValueError) as exc:
+            result.error(line, str(exc))
+            continue
+        seen[key] = line
+        (changed if key in existing else new).append(Auditorium(pk=existing.get(key), cinema_id=cinema_id, **values))
+    result.created, result.updated = len(new), len(changed)
+
+    def write():
+        Auditorium.objects.bulk_create(new, batch_size=BATCH_SIZE)
+        now = timezone.now()
+        for aud in changed:
+            aud.updated = now
+        Auditorium.objects.bulk_update(changed, ['total_rows', 'total_cols', 'seat_layout', 'updated'],
+                                       batch_size=BATCH_SIZE)
+        # bulk_create no manda post_save: las butacas se ajustan aquí (y en MySQL hay que releer ids)
+        ids = {(cinema_id, name): pk for pk, cinema_id, name in Auditorium.objects.filter(
+            cinema_id__in={aud.cinema_id for aud in new},
+        ).values_list('id', 'cinema_id', 'name')}
+        for aud in new + changed:
+            aud.pk = aud.pk or ids[aud.cinema_id, aud.name]
+            layout.sync_seats(aud)
+
+    return write
+
+
+# ──────────────────────────────── FUNCIONES ────────────────────────────────
+def _movie_id(row: dict, movies: dict[str, list[tuple]], movie_pks: set[int]) -> int:
+    if row.get('movie_id'):
+        pk = int(row['movie_id'])
+        if pk not in movie_pks:
+            raise RowError(f'no existe la película {pk}')
+        return pk
+    title = row.get('movie', '')
+    candidates = movies.get(title, [])
+    if row.get('release_date'):
+        candidates = [c for c in candidates if c[0].isoformat() == str(row['release_date'])]
+    if not candidates:
+        raise RowError(f'no existe la película {title!r}')
+    if len(candidates) > 1:
+        raise RowError(f'la película {title!r} es ambigua; agrega release_date o movie_id')
+    return candidates[0][1]
+
+
+def import_showtimes(rows: Iterable[tuple[int, dict]], result: ImportResult) -> Callable[[], None]:
+    auditoriums = _by_name((pk, (cinema, name)) for pk, name, cinema
+                           in Auditorium.objects.values_list('id', 'name', 'cinema__name'))
+    auditorium_pks = {pk for pks in auditoriums.values() for pk in pks}
+    movies = defaultdict(list)
+    for pk, title, released in Movie.objects.values_list('id', 'title', 'release_date'):
+        movies[title].append((released, pk))
+    movie_pks = {pk for candidates in movies.values() for _, pk in candidates}
+
+    columns = ('language', 'format', 'base_price')
+    cleaned = {}        # idioma/formato/precio se repiten mucho: se validan una vez
+    tz = timezone.get_current_timezone()
+    slots, seen = [], {}
+    for line, row in rows:
+        result.rows += 1
+        try:
+            raw = tuple(row.get(name) for name in columns)
+            if raw not in cleaned:
+                try:
+                    cleaned[raw] = _clean(Showtime, row, columns, required=columns)
+                except RowError as exc:
+                    cleaned[raw] = exc
+            values = cleaned[raw]
+            if isinstance(values, RowError):
+                raise values
+            auditorium_id = _lookup(row, 'auditorium_id', auditoriums, auditorium_pks,
+                                    (row.get('cinema', ''), row.get('auditorium', '')), 'la sala')
+            movie_id = _movie_id(row, movies, movie_pks)
+            start = _parse_start(row.get('start_time'), tz)
+            key = (auditorium_id, start)
+            if key in seen:
+                raise RowError(f'función duplicada (línea {seen[key]})')
+        except (RowError, ValueError) as exc:
+            result.error(line, str(exc))
+            continue
+        seen[key] = line
+        slots.append(scheduling.ShowtimeSlot(auditorium_id, movie_id, start, **values))
+
+    # Empalmes contra lo ya programado y entre las filas del archivo, en memoria
+    plan = scheduling.schedule(slots, commit=False)
+    for conflict in plan.conflicts:
+        slot = conflict.slot
+        result.error(seen[slot.auditorium_id, slot.start_time], conflict.reason)
+    result.errors.sort()
+    result.created = len(plan.created)
+    return lambda: scheduling.create_showtimes(plan.created, batch_size=BATCH_SIZE)
+
+
+IMPORTERS = {
+    'genres': import_genres,
+    'movies': import_movies,
+    'auditoriums': import_auditoriums,
+    'showtimes': import_showtimes,
+}
+
+
+def import_file(kind: str, fh: IO[str], fmt: str = 'csv', dry_run: bool = False,
+                partial: bool = False) -> ImportResult:
+    """Valida todo ``fh`` y, si no hay errores (o con ``partial``), lo escribe en una transacción."""
+    result = ImportResult(kind)
+    try:
+        write = IMPORTERS[kind](read_rows(fh, fmt), result)
+    except (ValueError, csv.Error) as exc:      # archivo ilegible (JSON roto, CSV malformado)
+        result.error(0, f'No se pudo leer el archivo: {exc}')
+        return result
+    if dry_run or (result.errors and not partial):
+        return result
+    with transaction.atomic():
+        write()
+    result.committed = True
+    return result
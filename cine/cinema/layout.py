@@ -0,0 +1,141 @@
+# cinema/layout.py
+"""Generación de butacas a partir del layout de la sala.
+
+``Auditorium.total_rows``/``total_cols`` definen la cuadrícula y
+``Auditorium.seat_layout`` (opcional) la ajusta::
+
+    {
+        "aisles": [5, 12],                  # columnas sin butacas (pasillos)
+        "empty": ["1-1", "1-2"],            # celdas sueltas sin butaca
+        "row_types": {"10": "VIP"},         # tipo para toda una fila
+        "seat_types": {"1-3": "wheelchair"} # tipo de una butaca concreta
+    }
+
+:func:`sync_seats` compara la tabla ``Seat`` con ese layout y la ajusta en
+una transacción con ``bulk_create``/``bulk_update``.  Las butacas que
+sobran y ya tienen boletos no se borran (``Ticket.seat`` es PROTECT).
+"""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import seatmap
+from .models import DEFAULT_SEAT_TYPE, Auditorium, Seat
+
+SEAT_TYPE_MAX = Seat._meta.get_field('seat_type').max_length
+
+# Dentro de sync_seats: la señal de Seat no invalida los mapas por butaca (va una sola al final)
+_syncing: ContextVar[bool] = ContextVar('cinema_layout_syncing', default=False)
+
+
+def syncing() -> bool:
+    """``True`` mientras :func:`sync_seats` ajusta las butacas."""
+    return _syncing.get()
+
+
+def _cell(key: str) -> tuple[int, int]:
+    row, _, col = str(key).partition('-')
+    return int(row), int(col)
+
+
+def validate_layout(layout: dict, rows: int, cols: int) -> None:
+    """Valida la estructura de ``seat_layout``; lanza ``ValidationError``."""
+    if not layout:
+        return
+    if not isinstance(layout, dict):
+        raise ValidationError({'seat_layout': 'El layout debe ser un objeto JSON.'})
+    errors = []
+    try:
+        for col in layout.get('aisles', []):
+            if not 1 <= int(col) <= cols:
+                errors.append(f'Pasillo fuera de rango: columna {col}.')
+        cells = list(layout.get('empty', [])) + list(layout.get('seat_types', {}))
+        for key in cells:
+            row, col = _cell(key)
+            if not (1 <= row <= rows and 1 <= col <= cols):
+                errors.append(f'Celda fuera de rango: {key}.')
+        for row in layout.get('row_types', {}):
+            if not 1 <= int(row) <= rows:
+                errors.append(f'Fila fuera de rango: {row}.')
+        types = list(layout.get('row_types', {}).values()) + list(layout.get('seat_types', {}).values())
+        errors += [f'Tipo demasiado largo: {t}.' for t in types if len(str(t)) > SEAT_TYPE_MAX]
+    except (TypeError, ValueError, AttributeError):
+        errors.append('Formato de layout inválido.')
+    if errors:
+        raise ValidationError({'seat_layout': errors})
+
+
+def desired_seats(aud: Auditorium) -> dict[tuple[int, int], str]:
+    """Butacas ``(fila, columna) → tipo`` que debería tener la sala."""
+    layout = aud.seat_layout or {}
+    aisles = {int(c) for c in layout.get('aisles', [])}
+    empty = {_cell(k) for k in layout.get('empty', [])}
+    row_types = {int(r): t for r, t in layout.get('row_types', {}).items()}
+    seat_types = {_cell(k): t for k, t in layout.get('seat_types', {}).items()}
+
+    seats = {}
+    for row in range(1, aud.total_rows + 1):
+        for col in range(1, aud.total_cols + 1):
+            if col in aisles or (row, col) in empty:
+                continue
+            seats[(row, col)] = seat_types.get((row, col), row_types.get(row, DEFAULT_SEAT_TYPE))
+    return seats
+
+
+@dataclass
+class SyncResult:
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    protected: int = 0          # sobrantes con boletos: se conservan
+
+    def __str__(self):
+        return (f'{self.created} creadas, {self.updated} actualizadas, {self.deleted} eliminadas'
+                + (f', {self.protected} conservadas por tener boletos' if self.protected else ''))
+
+
+def sync_seats(aud: Auditorium) -> SyncResult:
+    """Ajusta la tabla ``Seat`` de la sala a su layout (diff en una transacción)."""
+    desired = desired_seats(aud)
+    result = SyncResult()
+
+    with transaction.atomic():
+        existing = {
+            (row, col): (sid, seat_type)
+            for sid, row, col, seat_type in (
+                Seat.objects.filter(auditorium=aud).values_list('id', 'row', 'col', 'seat_type')
+            )
+        }
+
+        to_create = [
+            Seat(auditorium=aud, row=row, col=col, seat_type=seat_type)
+            for (row, col), seat_type in desired.items() if (row, col) not in existing
+        ]
+        to_update = [
+            Seat(pk=sid, seat_type=desired[cell])
+            for cell, (sid, seat_type) in existing.items()
+            if cell in desired and desired[cell] != seat_type
+        ]
+        extra = [sid for cell, (sid, _) in existing.items() if cell not in desired]
+
+        if to_create:
+            Seat.objects.bulk_create(to_create, batch_size=1000)
+        if to_update:
+            Seat.objects.bulk_update(to_update, ['seat_type'], batch_size=1000)
+        if extra:
+            token = _syncing.set(True)
+            try:
+                _, deleted = Seat.objects.filter(id__in=extra, ticket__isnull=True).delete()
+            finally:
+                _syncing.reset(token)
+            result.deleted = deleted.get(Seat._meta.label, 0)
+            result.protected = len(extra) - result.deleted
+
+        result.created, result.updated = len(to_create), len(to_update)
+        if to_create or to_update or result.deleted:
+            seatmap.invalidate_auditorium(aud.pk)
+    return result
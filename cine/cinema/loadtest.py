@@ -0,0 +1,373 @@
+# cinema/loadtest.py
+"""Banco del embudo de compra sobre una cadena sintética en SQLite.
+
+:func:`seed` llena una base vacía con N cines, salas con sus butacas, miles
+de funciones (días pasados y próximos) y un historial de órdenes pagadas,
+todo con ``bulk_create`` y un ``random.Random(seed)``: la misma semilla da
+la misma base.  :func:`run_funnel` recorre el embudo con el cliente de
+pruebas de Django (inicio → función → asientos GET/POST → confirmar GET/POST
+→ éxito → PDF) y mide latencia y consultas de cada paso (las cuenta
+``cinema.profiling``).  :func:`run_load` repite el embudo con N compradores
+simultáneos, cada uno sobre butacas libres distintas.
+
+Los resultados se guardan como línea base (JSON) y :func:`compare` marca
+regresiones: más consultas que la base en cualquier paso, o p99 por encima
+de la base más la tolerancia.  Lo usa ``manage.py bench_funnel``.
+"""
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterable, Sequence
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import Client
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import cartelera, facets, reporting, search
+from .bench import BenchResult, percentile
+from .models import (
+    Auditorium, Cinema, Customer, Genre, Movie, Order, OrderTicket, PaymentMethod,
+    ReservationStatus, Seat, Showtime, Ticket,
+)
+from .scheduling import ShowtimeSlot, schedule
+
+STEPS = (
+    'home', 'showtime_detail', 'seat_selection', 'POST seat_selection',
+    'order_confirm', 'POST order_confirm', 'order_success', 'ticket_pdf',
+)
+GENRES = ('Acción', 'Animación', 'Comedia', 'Drama', 'Terror', 'Ciencia ficción', 'Documental', 'Romance')
+CITIES = ('Apizaco', 'Tlaxcala', 'Puebla', 'Huamantla', 'Cholula', 'Chiautempan')
+PRICES = (Decimal('65.00'), Decimal('80.00'), Decimal('95.00'), Decimal('120.00'))
+FIRST_SHOW, SHOW_GAP = 11, 3        # 11:00, 14:00, 17:00, 20:00: cabe la película más larga + limpieza
+
+
+# ──────────────────────────────── SIEMBRA ────────────────────────────────
+@dataclass
+class SeedConfig:
+    cinemas: int = 4
+    auditoriums: int = 6        # por cine
+    rows: int = 12
+    cols: int = 16
+    days: int = 14              # de historial; las funciones a la venta son las de ``ahead`` días
+    ahead: int = 7
+    shows_per_day: int = 4      # por sala
+    movies: int = 40
+    customers: int = 500
+    orders: int = 20000         # órdenes pagadas del historial
+    seed: int = 1
+
+    def __post_init__(self):
+        if not 1 <= self.shows_per_day <= 4:
+            raise ValueError('shows_per_day debe estar entre 1 y 4.')
+
+
+def _slots(rng: random.Random, config: SeedConfig, auditorium_ids: Sequence[int],
+           movie_ids: Sequence[int]) -> list[ShowtimeSlot]:
+    today = timezone.localdate()
+    tz = timezone.get_current_timezone()
+    slots = []
+    for offset in range(-config.days, config.ahead + 1):
+        day = today + timedelta(days=offset)
+        for aud_id in auditorium_ids:
+            for k in range(config.shows_per_day):
+                start = timezone.make_aware(datetime(day.year, day.month, day.day, FIRST_SHOW + k * SHOW_GAP), tz)
+                slots.append(ShowtimeSlot(
+                    aud_id, rng.choice(movie_ids), start, rng.choice(('SUB', 'DUB')),
+                    rng.choice(('2D', '2D', '3D', 'IMAX')), rng.choice(PRICES),
+                ))
+    return slots
+
+
+def _history(rng: random.Random, config: SeedConfig, customer_ids: Sequence[int],
+             batch: int = 2000) -> int:
+    """Órdenes pagadas de 1 a 4 boletos sobre funciones ya pasadas, sin repetir butaca."""
+    past = list(
+        Showtime.objects.filter(start_time__lt=timezone.now())
+        .values_list('id', 'auditorium_id', 'start_time', 'base_price')
+    )
+    if not past:
+        return 0
+    seats = defaultdict(list)
+    for seat_id, aud_id in Seat.objects.values_list('id', 'auditorium_id'):
+        seats[aud_id].append(seat_id)
+    free = {}                   # función → butacas libres (barajadas la primera vez)
+    methods = [m for m in PaymentMethod.values if m != PaymentMethod.POINTS]
+
+    created = 0
+    while created < config.orders:
+        orders, lines = [], []
+        for _ in range(min(batch, config.orders - created)):
+            showtime_id, aud_id, start, price = rng.choice(past)
+            if showtime_id not in free:
+                free[showtime_id] = rng.sample(seats[aud_id], len(seats[aud_id]))
+            n = min(rng.randint(1, 4), len(free[showtime_id]))
+            if not n:
+                continue
+            customer_id = rng.choice(customer_ids)
+            amount = price * n
+            orders.append(Order(
+                customer_id=customer_id, payment_method=rng.choice(methods), status=Order.Status.PAID,
+                total_amount=amount, ticket_total=amount, item_count=n,
+                paid_at=start - timedelta(minutes=rng.randint(10, 7 * 24 * 60)),
+            ))
+            lines.append([
+                Ticket(showtime_id=showtime_id, seat_id=free[showtime_id].pop(), customer_id=customer_id,
+                       status=ReservationStatus.PAID, price=price)
+                for _ in range(n)
+            ])
+        with transaction.atomic():
+            Order.objects.bulk_create(orders, batch_size=500)
+            Ticket.objects.bulk_create([t for tickets in lines for t in tickets], batch_size=500)
+            OrderTicket.objects.bulk_create(
+                [OrderTicket(order=order, ticket=t) for order, tickets in zip(orders, lines) for t in tickets],
+                batch_size=500,
+            )
+        created += batch
+    return Order.objects.count()
+
+
+def seed(config: SeedConfig | None = None) -> dict[str, int]:
+    """Llena una base vacía; devuelve cuántas filas quedaron de cada cosa.
+
+    Los ``bulk_create`` no mandan señales: las butacas salen de la señal de
+    ``Auditorium`` (se crean una a una, son pocas), los mapas de asientos se
+    construyen al pedirlos y los cachés y reportes se recalculan al final.
+    """
+    config = config or SeedConfig()
+    rng = random.Random(config.seed)
+    today = timezone.localdate()
+
+    genres = Genre.objects.bulk_create([Genre(name=name) for name in GENRES])
+    movies = Movie.objects.bulk_create([
+        Movie(title=f'Película {i:03d}', duration_min=rng.randint(85, 150), rating=rng.choice(('A', 'B', 'B15', 'C')),
+              release_date=today - timedelta(days=rng.randint(0, 120)), synopsis='Sinopsis de prueba.')
+        for i in range(1, config.movies + 1)
+    ])
+    Movie.genres.through.objects.bulk_create([
+        Movie.genres.through(movie_id=movie.pk, genre_id=genre.pk)
+        for movie in movies for genre in rng.sample(genres, rng.randint(1, 3))
+    ])
+    cinemas = Cinema.objects.bulk_create([
+        Cinema(name=f'Cine {i:02d}', address=f'Av. Principal {i}', city=rng.choice(CITIES), state='Tlaxcala')
+        for i in range(1, config.cinemas + 1)
+    ])
+    auditorium_ids = [
+        Auditorium.objects.create(cinema=cinema, name=f'Sala {i}', total_rows=config.rows,
+                                  total_cols=config.cols).pk
+        for cinema in cinemas for i in range(1, config.auditoriums + 1)
+    ]
+    scheduled = schedule(_slots(rng, config, auditorium_ids, [m.pk for m in movies]))
+
+    User = get_user_model()
+    users = User.objects.bulk_create([
+        User(username=f'comprador{i:05d}', password='!', email=f'comprador{i:05d}@example.com')
+        for i in range(1, config.customers + 1)
+    ])
+    customers = Customer.objects.bulk_create([Customer(user=user) for user in users])
+    orders = _history(rng, config, [c.pk for c in customers])
+
+    reporting.rebuild()
+    for invalidate in (cartelera.invalidate, facets.invalidate, search.invalidate):
+        invalidate()
+    return {
+        'cines': len(cinemas), 'salas': len(auditorium_ids), 'butacas': Seat.objects.count(),
+        'funciones': len(scheduled.created), 'clientes': len(customers),
+        'órdenes': orders, 'boletos': Ticket.objects.count(),
+    }
+
+
+# ──────────────────────────────── EMBUDO ────────────────────────────────
+@dataclass
+class Sample:
+    step: str
+    latency: float
+    queries: int
+    ok: bool
+
+
+def run_funnel(client: Client, showtime_id: int, cells: Iterable[tuple[int, int]]) -> list[Sample]:
+    """Un comprador de principio a fin; se detiene en el primer paso que falla."""
+    samples = []
+
+    def hit(step, path, data=None, expect=200):
+        method = 'post' if step.startswith('POST ') else 'get'
+        started = time.perf_counter()
+        response = getattr(client, method)(path, data or {})
+        if response.streaming:          # el PDF se sirve como archivo: se lee completo
+            b''.join(response.streaming_content)
+            response.close()
+        latency = time.perf_counter() - started
+        profile = getattr(response.wsgi_request, 'profile', None)
+        ok = response.status_code == expect
+        samples.append(Sample(step, latency, profile.queries if profile else -1, ok))
+        return response if ok else None
+
+    if not (hit('home', reverse('home'))
+            and hit('showtime_detail', reverse('showtime_detail', args=[showtime_id]))
+            and hit('seat_selection', reverse('seat_selection', args=[showtime_id]))):
+        return samples
+    response = hit('POST seat_selection', reverse('seat_selection', args=[showtime_id]),
+                   {'seats': [f'{row}-{col}' for row, col in cells]}, expect=302)
+    if response is None:
+        return samples
+    order_id = resolve(response.url).kwargs['order_id']
+    if (hit('order_confirm', reverse('order_confirm', args=[order_id]))
+            and hit('POST order_confirm', reverse('order_confirm', args=[order_id]),
+                    {'payment_method': PaymentMethod.CARD}, expect=302)
+            and hit('order_success', reverse('order_success', args=[order_id]))):
+        hit('ticket_pdf', reverse('ticket_pdf', args=[order_id]))
+    return samples
+
+
+def _buyers(customers: int, seats_each: int = 2) -> list[tuple[int, int, list[tuple[int, int]]]]:
+    """``(usuario, función, butacas)`` para compras sin choques, repartidas entre funciones a la venta."""
+    showtimes = list(
+        Showtime.objects.filter(start_time__gt=timezone.now() + timedelta(hours=1))
+        .order_by('start_time', 'id')
+        .values_list('id', 'auditorium__total_rows', 'auditorium__total_cols')
+    )
+    taken = set(
+        Ticket.objects.filter(showtime_id__in=[s[0] for s in showtimes])
+        .exclude(status=ReservationStatus.CANCELED)
+        .values_list('showtime_id', 'seat__row', 'seat__col')
+    )
+    blocks = []
+    for showtime_id, rows, cols in showtimes:
+        for row in range(1, rows + 1):
+            for col in range(1, cols - seats_each + 2, seats_each):
+                cells = [(row, c) for c in range(col, col + seats_each)]
+                if not any((showtime_id, r, c) in taken for r, c in cells):
+                    blocks.append((showtime_id, cells))
+    # La misma butaca en cada función antes de pasar a la siguiente: los compradores
+    # simultáneos caen en funciones distintas, como en la vida real
+    blocks.sort(key=lambda block: (block[1][0], block[0]))
+    users = list(Customer.objects.order_by('id').values_list('user_id', flat=True)[:customers])
+    return [(users[i % len(users)], showtime_id, cells) for i, (showtime_id, cells) in enumerate(blocks)]
+
+
+# ──────────────────────────────── CARGA ────────────────────────────────
+@dataclass
+class StepStats:
+    step: str
+    latencies: list[float] = field(default_factory=list)
+    queries: int = 0            # máximo observado
+    errors: int = 0
+
+    def add(self, sample: Sample) -> None:
+        self.latencies.append(sample.latency)
+        self.queries = max(self.queries, sample.queries)
+        self.errors += not sample.ok
+
+
+@dataclass
+class LoadReport:
+    funnels: int = 0
+    concurrency: int = 1
+    elapsed: float = 0.0
+    steps: dict[str, StepStats] = field(default_factory=dict)
+
+    def add(self, samples: Iterable[Sample]) -> None:
+        for sample in samples:
+            self.steps.setdefault(sample.step, StepStats(sample.step)).add(sample)
+
+    def result(self, step: str) -> BenchResult:
+        stats = self.steps[step]
+        return BenchResult(step, stats.latencies, stats.errors, self.elapsed)
+
+    def as_baseline(self) -> dict:
+        steps = {}
+        for step in STEPS:
+            if step not in self.steps:
+                continue
+            result = self.result(step)
+            steps[step] = {
+                'requests': len(result.latencies),
+                'rps': round(result.rps, 1),
+                'p50_ms': round(percentile(result.latencies, 50) * 1000, 2),
+                'p99_ms': round(percentile(result.latencies, 99) * 1000, 2),
+                'queries': self.steps[step].queries,
+                'errors': result.errors,
+            }
+        return {'funnels': self.funnels, 'concurrency': self.concurrency,
+                'funnels_per_s': round(self.funnels / self.elapsed, 2) if self.elapsed else 0.0,
+                'steps': steps}
+
+    def lines(self) -> list[str]:
+        out = [f'{self.funnels} embudos con {self.concurrency} compradores en {self.elapsed:.1f} s '
+               f'({self.funnels / self.elapsed if self.elapsed else 0:.1f} embudos/s)']
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        for step in STEPS:
+            if step in self.steps:
+                budget = budgets.get(step, budgets.get(step.removeprefix('POST ')))
+                out.append(f'  {self.result(step)}, {self.steps[step].queries} consultas'
+                           + (f' (presupuesto {budget})' if budget is not None else ''))
+        return out
+
+
+def run_load(funnels: int, concurrency: int) -> LoadReport:
+    """``funnels`` embudos completos con ``concurrency`` hilos, cada uno con su cliente y sesión."""
+    buyers = _buyers(customers=max(concurrency, 1) * 4)[:funnels]
+    if len(buyers) < funnels:
+        raise ValueError(f'Sólo hay butacas libres para {len(buyers)} embudos.')
+    User = get_user_model()
+    users = User.objects.in_bulk({user_id for user_id, _, _ in buyers})
+    local = threading.local()
+
+    def one(buyer):
+        user_id, showtime_id, cells = buyer
+        clients = getattr(local, 'clients', None)
+        if clients is None:
+            clients = local.clients = {}
+        if user_id not in clients:
+            clients[user_id] = Client()
+            clients[user_id].force_login(users[user_id])
+        return run_funnel(clients[user_id], showtime_id, cells)
+
+    report = LoadReport(funnels=len(buyers), concurrency=concurrency)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for samples in pool.map(one, buyers):
+            report.add(samples)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+# ──────────────────────────────── LÍNEA BASE ────────────────────────────────
+def save_baseline(path: str | Path, config: SeedConfig, reports: dict[str, LoadReport]) -> None:
+    """Una sección por corrida (``serial``, ``concurrent``) más la siembra que las produjo."""
+    data = {'config': asdict(config), **{name: report.as_baseline() for name, report in reports.items()}}
+    Path(path).write_text(json.dumps(data, indent=2, ensure_ascii=False) + '\n')
+
+
+def load_baseline(path: str | Path) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def compare(report: LoadReport, baseline: dict, tolerance: float = 1.0) -> list[str]:
+    """Regresiones contra una sección de la base: errores, consultas de más y p99 arriba de ``(1 + tolerance)``."""
+    current = report.as_baseline()['steps']
+    problems = []
+    for step, base in baseline['steps'].items():
+        now = current.get(step)
+        if now is None:
+            problems.append(f'{step}: no se alcanzó')
+            continue
+        if now['errors']:
+            problems.append(f'{step}: {now["errors"]} errores')
+        if now['queries'] > base['queries']:
+            problems.append(f'{step}: {now["queries"]} consultas (base {base["queries"]})')
+        if now['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            problems.append(f'{step}: p99 {now["p99_ms"]:.1f} ms (base {base["p99_ms"]:.1f} ms)')
+    return problems
@@ -0,0 +1,215 @@
+# cinema/loyalty.py
+"""Puntos de lealtad: libro de movimientos y saldo desnormalizado.
+
+Cada movimiento agrega una :class:`~cinema.models.LoyaltyEntry` y ajusta
+``Customer.loyalty_pts`` con un ``UPDATE ... SET loyalty_pts = loyalty_pts ± n``
+en la misma transacción; leer el saldo es leer esa columna.
+
+- :func:`earn` abre un lote que caduca a los ``LOYALTY_POINTS_TTL_DAYS``.
+- :func:`redeem` descuenta con un ``UPDATE`` condicional (``loyalty_pts >= n``):
+  dos canjes simultáneos del mismo cliente no pueden dejar el saldo en
+  negativo y el segundo espera el candado de la fila del primero.  Los
+  puntos se toman de los lotes que vencen primero.
+- :func:`expire_points` (``manage.py expire_points``) vence en lotes lo que
+  quede de los lotes caducos.
+- :func:`reconcile` compara el saldo contra la suma del libro (la fuente de
+  verdad) y corrige las diferencias.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Customer, LoyaltyEntry, Order
+
+logger = logging.getLogger(__name__)
+Kind = LoyaltyEntry.Kind
+
+
+class InsufficientPoints(Exception):
+    def __init__(self, needed: int):
+        self.needed = needed
+        super().__init__(f'No tienes los {needed} puntos necesarios.')
+
+
+def points_ttl() -> timedelta:
+    return timedelta(days=getattr(settings, 'LOYALTY_POINTS_TTL_DAYS', 365))
+
+
+def points_earned(amount: Decimal) -> int:
+    """Uno por cada ``LOYALTY_PESOS_PER_POINT`` pagados."""
+    return int(amount // getattr(settings, 'LOYALTY_PESOS_PER_POINT', 10))
+
+
+def points_needed(amount: Decimal) -> int:
+    """Puntos para cubrir ``amount``; cada uno vale ``LOYALTY_POINT_VALUE`` pesos."""
+    return math.ceil(amount / Decimal(getattr(settings, 'LOYALTY_POINT_VALUE', '1.00')))
+
+
+# ─────────────────────────────── MOVIMIENTOS ───────────────────────────────
+def earn(customer_id: int, points: int, order: Order | None = None,
+         now: datetime | None = None) -> LoyaltyEntry | None:
+    """Abre un lote de ``points`` y suma al saldo (dos consultas)."""
+    if points <= 0:
+        return None
+    now = now or timezone.now()
+    with transaction.atomic():
+        entry = LoyaltyEntry.objects.create(
+            customer_id=customer_id, order=order, kind=Kind.EARN, points=points,
+            remaining=points, expires_at=now + points_ttl(),
+        )
+        Customer.objects.filter(pk=customer_id).update(loyalty_pts=F('loyalty_pts') + points)
+    return entry
+
+
+def redeem(customer_id: int, points: int, order: Order | None = None) -> LoyaltyEntry:
+    """Descuenta ``points`` o lanza :class:`InsufficientPoints` sin tocar nada.
+
+    Cuatro consultas: saldo condicional, lotes vivos (bloqueados), sus
+    remanentes en un ``bulk_update`` y el movimiento.
+    """
+    with transaction.atomic():
+        taken = Customer.objects.filter(pk=customer_id, loyalty_pts__gte=points).update(
+            loyalty_pts=F('loyalty_pts') - points,
+        )
+        if not taken:
+            raise InsufficientPoints(points)
+        # El UPDATE anterior ya tiene la fila del cliente: nadie más consume estos lotes ahora
+        lots = list(
+            LoyaltyEntry.objects
+            .select_for_update()
+            .filter(customer_id=customer_id, remaining__gt=0)
+            .order_by('expires_at', 'id')
+            .only('id', 'remaining')
+        )
+        pending, used = points, []
+        for lot in lots:
+            if not pending:
+                break
+            take = min(lot.remaining, pending)
+            lot.remaining -= take
+            pending -= take
+            used.append(lot)
+        if pending:
+            logger.warning('Cliente %s: el saldo cubría %d puntos que no están en sus lotes', customer_id, pending)
+        LoyaltyEntry.objects.bulk_update(used, ['remaining'])
+        return LoyaltyEntry.objects.create(customer_id=customer_id, order=order, kind=Kind.REDEEM, points=-points)
+
+
+# ─────────────────────────────── VENCIMIENTO ───────────────────────────────
+@dataclass
+class ExpiryResult:
+    expired_points: int = 0
+    customers: int = 0
+    batches: int = 0
+    elapsed: float = 0.0
+
+    def __str__(self):
+        return (f'{self.expired_points} puntos vencidos de {self.customers} clientes '
+                f'en {self.batches} lotes ({self.elapsed * 1000:.0f} ms)')
+
+
+def expire_points(now: datetime | None = None, batch_size: int = 500) -> ExpiryResult:
+    """Vence los remanentes de los lotes caducos, ``batch_size`` lotes por transacción.
+
+    Cada lote de trabajo son cinco consultas sin importar cuántos clientes
+    toque: el saldo de todos se ajusta en un solo ``UPDATE ... CASE``.
+    """
+    now = now or timezone.now()
+    result = ExpiryResult()
+    started = time.perf_counter()
+    customers = set()
+
+    while True:
+        with transaction.atomic():
+            # Los lotes que un canje tiene bloqueados se saltan; caen en el siguiente barrido
+            batch = list(
+                LoyaltyEntry.objects
+                .select_for_update(skip_locked=True)
+                .filter(remaining__gt=0, expires_at__lte=now)
+                .order_by('expires_at', 'id')
+                .values_list('id', 'customer_id', 'remaining')[:batch_size]
+            )
+            if not batch:
+                break
+            full = len(batch) == batch_size
+            # Clientes con un canje en curso se dejan para el siguiente barrido: el canje tiene
+            # su fila y espera sus lotes; esperar aquí la fila cerraría el ciclo (interbloqueo)
+            free = set(
+                Customer.objects.select_for_update(skip_locked=True)
+                .filter(pk__in={customer_id for _, customer_id, _ in batch})
+                .values_list('pk', flat=True)
+            )
+            batch = [lot for lot in batch if lot[1] in free]
+            if not batch:
+                break
+            expired = defaultdict(int)
+            for _, customer_id, remaining in batch:
+                expired[customer_id] += remaining
+            LoyaltyEntry.objects.filter(id__in=[lot_id for lot_id, *_ in batch]).update(remaining=0)
+            LoyaltyEntry.objects.bulk_create([
+                LoyaltyEntry(customer_id=customer_id, kind=Kind.EXPIRE, points=-points)
+                for customer_id, points in expired.items()
+            ])
+            Customer.objects.filter(pk__in=expired).update(loyalty_pts=Case(
+                *[When(pk=customer_id, then=Greatest(F('loyalty_pts') - points, Value(0), output_field=IntegerField()))
+                  for customer_id, points in expired.items()],
+                default=F('loyalty_pts'), output_field=IntegerField(),
+            ))
+
+        result.batches += 1
+        result.expired_points += sum(expired.values())
+        customers |= expired.keys()
+        if not full:
+            break
+
+    result.customers = len(customers)
+    result.elapsed = time.perf_counter() - started
+    if result.expired_points:
+        logger.info('Vencimiento de puntos: %s', result)
+    return result
+
+
+# ─────────────────────────────── CONCILIACIÓN ───────────────────────────────
+def ledger_balance():
+    """Subconsulta: suma del libro para cada cliente (0 sin movimientos)."""
+    total = (
+        LoyaltyEntry.objects
+        .filter(customer=OuterRef('pk'))
+        .order_by()
+        .values('customer')
+        .annotate(total=Sum('points'))
+        .values('total')
+    )
+    return Coalesce(Subquery(total, output_field=IntegerField()), 0)
+
+
+def reconcile(fix: bool = True) -> list[tuple[int, int, int]]:
+    """``[(cliente, saldo, libro)]`` de los saldos que no cuadran; con ``fix`` los corrige.
+
+    La corrección suma la diferencia con ``F()`` en lugar de escribir el
+    valor leído, así no pisa movimientos que lleguen mientras tanto.
+    """
+    drift = list(
+        Customer.objects
+        .annotate(ledger=Greatest(ledger_balance(), Value(0), output_field=IntegerField()))
+        .exclude(loyalty_pts=F('ledger'))
+        .values_list('pk', 'loyalty_pts', 'ledger')
+    )
+    if fix:
+        for customer_id, balance, ledger in drift:
+            Customer.objects.filter(pk=customer_id).update(loyalty_pts=F('loyalty_pts') + (ledger - balance))
+    if drift:
+        logger.warning('Conciliación de puntos: %d saldos no cuadraban con el libro', len(drift))
+    return drift
@@ -0,0 +1,20 @@
+# cinema/management/commands/bench_catalog.py
+from django.core.management.base import BaseCommand
+
+from cinema.bench import CATALOG_PATHS, compare
+
+
+class Command(BaseCommand):
+    help = 'Compara req/s y latencia p99 de las páginas del catálogo servidas por WSGI y por ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=list(CATALOG_PATHS),
+                            help=f'Rutas a pedir en ronda (default: {" ".join(CATALOG_PATHS)}).')
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Peticiones por stack (default: 500).')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Peticiones simultáneas (default: 32).')
+
+    def handle(self, *args, paths, requests, concurrency, **options):
+        for result in compare(paths, requests, concurrency):
+            self.stdout.write(str(result))
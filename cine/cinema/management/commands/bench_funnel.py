@@ -0,0 +1,84 @@
+# cinema/management/commands/bench_funnel.py
+import logging
+from dataclasses import fields
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+from cinema import loadtest
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'benchmarks' / 'funnel.json'
+
+
+class Command(BaseCommand):
+    help = ('Siembra una cadena sintética en SQLite y mide el embudo de compra (latencia p50/p99, '
+            'req/s y consultas por paso), en serie y con compradores simultáneos.')
+
+    def add_arguments(self, parser):
+        for f in fields(loadtest.SeedConfig):
+            parser.add_argument(f'--{f.name.replace("_", "-")}', type=int, default=f.default,
+                                help=f'Siembra: {f.name} (default: {f.default}).')
+        parser.add_argument('--reuse', action='store_true',
+                            help='Usa la base ya sembrada en lugar de recrearla.')
+        parser.add_argument('--funnels', type=int, default=200,
+                            help='Embudos en la corrida concurrente (default: 200).')
+        parser.add_argument('--serial', type=int, default=20,
+                            help='Embudos en la corrida en serie (default: 20).')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Compradores simultáneos (default: 8).')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                            help='Línea base contra la que se compara (default: cinema/benchmarks/funnel.json).')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Guarda esta corrida como nueva línea base en lugar de comparar.')
+        parser.add_argument('--tolerance', type=float, default=1.0,
+                            help='Holgura sobre el p99 de la base (default: 1.0 = hasta el doble).')
+
+    def handle(self, *args, reuse, funnels, serial, concurrency, baseline, save_baseline, tolerance, **options):
+        db = settings.DATABASES['default']
+        if connection.vendor != 'sqlite':
+            raise CommandError('El banco recrea la base: córrelo con --settings=cine.settings_bench.')
+        try:
+            config = loadtest.SeedConfig(**{f.name: options[f.name] for f in fields(loadtest.SeedConfig)})
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        if not reuse:
+            path = Path(db['NAME'])
+            connection.close()
+            for suffix in ('', '-wal', '-shm'):
+                path.with_name(path.name + suffix).unlink(missing_ok=True)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            call_command('migrate', verbosity=0)
+            counts = loadtest.seed(config)
+            self.stdout.write('Sembrado: ' + ', '.join(f'{n} {name}' for name, n in counts.items()))
+
+        setup_test_environment()        # 'testserver' en ALLOWED_HOSTS para el cliente de pruebas
+        # El reporte ya trae consultas contra presupuesto por paso: sin un aviso por petición
+        logging.getLogger('cinema.profiling').setLevel(logging.ERROR)
+        try:
+            reports = {
+                'serial': loadtest.run_load(serial, 1),
+                'concurrent': loadtest.run_load(funnels, concurrency),
+            }
+        except ValueError as exc:
+            raise CommandError(f'{exc} Siembra más funciones o usa menos embudos.')
+        for name, report in reports.items():
+            self.stdout.write(f'[{name}] ' + '\n'.join(report.lines()))
+
+        if save_baseline:
+            loadtest.save_baseline(baseline, config, reports)
+            self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {baseline}'))
+            return
+        if not Path(baseline).exists():
+            self.stdout.write(self.style.WARNING(f'Sin línea base en {baseline}; usa --save-baseline.'))
+            return
+        base = loadtest.load_baseline(baseline)
+        problems = [f'[{name}] {problem}' for name, report in reports.items() if name in base
+                    for problem in loadtest.compare(report, base[name], tolerance)]
+        if problems:
+            raise CommandError('Regresiones contra la línea base:\n  ' + '\n  '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Sin regresiones contra la línea base.'))
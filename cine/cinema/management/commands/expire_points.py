@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cinema.loyalty import expire_points, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Vence los puntos de lealtad caducos y, con --reconcile, cuadra los saldos contra el libro.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Lotes de puntos por transacción (default: 500).')
+        parser.add_argument('--reconcile', action='store_true', dest='reconcile_',
+                            help='Después del barrido, corrige los saldos que no cuadren con el libro.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Repetir el barrido indefinidamente (modo worker).')
+        parser.add_argument('--interval', type=float, default=3600,
+                            help='Segundos entre barridos con --loop (default: 3600).')
+
+    def handle(self, *args, batch_size, reconcile_, loop, interval, **options):
+        while True:
+            self.stdout.write(str(expire_points(batch_size=batch_size)))
+            if reconcile_:
+                drift = reconcile()
+                self.stdout.write(f'{len(drift)} saldos corregidos')
+                for customer_id, balance, ledger in drift[:20]:
+                    self.stdout.write(f'  cliente {customer_id}: saldo {balance}, libro {ledger}')
+            if not loop:
+                break
+            time.sleep(interval)
@@ -0,0 +1,31 @@
+# cinema/management/commands/export_sales.py
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema.export import FORMATS, TABLES, export
+
+
+class Command(BaseCommand):
+    help = ('Exporta boletos, órdenes y sus líneas a CSV comprimido y/o Parquet, '
+            'sólo lo modificado desde la última corrida.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Carpeta destino (ahí se guarda también watermark.json).')
+        parser.add_argument('--table', action='append', choices=sorted(TABLES), dest='tables',
+                            help='Tabla a exportar (se puede repetir; default: todas).')
+        parser.add_argument('--format', action='append', choices=FORMATS, dest='formats',
+                            help='Formato (se puede repetir; default: csv).')
+        parser.add_argument('--full', action='store_true',
+                            help='Ignorar la marca de agua y exportar todo.')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Filas por consulta (default: 5000).')
+        parser.add_argument('--lag', type=float, default=60,
+                            help='Segundos antes de ahora para el corte (default: 60).')
+
+    def handle(self, *args, directory, tables, formats, full, chunk_size, lag, **options):
+        try:
+            results = export(directory, tables or list(TABLES), formats or ['csv'],
+                             full=full, chunk_size=chunk_size, lag=lag)
+        except RuntimeError as exc:
+            raise CommandError(exc)
+        for result in results:
+            self.stdout.write(str(result))
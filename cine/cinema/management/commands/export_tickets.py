@@ -0,0 +1,35 @@
+# cinema/management/commands/export_tickets.py
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema.ticket_pdf import export_pdf, export_zip, iter_batch_orders
+
+
+class Command(BaseCommand):
+    help = 'Exporta boletos de varias órdenes o funciones a un PDF multipágina o a un ZIP de PDFs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Archivo de salida (.pdf o .zip).')
+        parser.add_argument('--order', type=int, action='append', default=[], dest='orders',
+                            help='Id de orden (se puede repetir).')
+        parser.add_argument('--showtime', type=int, action='append', default=[], dest='showtimes',
+                            help='Id de función (se puede repetir).')
+        parser.add_argument('--format', choices=('pdf', 'zip'),
+                            help='Formato; por omisión se deduce de la extensión.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Procesos para dibujar (0 = sin procesos).')
+
+    def handle(self, *args, output, orders, showtimes, format, workers, **options):
+        if not orders and not showtimes:
+            raise CommandError('Indica al menos una --order o --showtime.')
+        fmt = format or ('zip' if output.lower().endswith('.zip') else 'pdf')
+
+        batch = iter_batch_orders(order_ids=orders, showtime_ids=showtimes)
+        with open(output, 'wb') as fh:
+            if fmt == 'zip':
+                count = export_zip(batch, fh, workers=workers)
+                self.stdout.write(self.style.SUCCESS(f'{count} PDF(s) escritos en {output}'))
+            else:
+                count = export_pdf(batch, fh, workers=workers)
+                self.stdout.write(self.style.SUCCESS(f'{count} página(s) escritas en {output}'))
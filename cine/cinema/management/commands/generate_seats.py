@@ -0,0 +1,25 @@
+# cinema/management/commands/generate_seats.py
+from django.core.management.base import BaseCommand
+
+from cinema.layout import sync_seats
+from cinema.models import Auditorium
+
+
+class Command(BaseCommand):
+    help = 'Crea/ajusta las butacas de las salas según su tamaño y seat_layout.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cinema', type=int, action='append', default=[],
+                            help='ID de cine (repetible). Por defecto, todas las salas de la cadena.')
+        parser.add_argument('--auditorium', type=int, action='append', default=[],
+                            help='ID de sala (repetible).')
+
+    def handle(self, *args, cinema, auditorium, **options):
+        auditoriums = Auditorium.objects.select_related('cinema').order_by('cinema__name', 'name')
+        if cinema:
+            auditoriums = auditoriums.filter(cinema_id__in=cinema)
+        if auditorium:
+            auditoriums = auditoriums.filter(id__in=auditorium)
+
+        for aud in auditoriums.iterator():
+            self.stdout.write(f'{aud}: {sync_seats(aud)}')
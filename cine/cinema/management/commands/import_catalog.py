@@ -0,0 +1,35 @@
+# cinema/management/commands/import_catalog.py
+from django.core.management.base import BaseCommand, CommandError
+
+from cinema.importer import FORMATS, KINDS, detect_format, import_file
+
+
+class Command(BaseCommand):
+    help = 'Importa géneros, películas, salas o funciones desde CSV, JSON Lines o JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('path', help='Archivo a importar.')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Formato; por omisión se deduce de la extensión.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Sólo validar y reportar.')
+        parser.add_argument('--partial', action='store_true',
+                            help='Importar las filas válidas aunque haya errores.')
+        parser.add_argument('--max-errors', type=int, default=20,
+                            help='Errores a listar (default: 20).')
+
+    def handle(self, *args, kind, path, format, dry_run, partial, max_errors, **options):
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as fh:
+                result = import_file(kind, fh, format or detect_format(path), dry_run=dry_run, partial=partial)
+        except OSError as exc:
+            raise CommandError(exc)
+        for line, message in result.errors[:max_errors]:
+            self.stderr.write(f'línea {line}: {message}')
+        if len(result.errors) > max_errors:
+            self.stderr.write(f'… y {len(result.errors) - max_errors} errores más')
+        style = self.style.SUCCESS if result.committed else self.style.WARNING
+        self.stdout.write(style(str(result)))
+        if result.errors and not result.committed:
+            raise CommandError('No se importó nada; corrige los errores o usa --partial.')
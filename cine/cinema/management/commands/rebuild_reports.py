@@ -0,0 +1,18 @@
+# cinema/management/commands/rebuild_reports.py
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from cinema.reporting import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las tablas resumen de ventas y ocupación desde las órdenes pagadas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help='Sólo días desde AAAA-MM-DD (default: todo el historial).')
+
+    def handle(self, *args, since, **options):
+        created = rebuild(since)
+        self.stdout.write(', '.join(f'{name}: {count}' for name, count in created.items()))
@@ -0,0 +1,26 @@
+# cinema/management/commands/release_holds.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from cinema.holds import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Libera los asientos cuyo apartado caducó y cancela sus órdenes pendientes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Boletos por lote (default: 500).')
+        parser.add_argument('--loop', action='store_true',
+                            help='Repetir el barrido indefinidamente (modo worker).')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Segundos entre barridos con --loop (default: 30).')
+
+    def handle(self, *args, batch_size, loop, interval, **options):
+        while True:
+            result = release_expired_holds(batch_size=batch_size)
+            self.stdout.write(str(result))
+            if not loop:
+                break
+            time.sleep(interval)
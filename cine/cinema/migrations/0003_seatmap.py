@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0002_newslettersubscriber'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rows', models.PositiveSmallIntegerField()),
+                ('cols', models.PositiveSmallIntegerField()),
+                ('bits', models.BinaryField()),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('showtime', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='seat_map', to='cinema.showtime')),
+            ],
+        ),
+    ]
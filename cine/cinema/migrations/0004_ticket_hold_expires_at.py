@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0003_seatmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Fin del apartado; vacío si está pagado o cancelado', null=True),
+        ),
+    ]
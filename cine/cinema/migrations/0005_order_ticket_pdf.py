@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0004_ticket_hold_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='ticket_pdf',
+            field=models.FileField(blank=True, editable=False, upload_to='tickets/pdf/'),
+        ),
+    ]
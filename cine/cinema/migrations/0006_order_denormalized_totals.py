@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:32
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    Order = apps.get_model('cinema', 'Order')
+    OrderTicket = apps.get_model('cinema', 'OrderTicket')
+    OrderSnack = apps.get_model('cinema', 'OrderSnack')
+    money = models.DecimalField(max_digits=8, decimal_places=2)
+
+    def per_order(qs, expression, default):
+        sub = qs.filter(order=OuterRef('pk')).order_by().values('order').annotate(t=expression).values('t')[:1]
+        return Coalesce(Subquery(sub), default, output_field=expression.output_field)
+
+    zero = Value(Decimal('0.00'), output_field=money)
+    count = models.IntegerField()
+    Order.objects.update(
+        ticket_total=per_order(OrderTicket.objects, Sum('ticket__price', output_field=money), zero),
+        snack_total=per_order(OrderSnack.objects, Sum(F('qty') * F('price'), output_field=money), zero),
+        item_count=(per_order(OrderTicket.objects, Count('id', output_field=count), Value(0))
+                    + per_order(OrderSnack.objects, Sum('qty', output_field=count), Value(0))),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0005_order_ticket_pdf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, help_text='Boletos + piezas de snack'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='snack_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='ticket_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
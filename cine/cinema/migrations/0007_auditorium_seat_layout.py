@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0006_order_denormalized_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditorium',
+            name='seat_layout',
+            field=models.JSONField(blank=True, default=dict, help_text='Opcional: {"aisles": [5], "empty": ["1-1"], "row_types": {"8": "VIP"}, "seat_types": {"1-2": "wheelchair"}}'),
+        ),
+    ]
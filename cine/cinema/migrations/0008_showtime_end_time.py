@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:37
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_end_time(apps, schema_editor):
+    Movie = apps.get_model('cinema', 'Movie')
+    Showtime = apps.get_model('cinema', 'Showtime')
+    buffer = timedelta(minutes=getattr(settings, 'SHOWTIME_CLEANING_MINUTES', 15))
+    for movie_id, duration in Movie.objects.values_list('id', 'duration_min'):
+        Showtime.objects.filter(movie_id=movie_id).update(
+            end_time=models.F('start_time') + (timedelta(minutes=duration) + buffer),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0007_auditorium_seat_layout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showtime',
+            name='end_time',
+            field=models.DateTimeField(editable=False, help_text='Fin de la función más el tiempo de limpieza', null=True),
+        ),
+        migrations.RunPython(backfill_end_time, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0008_showtime_end_time'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cinema',
+            index=models.Index(fields=['city', 'is_active'], name='cinema_cine_city_88a7fb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='showtime',
+            index=models.Index(fields=['movie', 'start_time'], name='cinema_show_movie_i_54d472_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='showtime',
+            index=models.Index(fields=['language', 'format', 'start_time'], name='cinema_show_languag_8f530c_idx'),
+        ),
+    ]
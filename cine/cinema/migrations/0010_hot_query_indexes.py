@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0009_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['is_active', 'release_date'], name='cinema_movi_is_acti_2b8946_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['is_active', 'title'], name='cinema_movi_is_acti_217224_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['release_date'], name='movie_active_release_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['title'], name='movie_active_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'status'], name='cinema_orde_custome_42bb73_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', '-created', '-id'], name='cinema_orde_custome_4f6a32_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snackitem',
+            index=models.Index(fields=['is_available', 'name'], name='cinema_snac_is_avai_1a6093_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snackitem',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['-updated'], name='snack_available_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['showtime', 'status'], name='cinema_tick_showtim_7ea032_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('status', 'RES')), fields=['hold_expires_at', 'id'], name='ticket_active_hold_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('payment_method', models.CharField(choices=[('CSH', 'Efectivo'), ('CRD', 'Tarjeta'), ('WLT', 'Wallet'), ('PNT', 'Puntos')], max_length=3)),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'unique_together': {('day', 'payment_method')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ShowtimeSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seats', models.PositiveIntegerField(default=0)),
+                ('tickets_sold', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('showtime', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales', to='cinema.showtime')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('ticket_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('snack_orders', models.PositiveIntegerField(default=0, help_text='Órdenes con boletos que además llevan snacks')),
+                ('snack_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cinema', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.cinema')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cinema.movie')),
+            ],
+            options={
+                'unique_together': {('day', 'cinema', 'movie')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0011_sales_reports'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated', 'id'], name='cinema_orde_updated_22b1c1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['updated', 'id'], name='cinema_tick_updated_f0b9d3_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0012_export_watermark_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_ref',
+            field=models.CharField(blank=True, help_text='Referencia del cobro en la pasarela', max_length=64),
+        ),
+    ]
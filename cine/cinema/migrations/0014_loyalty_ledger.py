@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:10
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def opening_balances(apps, schema_editor):
+    # Los saldos previos al libro entran como un ajuste (lote) por cliente
+    Customer = apps.get_model('cinema', 'Customer')
+    LoyaltyEntry = apps.get_model('cinema', 'LoyaltyEntry')
+    expires = timezone.now() + timedelta(days=getattr(settings, 'LOYALTY_POINTS_TTL_DAYS', 365))
+    LoyaltyEntry.objects.bulk_create(
+        [LoyaltyEntry(customer_id=pk, kind='ADJ', points=pts, remaining=pts, expires_at=expires)
+         for pk, pts in Customer.objects.filter(loyalty_pts__gt=0).values_list('pk', 'loyalty_pts').iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0013_order_payment_ref'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='loyalty_pts',
+            field=models.PositiveIntegerField(default=0, help_text='Saldo de puntos; lo mantiene cinema.loyalty'),
+        ),
+        migrations.CreateModel(
+            name='LoyaltyEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ERN', 'Acumulación'), ('RDM', 'Canje'), ('EXP', 'Vencimiento'), ('ADJ', 'Ajuste')], max_length=3)),
+                ('points', models.IntegerField(help_text='Positivo al acumular, negativo al canjear o vencer')),
+                ('remaining', models.PositiveIntegerField(default=0, editable=False)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='loyalty_entries', to='cinema.customer')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loyalty_entries', to='cinema.order')),
+            ],
+            options={
+                'ordering': ('-created', '-id'),
+                'indexes': [models.Index(fields=['customer', '-created', '-id'], name='cinema_loya_custome_8a2434_idx'), models.Index(condition=models.Q(('remaining__gt', 0)), fields=['expires_at', 'id'], name='loyalty_open_lot_idx')],
+            },
+        ),
+        migrations.RunPython(opening_balances, migrations.RunPython.noop),
+    ]
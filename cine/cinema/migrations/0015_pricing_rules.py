@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:17
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_seats(apps, schema_editor):
+    # Contadores de los mapas ya construidos: 2 bits por celda, 0 = sin butaca, 3 = vendida
+    SeatMap = apps.get_model('cinema', 'SeatMap')
+    maps = []
+    for seat_map in SeatMap.objects.only('id', 'rows', 'cols', 'bits').iterator():
+        data = bytes(seat_map.bits)
+        states = [(data[i // 4] >> ((i % 4) * 2)) & 0b11 for i in range(seat_map.rows * seat_map.cols)]
+        seat_map.seats = sum(1 for state in states if state)
+        seat_map.sold = states.count(3)
+        maps.append(seat_map)
+    SeatMap.objects.bulk_update(maps, ['seats', 'sold'], batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0014_loyalty_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seatmap',
+            name='seats',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='seatmap',
+            name='sold',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='PricingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100)),
+                ('priority', models.PositiveSmallIntegerField(default=100, help_text='Las menores se aplican primero')),
+                ('is_active', models.BooleanField(default=True)),
+                ('action', models.CharField(choices=[('MUL', 'Multiplicar por'), ('ADD', 'Sumar'), ('SET', 'Fijar en')], default='MUL', max_length=3)),
+                ('amount', models.DecimalField(decimal_places=3, max_digits=8)),
+                ('seat_type', models.CharField(blank=True, help_text='Vacío = cualquier butaca', max_length=20)),
+                ('format', models.CharField(blank=True, choices=[('2D', '2D'), ('3D', '3D'), ('IMAX', 'IMAX')], max_length=10)),
+                ('weekdays', models.CharField(blank=True, help_text='Días de la función, 0 = lunes … 6 = domingo; p. ej. "56"', max_length=7)),
+                ('starts_from', models.TimeField(blank=True, help_text='Hora local de inicio desde…', null=True)),
+                ('starts_until', models.TimeField(blank=True, help_text='…hasta (sin incluirla)', null=True)),
+                ('min_occupancy', models.PositiveSmallIntegerField(blank=True, help_text='Sobreprecio: aplica desde este % de butacas vendidas', null=True, validators=[django.core.validators.MaxValueValidator(100)])),
+                ('cinema', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pricing_rules', to='cinema.cinema')),
+            ],
+            options={
+                'ordering': ('priority', 'id'),
+            },
+        ),
+        migrations.RunPython(count_seats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:18
+
+from django.db import migrations, models
+
+
+def copy_seat_types(apps, schema_editor):
+    # Tipos guardados de las butacas de cada sala, en los mapas ya construidos
+    SeatMap = apps.get_model('cinema', 'SeatMap')
+    Seat = apps.get_model('cinema', 'Seat')
+    by_auditorium = {}
+    maps = []
+    for seat_map in SeatMap.objects.select_related('showtime').only('id', 'showtime__auditorium_id').iterator():
+        auditorium_id = seat_map.showtime.auditorium_id
+        if auditorium_id not in by_auditorium:
+            by_auditorium[auditorium_id] = {
+                f'{row}-{col}': seat_type
+                for row, col, seat_type in (
+                    Seat.objects.filter(auditorium_id=auditorium_id).exclude(seat_type='standard')
+                    .values_list('row', 'col', 'seat_type')
+                )
+            }
+        seat_map.seat_types = by_auditorium[auditorium_id]
+        maps.append(seat_map)
+    SeatMap.objects.bulk_update(maps, ['seat_types'], batch_size=1000)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cinema', '0015_pricing_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seatmap',
+            name='seat_types',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.RunPython(copy_seat_types, migrations.RunPython.noop),
+    ]
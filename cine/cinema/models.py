@@ -1,5 +1,8 @@
 from __future__ import annotations
+from typing import NamedTuple
+
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.utils import timezone
@@ -26,6 +29,9 @@ class Cinema(TimeStampedModel):
     phone         = models.CharField(max_length=30, blank=True)
     is_active     = models.BooleanField(default=True)
 
+    class Meta(TimeStampedModel.Meta):
+        indexes = [models.Index(fields=('city', 'is_active'))]
+
     def __str__(self) -> str:
         return self.name
 
@@ -36,6 +42,11 @@ class Auditorium(TimeStampedModel):
     name          = models.CharField(max_length=50)
     total_rows    = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(50)])
     total_cols    = models.PositiveSmallIntegerField(validators=[MinValueValidator(1), MaxValueValidator(50)])
+    seat_layout   = models.JSONField(
+        default=dict, blank=True,
+        help_text='Opcional: {"aisles": [5], "empty": ["1-1"], "row_types": {"8": "VIP"}, '
+                  '"seat_types": {"1-2": "wheelchair"}}',
+    )
 
     class Meta:
         unique_together = (('cinema', 'name'),)
@@ -43,6 +54,10 @@ class Auditorium(TimeStampedModel):
     def __str__(self) -> str:
         return f'{self.cinema} · {self.name}'
 
+    def clean(self):
+        from .layout import validate_layout
+        validate_layout(self.seat_layout, self.total_rows, self.total_cols)
+
 
 class Seat(models.Model):
     """Asiento fijo; se crea automáticamente a partir del layout."""
@@ -59,6 +74,9 @@ class Seat(models.Model):
         return f'{self.auditorium} R{self.row}C{self.col}'
 
 
+DEFAULT_SEAT_TYPE = Seat._meta.get_field('seat_type').default
+
+
 # ──────────────────────────────── PELÍCULAS ───────────────────────────────
 class Genre(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -80,27 +98,68 @@ class Movie(TimeStampedModel):
     genres        = models.ManyToManyField(Genre, related_name='movies')
     is_active     = models.BooleanField(default=True)
 
+    class Meta(TimeStampedModel.Meta):
+        # MySQL compara ``is_active = 1`` y usa los compuestos; SQLite/PostgreSQL
+        # escriben ``WHERE is_active`` y sólo aprovechan los parciales (MySQL los ignora).
+        indexes = [
+            models.Index(fields=('is_active', 'release_date')),     # estrenos
+            models.Index(fields=('is_active', 'title')),            # catálogo
+            models.Index(fields=('release_date',), name='movie_active_release_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=('title',), name='movie_active_title_idx',
+                         condition=models.Q(is_active=True)),
+        ]
+
     def __str__(self):
         return self.title
 
 
 # ─────────────────────────── CARTELERA & FUNCIONES ────────────────────────
+SHOWTIME_FORMATS = [('2D', '2D'), ('3D', '3D'), ('IMAX', 'IMAX')]
+
+
 class Showtime(TimeStampedModel):
     """Una función individual (día-hora) para una película en cierta sala."""
     movie         = models.ForeignKey(Movie, on_delete=models.PROTECT, related_name='showtimes')
     auditorium    = models.ForeignKey(Auditorium, on_delete=models.PROTECT, related_name='showtimes')
     start_time    = models.DateTimeField()
     language      = models.CharField(max_length=20, choices=[('SUB', 'Subtitulada'), ('DUB', 'Doblada')])
-    format        = models.CharField(max_length=10, choices=[('2D', '2D'), ('3D', '3D'), ('IMAX', 'IMAX')])
+    format        = models.CharField(max_length=10, choices=SHOWTIME_FORMATS)
     base_price    = models.DecimalField(max_digits=6, decimal_places=2)
+    end_time      = models.DateTimeField(editable=False, null=True,
+                                         help_text='Fin de la función más el tiempo de limpieza')
 
     class Meta:
-        indexes = [models.Index(fields=('start_time',))]
+        indexes = [
+            models.Index(fields=('start_time',)),
+            models.Index(fields=('movie', 'start_time')),
+            models.Index(fields=('language', 'format', 'start_time')),
+        ]
         unique_together = (('auditorium', 'start_time'),)
 
     def __str__(self):
         return f'{self.movie} · {self.start_time:%d/%m %H:%M} · {self.auditorium}'
 
+    def save(self, *args, **kwargs):
+        from .scheduling import occupied_until
+        fields = kwargs.get('update_fields')
+        if self.start_time and self.movie_id and (fields is None or {'start_time', 'movie'} & set(fields)):
+            self.end_time = occupied_until(self.start_time, self.movie.duration_min)
+            if fields is not None:
+                kwargs['update_fields'] = {*fields, 'end_time'}
+        super().save(*args, **kwargs)
+
+    def clean(self):
+        from .scheduling import find_conflicts
+        if not (self.start_time and self.movie_id and self.auditorium_id):
+            return
+        conflicts = find_conflicts(self)
+        if conflicts:
+            raise ValidationError({'start_time': [
+                f'Se empalma con {other.movie} ({other.start_time:%d/%m %H:%M}–{other.end_time:%H:%M}).'
+                for other in conflicts
+            ]})
+
     @property
     def is_past(self) -> bool:
         return self.start_time < timezone.now()
@@ -111,7 +170,7 @@ class Customer(TimeStampedModel):
     """Perfil extendido para clientes (extiende AUTH_USER_MODEL)."""
     user         = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='customer')
     phone        = models.CharField(max_length=20, blank=True)
-    loyalty_pts  = models.PositiveIntegerField(default=0)
+    loyalty_pts  = models.PositiveIntegerField(default=0, help_text='Saldo de puntos; lo mantiene cinema.loyalty')
 
     def __str__(self):
         return self.user.get_full_name() or self.user.username
@@ -132,15 +191,124 @@ class Ticket(TimeStampedModel):
     status        = models.CharField(max_length=3, choices=ReservationStatus.choices, default=ReservationStatus.RESERVED)
     price         = models.DecimalField(max_digits=6, decimal_places=2)
     qr_code       = models.ImageField(upload_to='tickets/qr/', blank=True)  # opcional
+    hold_expires_at = models.DateTimeField(null=True, blank=True, db_index=True,
+                                           help_text='Fin del apartado; vacío si está pagado o cancelado')
 
     class Meta:
         unique_together = (('showtime', 'seat'),)  # evita doble venta
         ordering = ('showtime', 'seat')
+        indexes = [
+            models.Index(fields=('showtime', 'status')),
+            models.Index(fields=('updated', 'id')),                # exportación incremental
+            # Sólo los apartados vigentes: lo que recorre el barrido de cinema.holds
+            models.Index(fields=('hold_expires_at', 'id'), name='ticket_active_hold_idx',
+                         condition=models.Q(status=ReservationStatus.RESERVED)),
+        ]
 
     def __str__(self):
         return f'{self.showtime} · {self.seat}'
 
 
+# ───────────────────────── MAPA DE DISPONIBILIDAD ─────────────────────────
+class SeatState(models.IntegerChoices):
+    EMPTY    = 0, 'Sin butaca'      # pasillo o celda sin asiento
+    FREE     = 1, 'Disponible'
+    HELD     = 2, 'Reservado'
+    SOLD     = 3, 'Pagado'
+
+
+TICKET_SEAT_STATE = {
+    ReservationStatus.RESERVED: SeatState.HELD,
+    ReservationStatus.PAID:     SeatState.SOLD,
+    ReservationStatus.CANCELED: SeatState.FREE,
+}
+
+
+class SeatCell(NamedTuple):
+    """Celda (fila, columna) del mapa de una función."""
+    row: int
+    col: int
+    state: int
+
+    @property
+    def is_seat(self) -> bool:
+        return self.state != SeatState.EMPTY
+
+    @property
+    def taken(self) -> bool:
+        return self.state in (SeatState.HELD, SeatState.SOLD)
+
+
+class SeatMap(models.Model):
+    """Disponibilidad empaquetada de una función: 2 bits por celda (fila, columna).
+
+    Se lee junto con la función en una sola consulta y se mantiene desde
+    ``cinema.seatmap`` cada vez que cambia el estado de un boleto.
+    """
+    showtime      = models.OneToOneField(Showtime, on_delete=models.CASCADE, related_name='seat_map')
+    rows          = models.PositiveSmallIntegerField()
+    cols          = models.PositiveSmallIntegerField()
+    bits          = models.BinaryField(editable=False)
+    # Contadores que mantiene cinema.seatmap junto con los bits (ocupación sin COUNT(*))
+    seats         = models.PositiveIntegerField(default=0, editable=False)
+    sold          = models.PositiveIntegerField(default=0, editable=False)
+    # Tipo guardado en Seat de las butacas que no son del tipo por omisión ("fila-columna" → tipo)
+    seat_types    = models.JSONField(default=dict, editable=False)
+    updated       = models.DateTimeField(auto_now=True)
+
+    CELLS_PER_BYTE = 4
+
+    def __str__(self):
+        return f'Mapa de {self.showtime}'
+
+    @classmethod
+    def empty_bits(cls, rows: int, cols: int) -> bytearray:
+        return bytearray(-(-rows * cols // cls.CELLS_PER_BYTE))
+
+    def _locate(self, row: int, col: int) -> tuple[int, int]:
+        if not (1 <= row <= self.rows and 1 <= col <= self.cols):
+            raise IndexError(f'Celda fuera del layout: {row}-{col}')
+        index = (row - 1) * self.cols + (col - 1)
+        return index // self.CELLS_PER_BYTE, (index % self.CELLS_PER_BYTE) * 2
+
+    def get(self, row: int, col: int) -> int:
+        byte, shift = self._locate(row, col)
+        return (self.bits[byte] >> shift) & 0b11
+
+    def set(self, row: int, col: int, state: int) -> None:
+        if not isinstance(self.bits, bytearray):
+            self.bits = bytearray(self.bits)
+        byte, shift = self._locate(row, col)
+        self.bits[byte] = (self.bits[byte] & ~(0b11 << shift)) | (int(state) << shift)
+
+    def cells(self):
+        """Recorre todas las celdas en orden fila/columna."""
+        data = bytes(self.bits)
+        for index in range(self.rows * self.cols):
+            state = (data[index // self.CELLS_PER_BYTE] >> ((index % self.CELLS_PER_BYTE) * 2)) & 0b11
+            yield SeatCell(index // self.cols + 1, index % self.cols + 1, state)
+
+    def grid(self) -> dict[int, list[SeatCell]]:
+        """Filas → celdas; las filas sin ninguna butaca se omiten."""
+        grid: dict[int, list[SeatCell]] = {}
+        for cell in self.cells():
+            grid.setdefault(cell.row, []).append(cell)
+        return {row: cells for row, cells in grid.items() if any(c.is_seat for c in cells)}
+
+    def seat_type(self, row: int, col: int) -> str:
+        """Tipo de la butaca según ``Seat.seat_type`` (el mismo con el que se cobra)."""
+        return self.seat_types.get(f'{row}-{col}', DEFAULT_SEAT_TYPE)
+
+    @property
+    def has_seats(self) -> bool:
+        return any(self.bits)
+
+    @property
+    def occupancy(self) -> float:
+        """Fracción vendida (0–1) según los contadores."""
+        return self.sold / self.seats if self.seats else 0.0
+
+
 # ───────────────────────── SISTEMA DE COMIDAS / COMBOS ────────────────────
 class SnackCategory(models.Model):
     name = models.CharField(max_length=80)
@@ -155,6 +323,14 @@ class SnackItem(TimeStampedModel):
     image         = models.ImageField(upload_to='snacks/', blank=True)
     is_available  = models.BooleanField(default=True)
 
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            models.Index(fields=('is_available', 'name')),          # lista de snacks
+            # Destacados de la cartelera (disponibles, recientes primero)
+            models.Index(fields=('-updated',), name='snack_available_updated_idx',
+                         condition=models.Q(is_available=True)),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -172,7 +348,13 @@ class Order(TimeStampedModel):
     customer      = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, related_name='orders')
     payment_method= models.CharField(max_length=3, choices=PaymentMethod.choices)
     total_amount  = models.DecimalField(max_digits=8, decimal_places=2)
+    # Desnormalizados; los mantiene cinema.totals (no iterar líneas para mostrar montos)
+    ticket_total  = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    snack_total   = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    item_count    = models.PositiveIntegerField(default=0, help_text='Boletos + piezas de snack')
     paid_at       = models.DateTimeField(null=True, blank=True)
+    payment_ref   = models.CharField(max_length=64, blank=True, help_text='Referencia del cobro en la pasarela')
+    ticket_pdf    = models.FileField(upload_to='tickets/pdf/', blank=True, editable=False)  # se genera al pagar
 
     class Status(models.TextChoices):
         PENDING  = 'PEN', 'Pendiente'
@@ -180,6 +362,13 @@ class Order(TimeStampedModel):
         CANCELED = 'CAN', 'Cancelada'
     status        = models.CharField(max_length=3, choices=Status.choices, default=Status.PENDING)
 
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            models.Index(fields=('customer', 'status')),            # orden pendiente del cliente
+            models.Index(fields=('customer', '-created', '-id')),   # historial paginado
+            models.Index(fields=('updated', 'id')),                 # exportación incremental
+        ]
+
     def __str__(self):
         return f'Orden #{self.id} ({self.get_status_display()})'
 
@@ -210,6 +399,134 @@ class OrderSnack(models.Model):
         return f'{self.qty} × {self.snack} ({self.order})'
 
 
+# ──────────────────────────────── REPORTES ────────────────────────────────
+# Tablas resumen que mantiene cinema.reporting al pagarse cada orden; los
+# tableros leen de aquí y no de Ticket/Order.
+class SalesDaily(models.Model):
+    """Ventas pagadas por día (hora local de pago), cine y película."""
+    day            = models.DateField()
+    cinema         = models.ForeignKey(Cinema, on_delete=models.CASCADE, related_name='+')
+    movie          = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    orders         = models.PositiveIntegerField(default=0)
+    tickets        = models.PositiveIntegerField(default=0)
+    ticket_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    snack_orders   = models.PositiveIntegerField(default=0, help_text='Órdenes con boletos que además llevan snacks')
+    snack_revenue  = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = (('day', 'cinema', 'movie'),)
+
+    def __str__(self):
+        return f'{self.day} · {self.cinema_id} · {self.movie_id}'
+
+
+class ShowtimeSales(models.Model):
+    """Boletos pagados de una función contra las butacas de su sala."""
+    showtime      = models.OneToOneField(Showtime, on_delete=models.CASCADE, related_name='sales')
+    seats         = models.PositiveIntegerField(default=0)
+    tickets_sold  = models.PositiveIntegerField(default=0)
+    revenue       = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    @property
+    def occupancy(self) -> float:
+        return self.tickets_sold / self.seats if self.seats else 0.0
+
+    def __str__(self):
+        return f'Ventas de {self.showtime_id}'
+
+
+class PaymentDaily(models.Model):
+    """Órdenes pagadas (con o sin boletos) por día y forma de pago."""
+    day            = models.DateField()
+    payment_method = models.CharField(max_length=3, choices=PaymentMethod.choices)
+    orders         = models.PositiveIntegerField(default=0)
+    amount         = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = (('day', 'payment_method'),)
+
+    def __str__(self):
+        return f'{self.day} · {self.payment_method}'
+
+
+# ──────────────────────────────── LEALTAD ────────────────────────────────
+# Libro de puntos: sólo se agregan filas; el saldo vive en Customer.loyalty_pts
+# (lo mantiene cinema.loyalty con F()) y se concilia contra la suma del libro.
+class LoyaltyEntry(models.Model):
+    """Un movimiento de puntos; las entradas positivas son lotes que caducan."""
+
+    class Kind(models.TextChoices):
+        EARN     = 'ERN', 'Acumulación'
+        REDEEM   = 'RDM', 'Canje'
+        EXPIRE   = 'EXP', 'Vencimiento'
+        ADJUST   = 'ADJ', 'Ajuste'
+
+    customer      = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='loyalty_entries')
+    order         = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='loyalty_entries')
+    kind          = models.CharField(max_length=3, choices=Kind.choices)
+    points        = models.IntegerField(help_text='Positivo al acumular, negativo al canjear o vencer')
+    # Sólo lotes (points > 0): lo que aún no se canjea ni vence; se consume del que vence primero
+    remaining     = models.PositiveIntegerField(default=0, editable=False)
+    expires_at    = models.DateTimeField(null=True, blank=True)
+    created       = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('-created', '-id')
+        indexes = [
+            models.Index(fields=('customer', '-created', '-id')),   # historial del cliente
+            # Lotes vivos: lo que recorren el canje y el barrido de vencimientos
+            models.Index(fields=('expires_at', 'id'), name='loyalty_open_lot_idx',
+                         condition=models.Q(remaining__gt=0)),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.points:+d} ({self.customer_id})'
+
+
+# ──────────────────────────────── PRECIOS ─────────────────────────────────
+class PricingRule(TimeStampedModel):
+    """Ajuste sobre ``Showtime.base_price`` cuando la función y la butaca cumplen las condiciones.
+
+    Las condiciones vacías no filtran.  Las reglas que aplican se componen en
+    orden de ``priority``; ``cinema.pricing`` las compila en una tabla por función.
+    """
+
+    class Action(models.TextChoices):
+        MULTIPLY = 'MUL', 'Multiplicar por'
+        ADD      = 'ADD', 'Sumar'
+        SET      = 'SET', 'Fijar en'
+
+    name          = models.CharField(max_length=100)
+    priority      = models.PositiveSmallIntegerField(default=100, help_text='Las menores se aplican primero')
+    is_active     = models.BooleanField(default=True)
+    action        = models.CharField(max_length=3, choices=Action.choices, default=Action.MULTIPLY)
+    amount        = models.DecimalField(max_digits=8, decimal_places=3)
+    # Condiciones
+    seat_type     = models.CharField(max_length=20, blank=True, help_text='Vacío = cualquier butaca')
+    format        = models.CharField(max_length=10, blank=True, choices=SHOWTIME_FORMATS)
+    weekdays      = models.CharField(max_length=7, blank=True,
+                                     help_text='Días de la función, 0 = lunes … 6 = domingo; p. ej. "56"')
+    cinema        = models.ForeignKey(Cinema, on_delete=models.CASCADE, null=True, blank=True,
+                                      related_name='pricing_rules')
+    starts_from   = models.TimeField(null=True, blank=True, help_text='Hora local de inicio desde…')
+    starts_until  = models.TimeField(null=True, blank=True, help_text='…hasta (sin incluirla)')
+    min_occupancy = models.PositiveSmallIntegerField(
+        null=True, blank=True, validators=[MaxValueValidator(100)],
+        help_text='Sobreprecio: aplica desde este % de butacas vendidas',
+    )
+
+    class Meta:
+        ordering = ('priority', 'id')
+
+    def __str__(self):
+        return self.name
+
+    def clean(self):
+        if self.weekdays and not set(self.weekdays) <= set('0123456'):
+            raise ValidationError({'weekdays': 'Usa dígitos del 0 (lunes) al 6 (domingo).'})
+
+
 # ─────────────────────────────── NEWSLETTER ───────────────────────────────
 class NewsletterSubscriber(models.Model):
     email = models.EmailField(unique=True)
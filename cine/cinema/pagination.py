@@ -0,0 +1,38 @@
+# cinema/pagination.py
+"""Paginación por llave (keyset) sobre ``(created, id)`` descendente.
+
+A diferencia de ``OFFSET``, el costo de cada página no crece con la
+profundidad del historial: la siguiente página empieza justo después de la
+última fila vista, usando el índice ``(customer, -created)``.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Q
+
+
+def encode_cursor(obj) -> str:
+    """Cursor opaco ``<microsegundos>-<id>`` para la fila ``obj``."""
+    micros = int(obj.created.timestamp() * 1_000_000)
+    return f'{micros}-{obj.pk}'
+
+
+def decode_cursor(value: str | None) -> tuple[datetime, int] | None:
+    micros, _, pk = (value or '').partition('-')
+    if not (micros.isdigit() and pk.isdigit()):
+        return None
+    created = datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc)
+    return created, int(pk)
+
+
+def keyset_page(queryset, cursor: str | None, size: int):
+    """Devuelve ``(filas, cursor_siguiente)``; el queryset no debe venir ordenado."""
+    queryset = queryset.order_by('-created', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        created, pk = position
+        queryset = queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=pk))
+    rows = list(queryset[:size + 1])
+    next_cursor = encode_cursor(rows[size - 1]) if len(rows) > size else None
+    return rows[:size], next_cursor
@@ -0,0 +1,151 @@
+# cinema/pricing.py
+"""Precios dinámicos: reglas compiladas en una tabla de precios por función.
+
+Las :class:`~cinema.models.PricingRule` activas que aplican a una función
+(cine, formato, día, hora de inicio) se evalúan una sola vez y dan una
+:class:`PriceTable`: para cada tipo de butaca que nombra alguna regla —más
+un precio general para los demás tipos— el precio en cada nivel de
+ocupación.  Cotizar cientos de butacas es buscar en un diccionario.
+
+La tabla se guarda en el caché con una clave que incluye la versión de las
+reglas (``VERSION_KEY``; las señales la incrementan cuando cambia una
+regla) y la última modificación de la función (``base_price``, horario).
+Con ``LocMemCache`` la versión sólo sube en el worker que guardó la regla:
+``TIMEOUT`` es corto para que los demás dejen de cobrar precios viejos
+pronto; con un caché compartido el cambio se ve de inmediato en todos.
+El nivel de sobreprecio sale de los contadores del mapa de asientos
+(``SeatMap.sold``/``seats``, que mantiene ``cinema.seatmap``), nunca de un
+``COUNT(*)`` sobre ``Ticket``.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PricingRule, SeatMap, Showtime
+
+VERSION_KEY = 'pricing:version'
+TIMEOUT = 60         # segundos; cota de precios viejos en otros workers con caché local
+CENT = Decimal('0.01')
+Action = PricingRule.Action
+
+
+def _version() -> int:
+    return cache.get_or_set(VERSION_KEY, time.time_ns, timeout=None)
+
+
+def invalidate() -> None:
+    """Descarta todas las tablas; las señales lo llaman tras cada commit."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+# ──────────────────────────────── TABLAS ────────────────────────────────
+class Quote(dict):
+    """Precios vigentes ``tipo de butaca → precio``; los tipos sin regla propia dan ``default``."""
+
+    def __init__(self, prices: dict[str, Decimal], default: Decimal):
+        super().__init__(prices)
+        self.default = default
+
+    def __missing__(self, seat_type):
+        return self.default
+
+
+@dataclass(frozen=True)
+class PriceTable:
+    tiers: tuple[int, ...]                  # % vendido desde el que rige cada nivel; el primero es 0
+    prices: dict[str, tuple[Decimal, ...]]  # tipo de butaca → precio en cada nivel
+    default: tuple[Decimal, ...]            # tipos que ninguna regla nombra
+
+    @property
+    def has_surge(self) -> bool:
+        return len(self.tiers) > 1
+
+    def tier(self, sold: int, seats: int) -> int:
+        """Nivel vigente con ``sold`` de ``seats`` butacas vendidas (en enteros: sin redondeos)."""
+        if not seats:
+            return 0
+        return sum(1 for threshold in self.tiers if sold * 100 >= threshold * seats) - 1
+
+    def quote(self, sold: int = 0, seats: int = 0) -> Quote:
+        level = self.tier(sold, seats)
+        return Quote({seat_type: row[level] for seat_type, row in self.prices.items()}, self.default[level])
+
+
+def _applies(rule: PricingRule, showtime: Showtime, start) -> bool:
+    return (
+        (not rule.format or rule.format == showtime.format)
+        and (not rule.weekdays or str(start.weekday()) in rule.weekdays)
+        and (rule.starts_from is None or start.time() >= rule.starts_from)
+        and (rule.starts_until is None or start.time() < rule.starts_until)
+    )
+
+
+def _adjust(rule: PricingRule, price: Decimal) -> Decimal:
+    if rule.action == Action.MULTIPLY:
+        return price * rule.amount
+    if rule.action == Action.ADD:
+        return price + rule.amount
+    return rule.amount
+
+
+def compile_table(showtime: Showtime, rules: Iterable[PricingRule]) -> PriceTable:
+    """Evalúa ``rules`` (ya filtradas por cine y en orden de prioridad) para ``showtime``."""
+    start = timezone.localtime(showtime.start_time)
+    rules = [rule for rule in rules if _applies(rule, showtime, start)]
+    tiers = tuple(sorted({0, *(rule.min_occupancy for rule in rules if rule.min_occupancy)}))
+
+    def row(seat_type: str | None) -> tuple[Decimal, ...]:
+        prices = []
+        for tier in tiers:
+            price = showtime.base_price
+            for rule in rules:
+                if rule.seat_type in ('', seat_type) and (rule.min_occupancy or 0) <= tier:
+                    price = _adjust(rule, price)
+            prices.append(max(price, Decimal('0')).quantize(CENT, ROUND_HALF_UP))
+        return tuple(prices)
+
+    seat_types = {rule.seat_type for rule in rules if rule.seat_type}
+    return PriceTable(tiers, {seat_type: row(seat_type) for seat_type in seat_types}, row(None))
+
+
+def price_table(showtime: Showtime) -> PriceTable:
+    """Tabla de la función: del caché o compilada con una consulta."""
+    key = f'pricing:{_version()}:{showtime.pk}:{showtime.updated.timestamp()}'
+    table = cache.get(key)
+    if table is None:
+        rules = (
+            PricingRule.objects
+            .filter(is_active=True)
+            .filter(Q(cinema__isnull=True) | Q(cinema__auditoriums=showtime.auditorium_id))
+        )
+        table = compile_table(showtime, rules)
+        cache.set(key, table, TIMEOUT)
+    return table
+
+
+def quote(showtime: Showtime, seat_map: SeatMap | None = None) -> Quote:
+    """Precios vigentes de la función.
+
+    Con sobreprecios y sin ``seat_map`` se leen sólo sus contadores (una
+    consulta, sin bloquear: el nivel es el del momento de cotizar).
+    """
+    table = price_table(showtime)
+    if not table.has_surge:
+        return table.quote()
+    if seat_map is None:
+        sold, seats = (
+            SeatMap.objects.filter(showtime_id=showtime.pk).values_list('sold', 'seats').first() or (0, 0)
+        )
+    else:
+        sold, seats = seat_map.sold, seat_map.seats
+    return table.quote(sold, seats)
@@ -0,0 +1,218 @@
+# cinema/profiling.py
+"""Medición por petición: consultas SQL, tiempo en base, en plantillas y total.
+
+``ProfilingMiddleware`` abre un :class:`RequestProfile` por petición (en un
+``ContextVar``, así funciona igual en vistas síncronas y async) y al final lo
+acumula en :data:`registry` bajo el nombre de la URL (``seat_selection``,
+``order_confirm``…).  Las consultas se cuentan con un ``execute_wrapper``
+instalado en cada conexión y el render con el backend
+:class:`ProfilingTemplates`.
+
+``settings.QUERY_BUDGETS`` declara el máximo de consultas por vista
+(``'seat_selection'``) o por método y vista (``'POST seat_selection'``, que
+tiene prioridad); si una petición lo rebasa se registra un aviso, o se lanza
+:class:`QueryBudgetExceeded` con ``settings.QUERY_BUDGETS_STRICT`` (las pruebas
+lo activan).
+Los números se consultan en ``/metrics/``.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+class QueryBudgetExceeded(Exception):
+    """Una petición hizo más consultas que su presupuesto (sólo con ``QUERY_BUDGETS_STRICT``)."""
+
+
+_current: ContextVar[RequestProfile | None] = ContextVar('cinema_request_profile', default=None)
+
+
+@dataclass
+class RequestProfile:
+    view: str = ''
+    method: str = 'GET'
+    queries: int = 0
+    db_time: float = 0.0
+    template_time: float = 0.0
+    total: float = 0.0
+
+    @property
+    def budget(self) -> int | None:
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        return budgets.get(f'{self.method} {self.view}', budgets.get(self.view))
+
+    @property
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.queries > self.budget
+
+
+# ────────────────────────────── CONSULTAS ──────────────────────────────
+def _record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries += 1
+        profile.db_time += time.perf_counter() - started
+
+
+def _instrument(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def install() -> None:
+    """Engancha el contador a las conexiones actuales y a las que se abran después."""
+    connection_created.connect(_instrument, dispatch_uid='cinema_profiling')
+    for connection in connections.all(initialized_only=True):
+        _instrument(connection)
+
+
+# ────────────────────────────── PLANTILLAS ──────────────────────────────
+class _ProfiledTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            if profile is not None:
+                profile.template_time += time.perf_counter() - started
+
+
+class ProfilingTemplates(DjangoTemplates):
+    """``DjangoTemplates`` que suma el tiempo de render al perfil de la petición."""
+
+    def from_string(self, template_code):
+        return _ProfiledTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _ProfiledTemplate(super().get_template(template_name))
+
+
+# ────────────────────────────── AGREGADOS ──────────────────────────────
+class MetricsRegistry:
+    """Totales por vista y una muestra de latencias recientes para p50/p99."""
+
+    def __init__(self, samples: int = 1000):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = defaultdict(lambda: {
+                'requests': 0, 'queries': 0, 'queries_max': 0, 'db_time': 0.0,
+                'template_time': 0.0, 'over_budget': 0,
+                'latencies': deque(maxlen=self._samples),
+            })
+
+    def record(self, profile: RequestProfile) -> None:
+        with self._lock:
+            stats = self._stats[profile.view]
+            stats['requests'] += 1
+            stats['queries'] += profile.queries
+            stats['queries_max'] = max(stats['queries_max'], profile.queries)
+            stats['db_time'] += profile.db_time
+            stats['template_time'] += profile.template_time
+            stats['over_budget'] += profile.over_budget
+            stats['latencies'].append(profile.total)
+
+    def snapshot(self) -> dict:
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        with self._lock:
+            items = [(view, dict(stats), sorted(stats['latencies'])) for view, stats in self._stats.items()]
+        report = {}
+        for view, stats, latencies in sorted(items):
+            n = stats['requests']
+            pick = lambda pct: latencies[min(len(latencies) - 1, int(pct / 100 * len(latencies)))] * 1000
+            report[view] = {
+                'requests': n,
+                'queries_avg': round(stats['queries'] / n, 2),
+                'queries_max': stats['queries_max'],
+                'query_budget': budgets.get(view),
+                'over_budget': stats['over_budget'],
+                'db_ms_avg': round(stats['db_time'] / n * 1000, 2),
+                'template_ms_avg': round(stats['template_time'] / n * 1000, 2),
+                'total_ms_p50': round(pick(50), 2),
+                'total_ms_p99': round(pick(99), 2),
+            }
+        return report
+
+
+registry = MetricsRegistry()
+
+
+# ────────────────────────────── MIDDLEWARE ──────────────────────────────
+class ProfilingMiddleware:
+    """Va primero en ``MIDDLEWARE`` para medir también sesión y autenticación."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        install()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile, token, started = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile, started)
+
+    async def __acall__(self, request):
+        profile, token, started = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile, started)
+
+    def _start(self, request):
+        profile = RequestProfile(method=request.method)
+        request.profile = profile
+        return profile, _current.set(profile), time.perf_counter()
+
+    def _finish(self, request, response, profile, started):
+        profile.total = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        profile.view = (match.view_name if match else '') or 'sin_ruta'
+        registry.record(profile)
+        if profile.over_budget:
+            message = '%s %s hizo %d consultas (presupuesto: %d) en %s'
+            args = (profile.method, profile.view, profile.queries, profile.budget, request.path)
+            if getattr(settings, 'QUERY_BUDGETS_STRICT', False):
+                raise QueryBudgetExceeded(message % args)
+            logger.warning(message, *args)
+        response['Server-Timing'] = (
+            f'db;dur={profile.db_time * 1000:.1f};desc="{profile.queries} consultas", '
+            f'tpl;dur={profile.template_time * 1000:.1f}, total;dur={profile.total * 1000:.1f}'
+        )
+        return response
@@ -0,0 +1,167 @@
+# cinema/realtime.py
+"""Canal en vivo del mapa de asientos (Server-Sent Events sobre ASGI).
+
+:func:`cinema.seatmap.apply` publica, tras el commit, los cambios
+``(fila, columna, SeatState)`` de cada función; ``SeatStreamView`` los
+reenvía a los navegadores conectados a esa función.  Hay dos brokers,
+elegidos con ``settings.SEAT_EVENTS_BROKER``:
+
+* ``'local'``: colas ``asyncio`` en memoria; basta con un solo proceso ASGI.
+* ``'spool'``: un archivo por función en ``SEAT_EVENTS_SPOOL_DIR`` al que se
+  agregan líneas JSON; sirve como sustituto de un broker real cuando hay
+  varios workers en la misma máquina.
+
+Si un suscriptor se atrasa (cola llena, archivo rotado) recibe
+:data:`RESYNC` y la vista le vuelve a mandar el mapa completo.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import AsyncIterator, Iterable
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+RESYNC = object()   # marca: el suscriptor perdió eventos y debe pedir el mapa completo
+
+
+class LocalBroker:
+    """Difusión en el mismo proceso; ``publish`` puede llamarse desde cualquier hilo."""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)    # función → {(loop, cola)}
+        self._lock = threading.Lock()
+
+    def publish(self, showtime_id: int, changes: list) -> None:
+        with self._lock:
+            targets = list(self._subscribers.get(showtime_id, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, changes)
+            except RuntimeError:        # el loop ya cerró
+                pass
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, changes: list) -> None:
+        try:
+            queue.put_nowait(changes)
+        except asyncio.QueueFull:
+            # Cliente lento: tiramos lo pendiente y que se resincronice
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    async def subscribe(self, showtime_id: int) -> AsyncIterator:
+        entry = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers[showtime_id].add(entry)
+        try:
+            while True:
+                yield await entry[1].get()
+        finally:
+            with self._lock:
+                self._subscribers[showtime_id].discard(entry)
+                if not self._subscribers[showtime_id]:
+                    del self._subscribers[showtime_id]
+
+
+class SpoolBroker:
+    """Archivos de eventos compartidos por los workers de una máquina."""
+
+    def __init__(self, directory, max_bytes: int = 256 * 1024, poll_interval: float = 0.25):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+
+    def _path(self, showtime_id: int) -> Path:
+        return self.directory / f'{showtime_id}.jsonl'
+
+    def publish(self, showtime_id: int, changes: list) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        line = (json.dumps(changes, separators=(',', ':')) + '\n').encode()
+        fd = os.open(self._path(showtime_id), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            if os.fstat(fd).st_size > self.max_bytes:
+                os.ftruncate(fd, 0)     # los lectores lo notan y se resincronizan
+            os.write(fd, line)          # una sola escritura con O_APPEND: no se intercalan
+        finally:
+            os.close(fd)
+
+    async def subscribe(self, showtime_id: int) -> AsyncIterator:
+        path = self._path(showtime_id)
+        offset = path.stat().st_size if path.exists() else 0
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            if size < offset:
+                offset = 0
+                yield RESYNC
+            if size == offset:
+                continue
+            with path.open('rb') as fh:
+                fh.seek(offset)
+                data = fh.read()
+            # Sólo consumimos líneas completas
+            complete = data[:data.rfind(b'\n') + 1]
+            offset += len(complete)
+            for line in complete.splitlines():
+                yield json.loads(line)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        kind = getattr(settings, 'SEAT_EVENTS_BROKER', 'local')
+        if kind == 'spool':
+            _broker = SpoolBroker(settings.SEAT_EVENTS_SPOOL_DIR)
+        elif kind == 'local':
+            _broker = LocalBroker()
+        else:
+            raise ValueError(f'SEAT_EVENTS_BROKER desconocido: {kind!r}')
+    return _broker
+
+
+def _send(showtime_id: int, changes: list) -> None:
+    try:
+        get_broker().publish(showtime_id, changes)
+    except Exception:
+        # El canal en vivo es un extra: nunca debe tumbar una compra
+        logger.exception('No se pudo publicar el cambio de asientos de la función %s', showtime_id)
+
+
+def is_available(request) -> bool:
+    """¿Puede esta petición sostener el canal en vivo?
+
+    Bajo WSGI (``runserver``, gunicorn sync) Django consumiría el generador
+    infinito de eventos de forma síncrona y el worker quedaría tomado para
+    siempre; sólo ofrecemos el canal cuando el proyecto corre con ASGI.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def snapshot(seat_map) -> list:
+    """Todas las butacas del mapa como ``[fila, columna, estado]``."""
+    return [[cell.row, cell.col, cell.state] for cell in seat_map.cells() if cell.is_seat]
+
+
+def publish_changes(showtime_id: int, changes: Iterable[tuple[int, int, int]]) -> None:
+    """Agenda el envío de los cambios cuando la transacción actual confirme."""
+    changes = [[row, col, int(state)] for row, col, state in changes]
+    if changes:
+        transaction.on_commit(lambda: _send(showtime_id, changes))
@@ -0,0 +1,267 @@
+# cinema/reporting.py
+"""Reportes de ventas y ocupación sobre tablas resumen.
+
+Al pagarse una orden, :func:`record_paid` programa (para después del
+commit) su roll-up: unos cuantos ``UPDATE ... SET campo = campo + n`` sobre
+:class:`~cinema.models.SalesDaily` (día/cine/película),
+:class:`~cinema.models.ShowtimeSales` (por función) y
+:class:`~cinema.models.PaymentDaily` (día/forma de pago).  Los reportes
+(:func:`revenue`, :func:`occupancy`, :func:`attach_rate`,
+:func:`payment_mix`) sólo leen esas tablas.
+
+Si un roll-up se pierde (caída entre el commit y el ``on_commit``) o se
+cambian datos a mano, :func:`rebuild` recalcula todo desde las órdenes
+pagadas con agregados SQL (``manage.py rebuild_reports``).
+
+Los snacks de una orden se atribuyen a la primera de sus funciones (la de
+menor id); las órdenes sólo de snacks cuentan en ``PaymentDaily``.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Callable
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Order, OrderTicket, PaymentDaily, PaymentMethod, SalesDaily, Seat, ShowtimeSales, Ticket,
+)
+
+GROUPS = {'movie': ('movie_id', 'movie__title'), 'cinema': ('cinema_id', 'cinema__name'), 'day': ('day',)}
+
+
+def _midnight(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+# ─────────────────────────────── ROLL-UP ───────────────────────────────
+def _increment(model, keys: dict, create: Callable[[], dict] | None = None, **deltas) -> None:
+    """Suma ``deltas`` a la fila ``keys`` en un solo UPDATE; la crea si no existe."""
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**keys).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **(create() if create else {}), **deltas)
+    except IntegrityError:      # otro proceso la creó primero
+        model.objects.filter(**keys).update(**updates)
+
+
+def _seat_count(auditorium_id: int) -> dict:
+    return {'seats': Seat.objects.filter(auditorium_id=auditorium_id).count()}
+
+
+def rollup(order_id: int) -> None:
+    """Suma una orden pagada a las tablas resumen."""
+    order = (
+        Order.objects
+        .filter(pk=order_id, status=Order.Status.PAID)
+        .values('paid_at', 'payment_method', 'total_amount', 'snack_total')
+        .first()
+    )
+    if order is None:
+        return
+    day = timezone.localdate(order['paid_at'])
+    lines = list(
+        Ticket.objects
+        .filter(orderticket__order_id=order_id)
+        .values('showtime_id', 'showtime__auditorium_id', 'showtime__auditorium__cinema_id', 'showtime__movie_id')
+        .annotate(tickets=Count('id'), revenue=Sum('price'))
+        .order_by('showtime_id')
+    )
+    snacks = order['snack_total'] or Decimal('0')
+
+    with transaction.atomic():
+        _increment(PaymentDaily, {'day': day, 'payment_method': order['payment_method']},
+                   orders=1, amount=order['total_amount'])
+        for i, line in enumerate(lines):
+            first = i == 0
+            _increment(
+                SalesDaily,
+                {'day': day, 'cinema_id': line['showtime__auditorium__cinema_id'],
+                 'movie_id': line['showtime__movie_id']},
+                orders=1, tickets=line['tickets'], ticket_revenue=line['revenue'],
+                snack_orders=int(first and snacks > 0), snack_revenue=snacks if first else Decimal('0'),
+            )
+            _increment(
+                ShowtimeSales, {'showtime_id': line['showtime_id']},
+                create=lambda aud=line['showtime__auditorium_id']: _seat_count(aud),
+                tickets_sold=line['tickets'], revenue=line['revenue'],
+            )
+
+
+def record_paid(order: Order) -> None:
+    """Llamar cuando ``order`` pasa a PAGADA; el roll-up corre tras el commit."""
+    order_id = order.pk
+    transaction.on_commit(lambda: rollup(order_id))
+
+
+# ─────────────────────────────── REBUILD ───────────────────────────────
+def _first_showtime(field: str):
+    """Subconsulta: ``field`` de la primera función (menor id) de cada orden."""
+    return Subquery(
+        OrderTicket.objects
+        .filter(order=OuterRef('pk'))
+        .order_by('ticket__showtime_id')
+        .values(f'ticket__showtime__{field}')[:1]
+    )
+
+
+def rebuild(since: date | None = None) -> dict[str, int]:
+    """Recalcula las tablas resumen desde las órdenes pagadas (desde ``since`` si se da).
+
+    ``ShowtimeSales`` se recalcula completa: se agrupa por función, no por día.
+    """
+    paid = Order.objects.filter(status=Order.Status.PAID, paid_at__isnull=False)
+    if since is not None:
+        paid = paid.filter(paid_at__gte=_midnight(since))
+
+    sales = defaultdict(lambda: dict(orders=0, tickets=0, ticket_revenue=Decimal('0'),
+                                     snack_orders=0, snack_revenue=Decimal('0')))
+    for row in (
+        Ticket.objects
+        .filter(orderticket__order__in=paid)
+        .annotate(day=TruncDate('orderticket__order__paid_at'))
+        .values('day', 'showtime__auditorium__cinema_id', 'showtime__movie_id')
+        .annotate(orders=Count('orderticket__order', distinct=True), tickets=Count('id'), revenue=Sum('price'))
+        .order_by()
+    ):
+        entry = sales[row['day'], row['showtime__auditorium__cinema_id'], row['showtime__movie_id']]
+        entry.update(orders=row['orders'], tickets=row['tickets'], ticket_revenue=row['revenue'])
+    for row in (
+        paid
+        .filter(snack_total__gt=0)
+        .annotate(day=TruncDate('paid_at'), cinema_id=_first_showtime('auditorium__cinema_id'),
+                  movie_id=_first_showtime('movie_id'))
+        .exclude(movie_id=None)
+        .values('day', 'cinema_id', 'movie_id')
+        .annotate(snack_orders=Count('id'), snack_revenue=Sum('snack_total'))
+        .order_by()
+    ):
+        entry = sales[row['day'], row['cinema_id'], row['movie_id']]
+        entry.update(snack_orders=row['snack_orders'], snack_revenue=row['snack_revenue'])
+
+    payments = (
+        paid
+        .annotate(day=TruncDate('paid_at'))
+        .values('day', 'payment_method')
+        .annotate(orders=Count('id'), amount=Sum('total_amount'))
+        .order_by()
+    )
+    showtimes = (
+        Ticket.objects
+        .filter(orderticket__order__status=Order.Status.PAID)
+        .values('showtime_id', 'showtime__auditorium_id')
+        .annotate(tickets_sold=Count('id'), revenue=Sum('price'))
+        .order_by()
+    )
+    seats = dict(
+        Seat.objects.order_by().values('auditorium_id').annotate(n=Count('id')).values_list('auditorium_id', 'n')
+    )
+
+    with transaction.atomic():
+        stale_sales, stale_payments = SalesDaily.objects.all(), PaymentDaily.objects.all()
+        if since is not None:
+            stale_sales, stale_payments = stale_sales.filter(day__gte=since), stale_payments.filter(day__gte=since)
+        stale_sales.delete()
+        stale_payments.delete()
+        ShowtimeSales.objects.all().delete()
+        created = {
+            'sales': len(SalesDaily.objects.bulk_create(
+                [SalesDaily(day=day, cinema_id=cinema_id, movie_id=movie_id, **values)
+                 for (day, cinema_id, movie_id), values in sales.items()],
+                batch_size=1000,
+            )),
+            'payments': len(PaymentDaily.objects.bulk_create(
+                [PaymentDaily(**row) for row in payments], batch_size=1000,
+            )),
+            'showtimes': len(ShowtimeSales.objects.bulk_create(
+                [ShowtimeSales(showtime_id=row['showtime_id'], seats=seats.get(row['showtime__auditorium_id'], 0),
+                               tickets_sold=row['tickets_sold'], revenue=row['revenue'])
+                 for row in showtimes],
+                batch_size=1000,
+            )),
+        }
+    return created
+
+
+# ─────────────────────────────── LECTURA ───────────────────────────────
+def revenue(start: date, end: date, by: str = 'movie') -> list[dict]:
+    """Ingresos por ``movie``, ``cinema`` o ``day`` entre ``start`` y ``end`` (inclusive)."""
+    rows = (
+        SalesDaily.objects
+        .filter(day__range=(start, end))
+        .values(*GROUPS[by])
+        .annotate(orders=Sum('orders'), tickets=Sum('tickets'),
+                  ticket_revenue=Sum('ticket_revenue'), snack_revenue=Sum('snack_revenue'))
+        .order_by(*GROUPS[by][:1])
+    )
+    report = [{**row, 'revenue': row['ticket_revenue'] + row['snack_revenue']} for row in rows]
+    if by != 'day':
+        report.sort(key=lambda row: row['revenue'], reverse=True)
+    return report
+
+
+def occupancy(start: date, end: date, cinema_id: int | None = None) -> list[dict]:
+    """Ocupación (boletos pagados ÷ butacas) de las funciones que empiezan en el rango."""
+    rows = ShowtimeSales.objects.filter(
+        showtime__start_time__gte=_midnight(start),
+        showtime__start_time__lt=_midnight(end + timedelta(days=1)),
+    ).select_related('showtime__movie', 'showtime__auditorium__cinema').order_by('showtime__start_time')
+    if cinema_id is not None:
+        rows = rows.filter(showtime__auditorium__cinema_id=cinema_id)
+    return [
+        {
+            'showtime': row.showtime_id,
+            'movie': row.showtime.movie.title,
+            'cinema': row.showtime.auditorium.cinema.name,
+            'start_time': row.showtime.start_time.isoformat(),
+            'seats': row.seats,
+            'tickets_sold': row.tickets_sold,
+            'occupancy': round(row.occupancy, 4),
+        }
+        for row in rows
+    ]
+
+
+def attach_rate(start: date, end: date) -> float:
+    """Fracción de órdenes con boletos que también llevan snacks."""
+    totals = SalesDaily.objects.filter(day__range=(start, end)).aggregate(
+        orders=Sum('orders'), snack_orders=Sum('snack_orders'),
+    )
+    return (totals['snack_orders'] or 0) / totals['orders'] if totals['orders'] else 0.0
+
+
+def payment_mix(start: date, end: date) -> list[dict]:
+    rows = list(
+        PaymentDaily.objects
+        .filter(day__range=(start, end))
+        .values('payment_method')
+        .annotate(orders=Sum('orders'), amount=Sum('amount'))
+        .order_by('-amount')
+    )
+    total = sum(row['amount'] for row in rows)
+    labels = dict(PaymentMethod.choices)
+    return [
+        {**row, 'label': labels.get(row['payment_method'], row['payment_method']),
+         'share': round(float(row['amount'] / total), 4) if total else 0.0}
+        for row in rows
+    ]
+
+
+def summary(start: date, end: date) -> dict:
+    return {
+        'desde': start.isoformat(),
+        'hasta': end.isoformat(),
+        'revenue_by_movie': revenue(start, end, 'movie'),
+        'revenue_by_cinema': revenue(start, end, 'cinema'),
+        'revenue_by_day': revenue(start, end, 'day'),
+        'occupancy': occupancy(start, end),
+        'snack_attach_rate': round(attach_rate(start, end), 4),
+        'payment_mix': payment_mix(start, end),
+    }
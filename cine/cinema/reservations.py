@@ -0,0 +1,127 @@
+# cinema/reservations.py
+"""Reserva masiva de asientos para una función.
+
+``reserve_seats`` aparta N butacas con un número fijo de consultas: bloquea
+los boletos existentes con ``select_for_update``, reutiliza los cancelados
+con ``bulk_update`` y crea el resto con ``bulk_create``.  Si dos compradores
+compiten por la misma butaca, la restricción ``unique_together
+(showtime, seat)`` y el bloqueo de fila garantizan que sólo uno gane; el
+otro recibe :class:`SeatUnavailable`.
+
+Cada boleto lleva el precio de su tipo de butaca según la tabla de la
+función (``cinema.pricing``), cotizada una sola vez por reserva.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import pricing, seatmap
+from .holds import hold_deadline
+from .models import (
+    Customer, Order, OrderTicket, ReservationStatus, Seat, SeatState, Showtime, Ticket,
+)
+
+
+class SeatUnavailable(Exception):
+    """Alguna de las butacas pedidas no existe o ya está apartada/vendida."""
+
+    def __init__(self, cells: Iterable[tuple[int, int]]):
+        self.cells = sorted(cells)
+        labels = ', '.join(f'{r}-{c}' for r, c in self.cells)
+        super().__init__(f'Asientos no disponibles: {labels}')
+
+
+def reserve_seats(showtime: Showtime, customer: Customer, cells: Iterable[tuple[int, int]]) -> Order:
+    """Aparta las butacas ``(fila, columna)`` y devuelve la orden PENDIENTE creada.
+
+    El apartado caduca a los ``SEAT_HOLD_MINUTES``; ver ``cinema.holds``.
+    """
+    cells = set(cells)
+    if not cells:
+        raise ValueError('Se requiere al menos un asiento.')
+
+    with transaction.atomic():
+        # 1) Resolvemos las butacas de la sala (una consulta, filtro por superset)
+        seats, seat_type = {}, {}
+        for sid, row, col, kind in (
+            Seat.objects
+            .filter(auditorium_id=showtime.auditorium_id,
+                    row__in={r for r, _ in cells}, col__in={c for _, c in cells})
+            .values_list('id', 'row', 'col', 'seat_type')
+        ):
+            if (row, col) in cells:
+                seats[(row, col)], seat_type[sid] = sid, kind
+        if len(seats) != len(cells):
+            raise SeatUnavailable(cells - seats.keys())
+        seat_ids = sorted(seats.values())       # orden fijo → menos interbloqueos
+        cell_of = {sid: cell for cell, sid in seats.items()}
+        prices = pricing.quote(showtime)
+
+        # 2) Bloqueamos los boletos que ya existan para esas butacas
+        existing = list(
+            Ticket.objects
+            .select_for_update()
+            .filter(showtime=showtime, seat_id__in=seat_ids)
+            .order_by('seat_id')
+        )
+        held = [t for t in existing if t.status != ReservationStatus.CANCELED]
+        if held:
+            raise SeatUnavailable(cell_of[t.seat_id] for t in held)
+
+        # 3) Reutilizamos los cancelados
+        now = timezone.now()
+        expires = hold_deadline(now)
+        if existing:
+            for ticket in existing:
+                ticket.status   = ReservationStatus.RESERVED
+                ticket.customer = customer
+                ticket.price    = prices[seat_type[ticket.seat_id]]
+                ticket.hold_expires_at = expires
+                ticket.updated  = now
+            Ticket.objects.bulk_update(
+                existing, ['status', 'customer', 'price', 'hold_expires_at', 'updated']
+            )
+            OrderTicket.objects.filter(ticket__in=existing).delete()
+
+        # 4) Creamos los que faltan; un choque en la restricción única = butaca ganada por otro
+        reused = {t.seat_id for t in existing}
+        new_tickets = [
+            Ticket(showtime=showtime, seat_id=sid, customer=customer,
+                   status=ReservationStatus.RESERVED, price=prices[seat_type[sid]],
+                   hold_expires_at=expires)
+            for sid in seat_ids if sid not in reused
+        ]
+        if new_tickets:
+            try:
+                with transaction.atomic():
+                    Ticket.objects.bulk_create(new_tickets)
+            except IntegrityError:
+                raise SeatUnavailable(cell_of[t.seat_id] for t in new_tickets)
+
+        # 5) Orden y líneas (los ids se releen: MySQL no los devuelve en bulk_create)
+        ticket_ids = list(
+            Ticket.objects
+            .filter(showtime=showtime, seat_id__in=seat_ids)
+            .order_by()
+            .values_list('id', flat=True)
+        )
+        total = sum((prices[seat_type[sid]] for sid in seat_ids), Decimal('0'))
+        order = Order.objects.create(
+            customer=customer,
+            total_amount=total,
+            ticket_total=total,
+            item_count=len(ticket_ids),
+            status=Order.Status.PENDING,
+        )
+        OrderTicket.objects.bulk_create(
+            [OrderTicket(order=order, ticket_id=tid) for tid in ticket_ids]
+        )
+
+        # 6) Mapa de disponibilidad (mismas transacción y bloqueo)
+        seatmap.apply(showtime.pk, [(row, col, SeatState.HELD) for row, col in seats])
+
+    return order
@@ -0,0 +1,200 @@
+# cinema/scheduling.py
+"""Programación de funciones sin empalmes.
+
+Cada función ocupa su sala de ``start_time`` a ``end_time`` (duración de la
+película + ``SHOWTIME_CLEANING_MINUTES``).  Para revisar una sola función
+basta la consulta por rango de :func:`find_conflicts`; para programar una
+semana entera de muchas salas, :func:`schedule` carga las funciones
+existentes del periodo en un :class:`IntervalIndex` (listas ordenadas +
+``bisect``) y valida todas las propuestas en memoria antes de un único
+``bulk_create``.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Hashable, Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import cartelera, facets
+from .models import Movie, Showtime
+
+
+def cleaning_buffer() -> timedelta:
+    return timedelta(minutes=getattr(settings, 'SHOWTIME_CLEANING_MINUTES', 15))
+
+
+def occupied_until(start: datetime, duration_min: int) -> datetime:
+    """Momento en que la sala queda libre tras una función."""
+    return start + timedelta(minutes=duration_min) + cleaning_buffer()
+
+
+def find_conflicts(showtime: Showtime) -> list[Showtime]:
+    """Funciones de la misma sala que se empalman con ``showtime`` (consulta por rango)."""
+    end = occupied_until(showtime.start_time, showtime.movie.duration_min)
+    return list(
+        Showtime.objects
+        .select_related('movie')
+        .filter(auditorium_id=showtime.auditorium_id,
+                start_time__lt=end, end_time__gt=showtime.start_time)
+        .exclude(pk=showtime.pk)
+        .order_by('start_time')
+    )
+
+
+# ──────────────────────────── ÍNDICE DE INTERVALOS ────────────────────────────
+class IntervalIndex:
+    """Intervalos ``[inicio, fin)`` por sala, ordenados por inicio.
+
+    Un intervalo que empieza antes de ``s - longitud_máxima`` no puede
+    terminar después de ``s``, así que cada búsqueda sólo recorre los
+    vecinos cercanos al punto de ``bisect``.
+    """
+
+    def __init__(self):
+        self._rooms = defaultdict(list)     # sala → [(inicio, fin, etiqueta)]
+        self._longest = defaultdict(timedelta)
+
+    def add(self, room: Hashable, start: datetime, end: datetime, label=None) -> None:
+        insort(self._rooms[room], (start, end, label), key=lambda item: item[0])
+        self._longest[room] = max(self._longest[room], end - start)
+
+    def overlapping(self, room: Hashable, start: datetime, end: datetime) -> list:
+        """Etiquetas de los intervalos de ``room`` que se cruzan con ``[start, end)``."""
+        items = self._rooms.get(room)
+        if not items:
+            return []
+        floor = start - self._longest[room]
+        found = []
+        for i in range(bisect_left(items, end, key=lambda item: item[0]) - 1, -1, -1):
+            other_start, other_end, label = items[i]
+            if other_start <= floor:
+                break
+            if other_end > start:
+                found.append(label)
+        found.reverse()
+        return found
+
+    def __len__(self):
+        return sum(len(items) for items in self._rooms.values())
+
+
+# ──────────────────────────── PROGRAMACIÓN MASIVA ────────────────────────────
+@dataclass(frozen=True)
+class ShowtimeSlot:
+    """Una función propuesta."""
+    auditorium_id: int
+    movie_id: int
+    start_time: datetime
+    language: str = 'SUB'
+    format: str = '2D'
+    base_price: Decimal = Decimal('0.00')
+
+
+@dataclass
+class Conflict:
+    slot: ShowtimeSlot
+    reason: str
+
+    def __str__(self):
+        return f'Sala {self.slot.auditorium_id} {self.slot.start_time:%d/%m %H:%M}: {self.reason}'
+
+
+@dataclass
+class ScheduleResult:
+    created: list[Showtime] = field(default_factory=list)
+    conflicts: list[Conflict] = field(default_factory=list)
+
+    def __str__(self):
+        return f'{len(self.created)} funciones programadas, {len(self.conflicts)} conflictos'
+
+
+def load_index(auditorium_ids: Iterable[int], start: datetime, end: datetime) -> IntervalIndex:
+    """Índice con las funciones ya guardadas que tocan ``[start, end)`` (una consulta)."""
+    index = IntervalIndex()
+    rows = (
+        Showtime.objects
+        .filter(auditorium_id__in=list(auditorium_ids), start_time__lt=end, end_time__gt=start)
+        .values_list('auditorium_id', 'start_time', 'end_time', 'movie__title')
+    )
+    for aud_id, other_start, other_end, title in rows:
+        index.add(aud_id, other_start, other_end, f'{title} {other_start:%d/%m %H:%M}')
+    return index
+
+
+def schedule(slots: Iterable[ShowtimeSlot], commit: bool = True) -> ScheduleResult:
+    """Valida las funciones propuestas contra las existentes y entre sí, y crea las válidas.
+
+    Hace tres consultas más el ``bulk_create``, sin importar cuántas salas o
+    funciones sean.  Con ``commit=False`` sólo reporta.
+    """
+    slots = sorted(slots, key=lambda s: (s.auditorium_id, s.start_time))
+    result = ScheduleResult()
+    if not slots:
+        return result
+
+    durations = dict(
+        Movie.objects.filter(id__in={s.movie_id for s in slots}).values_list('id', 'duration_min')
+    )
+    buffer = cleaning_buffer()
+    window_end = max(s.start_time for s in slots) + timedelta(minutes=max(durations.values(), default=0)) + buffer
+    index = load_index({s.auditorium_id for s in slots}, min(s.start_time for s in slots), window_end)
+
+    for slot in slots:
+        if slot.movie_id not in durations:
+            result.conflicts.append(Conflict(slot, f'No existe la película {slot.movie_id}.'))
+            continue
+        end = slot.start_time + timedelta(minutes=durations[slot.movie_id]) + buffer
+        clashes = index.overlapping(slot.auditorium_id, slot.start_time, end)
+        if clashes:
+            result.conflicts.append(Conflict(slot, 'Se empalma con ' + ', '.join(map(str, clashes))))
+            continue
+        index.add(slot.auditorium_id, slot.start_time, end, f'propuesta {slot.start_time:%d/%m %H:%M}')
+        result.created.append(Showtime(
+            auditorium_id=slot.auditorium_id, movie_id=slot.movie_id, start_time=slot.start_time,
+            end_time=end, language=slot.language, format=slot.format, base_price=slot.base_price,
+        ))
+
+    if commit:
+        create_showtimes(result.created)
+    return result
+
+
+def create_showtimes(showtimes: list[Showtime], batch_size: int = 1000) -> None:
+    """``bulk_create`` de funciones ya validadas (con ``end_time``) y aviso a los cachés."""
+    if not showtimes:
+        return
+    with transaction.atomic():
+        Showtime.objects.bulk_create(showtimes, batch_size=batch_size)
+        # bulk_create no manda post_save
+        transaction.on_commit(cartelera.invalidate)
+        transaction.on_commit(facets.invalidate)
+
+
+def week_slots(week_start: date, plan: dict[int, Iterable[tuple]], days: int = 7) -> list[ShowtimeSlot]:
+    """Expande un plan diario por sala a ``days`` días desde ``week_start``.
+
+    ``plan`` mapea ``auditorium_id`` a tuplas ``(hora, movie_id, idioma,
+    formato, precio)``, donde ``hora`` es un ``datetime.time`` local.
+    """
+    tz = timezone.get_current_timezone()
+    slots = []
+    for offset in range(days):
+        day = week_start + timedelta(days=offset)
+        for aud_id, entries in plan.items():
+            for at, movie_id, language, fmt, price in entries:
+                start = timezone.make_aware(datetime.combine(day, at), tz)
+                slots.append(ShowtimeSlot(aud_id, movie_id, start, language, fmt, Decimal(price)))
+    return slots
+
+
+def schedule_week(week_start: date, plan: dict[int, Iterable[tuple]], days: int = 7,
+                  commit: bool = True) -> ScheduleResult:
+    """Programa una semana para muchas salas en una sola llamada; ver :func:`week_slots`."""
+    return schedule(week_slots(week_start, plan, days), commit=commit)
@@ -0,0 +1,247 @@
+# cinema/search.py
+"""Búsqueda de películas con un índice invertido en memoria.
+
+Se indexan ``title``, ``original_title``, ``synopsis`` y los nombres de
+``Genre`` de las películas activas.  Los textos se pliegan (minúsculas, sin
+acentos) antes de tokenizar, así "accion" encuentra "Acción".  Cada término
+de la consulta se resuelve por coincidencia exacta, por prefijo (lista
+ordenada de términos + ``bisect``) o, si no existe, con un error de una letra
+(diccionario de borrados simétricos, sólo para títulos y géneros).
+
+El índice vive en cada proceso y se arma la primera vez que se usa.  Las
+señales de ``Movie``/``Genre`` lo actualizan en el proceso que hizo el
+cambio y suben un número de versión en el caché; los demás procesos ven la
+versión nueva y lo reconstruyen (para eso el caché debe ser compartido: con
+``LocMemCache`` cada worker sólo ve sus propios cambios).  Dentro del proceso
+las búsquedas y las actualizaciones se turnan el mismo candado.
+"""
+from __future__ import annotations
+
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Iterable
+
+from django.core.cache import cache
+
+from .models import Movie
+
+VERSION_KEY = 'search:version'
+FIELD_WEIGHTS = {'title': 5.0, 'original_title': 4.0, 'genres': 2.0, 'synopsis': 1.0}
+TYPO_FIELDS = ('title', 'original_title', 'genres')
+PREFIX_WEIGHT = 0.7
+TYPO_WEIGHT = 0.5
+MAX_EXPANSIONS = 50
+MIN_TYPO_LENGTH = 4
+
+_TOKEN = re.compile(r'\w+')
+
+
+def fold(text: str | None) -> str:
+    """Minúsculas y sin diacríticos: 'Acción' → 'accion'."""
+    text = text or ''
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(fold(text))
+
+
+def _deletes(term: str) -> set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+class MovieIndex:
+    """Índice invertido: término → {movie_id: peso}."""
+
+    def __init__(self):
+        self.postings: dict[str, dict[int, float]] = defaultdict(dict)
+        self.terms: list[str] = []                              # ordenados, para prefijos
+        self.typos: dict[str, set[str]] = defaultdict(set)      # borrado → términos
+        self.docs: dict[int, tuple[dict, str]] = {}             # id → (pesos, título)
+        self.version = None
+
+    # ── escritura ──
+    def add(self, movie_id: int, title: str, fields: dict[str, str], keep_sorted: bool = True) -> None:
+        """Indexa una película; en cargas masivas ``keep_sorted=False`` y luego :meth:`sort_terms`."""
+        self.remove(movie_id)
+        weights: dict[str, float] = defaultdict(float)
+        typo_terms = set()
+        for name, text in fields.items():
+            for term in tokenize(text):
+                weights[term] = max(weights[term], FIELD_WEIGHTS[name])
+                if name in TYPO_FIELDS:
+                    typo_terms.add(term)
+        for term, weight in weights.items():
+            if keep_sorted and term not in self.postings:
+                insort(self.terms, term)
+            self.postings[term][movie_id] = weight
+        for term in typo_terms:
+            if len(term) >= MIN_TYPO_LENGTH:
+                for variant in _deletes(term):
+                    self.typos[variant].add(term)
+        self.docs[movie_id] = (dict(weights), title)
+
+    def sort_terms(self) -> None:
+        self.terms = sorted(self.postings)
+
+    def remove(self, movie_id: int) -> None:
+        entry = self.docs.pop(movie_id, None)
+        if entry is None:
+            return
+        for term in entry[0]:
+            docs = self.postings[term]
+            docs.pop(movie_id, None)
+            if not docs:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+                # Las variantes de borrado huérfanas no estorban: se filtran al buscar
+
+    # ── lectura ──
+    def _expand(self, token: str, last: bool) -> dict[str, float]:
+        """Términos del índice que cubren ``token`` → factor de coincidencia."""
+        matches = {}
+        if token in self.postings:
+            matches[token] = 1.0
+        if last or not matches:
+            start = bisect_left(self.terms, token)
+            for term in self.terms[start:start + MAX_EXPANSIONS + 1]:
+                if not term.startswith(token):
+                    break
+                matches.setdefault(term, PREFIX_WEIGHT)
+        if not matches and len(token) >= MIN_TYPO_LENGTH:
+            candidates = set(self.typos.get(token, ()))         # a la consulta le falta una letra
+            for variant in _deletes(token):
+                candidates.add(variant)                         # le sobra una letra
+                candidates.update(self.typos.get(variant, ()))  # letra cambiada o traspuesta
+            for term in candidates:
+                if term in self.postings:
+                    matches.setdefault(term, TYPO_WEIGHT)
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> list[tuple[int, float]]:
+        """``[(movie_id, puntaje)]`` de las películas que cubren todos los términos."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        per_token = []
+        for i, token in enumerate(tokens):
+            scores: dict[int, float] = {}
+            for term, factor in self._expand(token, last=i == len(tokens) - 1).items():
+                for movie_id, weight in self.postings.get(term, {}).items():
+                    score = weight * factor
+                    if score > scores.get(movie_id, 0):
+                        scores[movie_id] = score
+            if not scores:
+                return []
+            per_token.append(scores)
+
+        per_token.sort(key=len)
+        totals = dict(per_token[0])
+        for scores in per_token[1:]:
+            totals = {mid: total + scores[mid] for mid, total in totals.items() if mid in scores}
+        return heapq.nsmallest(limit, totals.items(), key=lambda item: (-item[1], self.docs[item[0]][1]))
+
+    def __len__(self):
+        return len(self.docs)
+
+
+# ─────────────────────────────── CARGA ───────────────────────────────
+def _movie_fields(movie_ids: Iterable[int] | None = None) -> Iterable[tuple[int, str, dict]]:
+    """Textos de las películas activas en dos consultas."""
+    movies = Movie.objects.filter(is_active=True)
+    links = Movie.genres.through.objects.all()
+    if movie_ids is not None:
+        movies = movies.filter(id__in=list(movie_ids))
+        links = links.filter(movie_id__in=list(movie_ids))
+    genres = defaultdict(list)
+    for movie_id, name in links.values_list('movie_id', 'genre__name'):
+        genres[movie_id].append(name)
+    for movie_id, title, original, synopsis in (
+        movies.values_list('id', 'title', 'original_title', 'synopsis').iterator(chunk_size=2000)
+    ):
+        yield movie_id, title, {
+            'title': title, 'original_title': original,
+            'synopsis': synopsis, 'genres': ' '.join(genres[movie_id]),
+        }
+
+
+def build() -> MovieIndex:
+    index = MovieIndex()
+    index.version = cache.get_or_set(VERSION_KEY, time.time_ns, timeout=None)
+    for movie_id, title, fields in _movie_fields():
+        index.add(movie_id, title, fields, keep_sorted=False)
+    index.sort_terms()
+    return index
+
+
+_index: MovieIndex | None = None
+_lock = threading.Lock()
+
+
+def get_index() -> MovieIndex:
+    """Índice del proceso; se reconstruye si otro proceso cambió el catálogo."""
+    global _index
+    version = cache.get(VERSION_KEY)
+    if _index is None or (version is not None and version != _index.version):
+        with _lock:
+            if _index is None or (version is not None and version != _index.version):
+                _index = build()
+    return _index
+
+
+def search(query: str, limit: int = 20) -> list[tuple[int, float]]:
+    index = get_index()
+    with _lock:     # reindex() modifica el índice en sitio desde on_commit
+        return index.search(query, limit)
+
+
+def suggest(query: str, limit: int = 10) -> list[tuple[int, str]]:
+    """``[(movie_id, título)]`` sin tocar la base (autocompletado)."""
+    index = get_index()
+    with _lock:
+        return [(movie_id, index.docs[movie_id][1]) for movie_id, _ in index.search(query, limit)]
+
+
+def _bump() -> int | None:
+    """Sube la versión compartida; ``None`` si hubo que reiniciarla."""
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+        return None
+
+
+def invalidate() -> None:
+    """Descarta el índice en todos los procesos; se reconstruye al usarlo."""
+    global _index
+    with _lock:
+        _bump()
+        _index = None
+
+
+def reindex(movie_ids: Iterable[int]) -> None:
+    """Actualiza ``movie_ids`` en el índice local y avisa a los demás procesos."""
+    global _index
+    movie_ids = set(movie_ids)
+    with _lock:
+        version = _bump()
+        if _index is None:
+            return
+        if version is None or version != _index.version + 1:
+            _index = None       # otro proceso también cambió algo: se reconstruye al usarlo
+            return
+        found = set()
+        for movie_id, title, fields in _movie_fields(movie_ids):
+            _index.add(movie_id, title, fields)
+            found.add(movie_id)
+        for movie_id in movie_ids - found:      # borradas o inactivas
+            _index.remove(movie_id)
+        _index.version = version
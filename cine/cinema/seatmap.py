@@ -0,0 +1,95 @@
+# cinema/seatmap.py
+"""Construcción y sincronización del mapa de disponibilidad por función.
+
+El mapa (``SeatMap``) guarda 2 bits por celda del layout de la sala, de modo
+que la página de asientos se pinta leyendo una sola fila en lugar de recorrer
+las tablas ``Seat`` y ``Ticket``.  Todo cambio de estado de un boleto debe
+pasar por :func:`apply` (los ``save()`` individuales lo hacen vía señales;
+las operaciones masivas deben llamarlo explícitamente), que además publica
+el cambio en el canal en vivo (``cinema.realtime``).  Junto con los bits se
+mantienen los contadores ``seats``/``sold`` que usan los sobreprecios por
+ocupación (``cinema.pricing``) y el tipo guardado de cada butaca, para
+mostrar el mismo precio con el que ``reserve_seats`` cobra.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from django.db import IntegrityError, transaction
+
+from . import realtime
+
+from .models import (
+    DEFAULT_SEAT_TYPE, ReservationStatus, Seat, SeatMap, SeatState, Showtime, Ticket, TICKET_SEAT_STATE,
+)
+
+
+def build(showtime: Showtime) -> SeatMap:
+    """Calcula el mapa desde ``Seat``/``Ticket`` y lo persiste."""
+    aud = showtime.auditorium
+    seat_map = SeatMap(showtime=showtime, rows=aud.total_rows, cols=aud.total_cols,
+                       bits=SeatMap.empty_bits(aud.total_rows, aud.total_cols))
+
+    for row, col, seat_type in Seat.objects.filter(auditorium_id=aud.pk).values_list('row', 'col', 'seat_type'):
+        if row <= aud.total_rows and col <= aud.total_cols:
+            seat_map.set(row, col, SeatState.FREE)
+            if seat_type != DEFAULT_SEAT_TYPE:
+                seat_map.seat_types[f'{row}-{col}'] = seat_type
+
+    tickets = (
+        Ticket.objects
+        .filter(showtime_id=showtime.pk)
+        .exclude(status=ReservationStatus.CANCELED)
+        .values_list('seat__row', 'seat__col', 'status')
+    )
+    for row, col, status in tickets:
+        if row <= aud.total_rows and col <= aud.total_cols:
+            seat_map.set(row, col, TICKET_SEAT_STATE[status])
+
+    states = [cell.state for cell in seat_map.cells()]
+    seat_map.seats = len(states) - states.count(SeatState.EMPTY)
+    seat_map.sold = states.count(SeatState.SOLD)
+    try:
+        with transaction.atomic():
+            seat_map.save()
+    except IntegrityError:
+        # Otro proceso lo construyó primero: usamos el suyo.
+        return SeatMap.objects.get(showtime_id=showtime.pk)
+    return seat_map
+
+
+def get_seat_map(showtime: Showtime) -> SeatMap:
+    """Mapa de la función; se construye la primera vez que se pide."""
+    try:
+        return showtime.seat_map
+    except SeatMap.DoesNotExist:
+        return build(showtime)
+
+
+def apply(showtime_id: int, changes: Iterable[tuple[int, int, int]]) -> None:
+    """Aplica cambios ``(fila, columna, SeatState)`` al mapa de una función.
+
+    Debe llamarse dentro de la misma transacción que modifica los boletos:
+    la fila del mapa se bloquea para que dos compras no se pisen.
+    """
+    changes = list(changes)
+    if not changes:
+        return
+    realtime.publish_changes(showtime_id, changes)
+    with transaction.atomic():
+        seat_map = SeatMap.objects.select_for_update().filter(showtime_id=showtime_id).first()
+        if seat_map is None:
+            # Sin mapa aún: al construirlo ya se leen los boletos de esta transacción.
+            build(Showtime.objects.select_related('auditorium').get(pk=showtime_id))
+            return
+        for row, col, state in changes:
+            if row <= seat_map.rows and col <= seat_map.cols:
+                previous = seat_map.get(row, col)
+                seat_map.set(row, col, state)
+                seat_map.sold += (state == SeatState.SOLD) - (previous == SeatState.SOLD)
+        seat_map.save(update_fields=['bits', 'sold', 'updated'])
+
+
+def invalidate_auditorium(auditorium_id: int) -> None:
+    """Descarta los mapas de una sala cuyo layout cambió; se reconstruyen al pedirlos."""
+    SeatMap.objects.filter(showtime__auditorium_id=auditorium_id).delete()
@@ -0,0 +1,149 @@
+# cinema/signals.py
+"""Receptores que mantienen sincronizadas las estructuras derivadas."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import cart, cartelera, facets, layout, pricing, search, seatmap
+from .scheduling import cleaning_buffer
+from .models import (
+    Auditorium, Cinema, Genre, Movie, PricingRule, Seat, SeatState, Showtime, SnackItem, Ticket,
+    TICKET_SEAT_STATE,
+)
+
+
+# ───────────────────────── MAPA DE DISPONIBILIDAD ─────────────────────────
+@receiver(post_save, sender=Ticket, dispatch_uid='seatmap_ticket_saved')
+def ticket_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    seat = instance.seat
+    seatmap.apply(instance.showtime_id, [(seat.row, seat.col, TICKET_SEAT_STATE[instance.status])])
+
+
+@receiver(post_delete, sender=Ticket, dispatch_uid='seatmap_ticket_deleted')
+def ticket_deleted(sender, instance, **kwargs):
+    seat = instance.seat
+    seatmap.apply(instance.showtime_id, [(seat.row, seat.col, SeatState.FREE)])
+
+
+@receiver(post_save, sender=Seat, dispatch_uid='seatmap_seat_saved')
+@receiver(post_delete, sender=Seat, dispatch_uid='seatmap_seat_deleted')
+def seat_layout_changed(sender, instance, raw=False, **kwargs):
+    if raw or layout.syncing():
+        return
+    seatmap.invalidate_auditorium(instance.auditorium_id)
+
+
+@receiver(post_save, sender=Auditorium, dispatch_uid='layout_auditorium_saved')
+def auditorium_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Crea/ajusta las butacas según total_rows, total_cols y seat_layout
+    layout.sync_seats(instance)
+
+
+# ────────────────────────────── PROGRAMACIÓN ──────────────────────────────
+@receiver(post_save, sender=Movie, dispatch_uid='scheduling_movie_saved')
+def movie_saved(sender, instance, raw=False, created=False, **kwargs):
+    if raw or created:
+        return
+    # Si cambia la duración, las funciones ocupan la sala otro tiempo
+    occupied = timedelta(minutes=instance.duration_min) + cleaning_buffer()
+    Showtime.objects.filter(movie=instance).update(end_time=F('start_time') + occupied)
+
+
+# ──────────────────────────────── BÚSQUEDA ────────────────────────────────
+def reindex_on_commit(movie_ids):
+    movie_ids = list(movie_ids)
+    if movie_ids:
+        transaction.on_commit(lambda: search.reindex(movie_ids))
+
+
+@receiver(post_save, sender=Movie, dispatch_uid='search_movie_saved')
+@receiver(post_delete, sender=Movie, dispatch_uid='search_movie_deleted')
+def movie_search_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    reindex_on_commit([instance.pk])
+
+
+@receiver(m2m_changed, sender=Movie.genres.through, dispatch_uid='search_movie_genres_changed')
+def movie_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        reindex_on_commit([instance.pk])
+    elif pk_set:
+        reindex_on_commit(pk_set)
+    else:       # genre.movies.clear(): ya no sabemos cuáles eran
+        transaction.on_commit(search.invalidate)
+
+
+@receiver(post_save, sender=Genre, dispatch_uid='search_genre_saved')
+@receiver(pre_delete, sender=Genre, dispatch_uid='search_genre_deleted')
+def genre_search_changed(sender, instance, raw=False, created=False, **kwargs):
+    if raw or created:
+        return
+    reindex_on_commit(instance.movies.values_list('id', flat=True))
+
+
+# ──────────────────────────────── CARTELERA ───────────────────────────────
+def cartelera_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    # Tras el commit, para que nadie vuelva a cachear datos sin confirmar
+    transaction.on_commit(cartelera.invalidate)
+
+
+for model in (Showtime, Movie, Cinema, Auditorium, SnackItem):
+    post_save.connect(cartelera_changed, sender=model, dispatch_uid=f'cartelera_{model.__name__}_saved')
+    post_delete.connect(cartelera_changed, sender=model, dispatch_uid=f'cartelera_{model.__name__}_deleted')
+
+
+# ───────────────────────────────── FACETAS ────────────────────────────────
+@receiver(post_save, sender=Showtime, dispatch_uid='facets_showtime_saved')
+@receiver(post_delete, sender=Showtime, dispatch_uid='facets_showtime_deleted')
+def showtime_facets_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    showtime_id = instance.pk
+    transaction.on_commit(lambda: facets.refresh([showtime_id]))
+
+
+def facets_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    # Afecta a muchas funciones a la vez: reconstrucción completa
+    transaction.on_commit(facets.invalidate)
+
+
+for model in (Movie, Cinema, Auditorium, Genre):
+    post_save.connect(facets_changed, sender=model, dispatch_uid=f'facets_{model.__name__}_saved')
+    post_delete.connect(facets_changed, sender=model, dispatch_uid=f'facets_{model.__name__}_deleted')
+m2m_changed.connect(facets_changed, sender=Movie.genres.through, dispatch_uid='facets_movie_genres_changed')
+
+
+# ──────────────────────────────── PRECIOS ─────────────────────────────────
+@receiver(post_save, sender=PricingRule, dispatch_uid='pricing_rule_saved')
+@receiver(post_delete, sender=PricingRule, dispatch_uid='pricing_rule_deleted')
+def pricing_rule_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    # Los cambios de función (base_price, horario) ya cambian la clave de su tabla
+    transaction.on_commit(pricing.invalidate)
+
+
+# ──────────────────────────────── CARRITO ─────────────────────────────────
+@receiver(post_save, sender=SnackItem, dispatch_uid='cart_snack_saved')
+@receiver(post_delete, sender=SnackItem, dispatch_uid='cart_snack_deleted')
+def snack_catalog_changed(sender, raw=False, **kwargs):
+    if raw:
+        return
+    # Precio o disponibilidad: el catálogo del carrito se relee tras el commit
+    transaction.on_commit(cart.invalidate)
@@ -1,3 +1,1647 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import asyncio
+import csv
+import gzip
+import importlib.util
+import io
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+import zipfile
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest import skipUnless
+from django.utils import timezone
+
+from .models import (
+    Auditorium, Cinema, Customer, Genre, LoyaltyEntry, Movie, Order, OrderSnack, OrderTicket, PaymentDaily, PaymentMethod,
+    PricingRule, ReservationStatus, SalesDaily, Seat, SeatMap, SeatState, Showtime, ShowtimeSales, SnackCategory,
+    SnackItem, Ticket,
+)
+from . import seatmap
+from . import (
+    cart, cartelera, checkout, export, facets, importer, loadtest, loyalty, pricing, profiling, realtime, reporting, search,
+    ticket_pdf,
+)
+from .layout import sync_seats
+from .scheduling import IntervalIndex, ShowtimeSlot, cleaning_buffer, schedule, schedule_week
+from .holds import release_expired_holds
+from .reservations import SeatUnavailable, reserve_seats
+from .totals import recompute_order_totals, refresh_order_totals
+
+# Toda petición de la suite respeta settings.QUERY_BUDGETS, no sólo las de QueryBudgetTests
+_strict_budgets = override_settings(QUERY_BUDGETS_STRICT=True)
+
+
+def setUpModule():
+    _strict_budgets.enable()
+
+
+def tearDownModule():
+    _strict_budgets.disable()
+
+
+def make_showtime(rows=4, cols=5, **kwargs):
+    """Cine + sala con butacas + película + función para las pruebas."""
+    cinema = Cinema.objects.create(name='Cine Centro', address='Av. 1', city='Apizaco', state='Tlaxcala')
+    # Las butacas las genera la señal de Auditorium (cinema.layout)
+    aud = Auditorium.objects.create(cinema=cinema, name='Sala 1', total_rows=rows, total_cols=cols)
+    movie = Movie.objects.create(title='Gatos en el espacio', duration_min=100,
+                                 release_date=timezone.now().date(), rating='A')
+    defaults = dict(start_time=timezone.now() + timedelta(days=1), language='SUB',
+                    format='2D', base_price=Decimal('80.00'))
+    defaults.update(kwargs)
+    return Showtime.objects.create(movie=movie, auditorium=aud, **defaults)
+
+
+def make_customer(username='cliente'):
+    return Customer.objects.create(user=User.objects.create(username=username))
+
+
+def make_snack(name='Palomitas', price='55.50', **kwargs):
+    category, _ = SnackCategory.objects.get_or_create(name='Dulcería')
+    return SnackItem.objects.create(category=category, name=name, price=Decimal(price), **kwargs)
+
+
+# ──────────────────────────── MAPA DE ASIENTOS ────────────────────────────
+class SeatMapTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime(rows=3, cols=5)
+        self.aud = self.showtime.auditorium
+        self.customer = make_customer()
+
+    def ticket(self, row, col, status, **kwargs):
+        return Ticket(showtime=self.showtime, seat=Seat.objects.get(auditorium=self.aud, row=row, col=col),
+                      customer=self.customer, status=status, price=Decimal('80.00'), **kwargs)
+
+    def test_build_packs_seats_and_tickets(self):
+        Seat.objects.filter(auditorium=self.aud, row=2).delete()
+        Ticket.objects.bulk_create([         # sin señales: el mapa aún no existe
+            self.ticket(1, 1, ReservationStatus.RESERVED),
+            self.ticket(1, 2, ReservationStatus.PAID),
+            self.ticket(3, 5, ReservationStatus.CANCELED),
+        ])
+        self.assertFalse(SeatMap.objects.exists())
+
+        seat_map = seatmap.build(self.showtime)
+        self.assertEqual(len(seat_map.bits), 4)         # 15 celdas a 2 bits
+        self.assertEqual((seat_map.get(1, 1), seat_map.get(1, 2), seat_map.get(1, 3)),
+                         (SeatState.HELD, SeatState.SOLD, SeatState.FREE))
+        self.assertEqual((seat_map.get(2, 1), seat_map.get(3, 5)), (SeatState.EMPTY, SeatState.FREE))
+        self.assertEqual((seat_map.seats, seat_map.sold), (10, 1))
+        self.assertEqual(list(seat_map.grid()), [1, 3])     # la fila sin butacas no se pinta
+        with self.assertRaises(IndexError):
+            seat_map.get(4, 1)
+
+        # Se lee con la función en una sola consulta
+        with self.assertNumQueries(1):
+            showtime = Showtime.objects.select_related('auditorium', 'seat_map').get(pk=self.showtime.pk)
+            self.assertEqual(seatmap.get_seat_map(showtime).get(1, 2), SeatState.SOLD)
+
+    def test_apply_updates_bits_and_counters(self):
+        seatmap.build(self.showtime)
+        seatmap.apply(self.showtime.pk, [(1, 1, SeatState.SOLD), (1, 2, SeatState.HELD), (9, 9, SeatState.SOLD)])
+        seat_map = SeatMap.objects.get(showtime=self.showtime)
+        self.assertEqual((seat_map.get(1, 1), seat_map.get(1, 2), seat_map.sold), (SeatState.SOLD, SeatState.HELD, 1))
+
+        seatmap.apply(self.showtime.pk, [(1, 1, SeatState.FREE)])
+        seat_map.refresh_from_db()
+        self.assertEqual((seat_map.get(1, 1), seat_map.sold), (SeatState.FREE, 0))
+        with self.assertNumQueries(0):
+            seatmap.apply(self.showtime.pk, [])
+
+    def test_signals_keep_map_in_sync_and_layout_changes_invalidate_it(self):
+        seatmap.build(self.showtime)
+        ticket = self.ticket(2, 3, ReservationStatus.RESERVED)
+        ticket.save()
+        self.assertEqual(SeatMap.objects.get(showtime=self.showtime).get(2, 3), SeatState.HELD)
+        ticket.status = ReservationStatus.PAID
+        ticket.save()
+        self.assertEqual(SeatMap.objects.get(showtime=self.showtime).get(2, 3), SeatState.SOLD)
+        ticket.delete()
+        self.assertEqual(SeatMap.objects.get(showtime=self.showtime).get(2, 3), SeatState.FREE)
+
+        # Cambiar una butaca descarta el mapa; se reconstruye al pedirlo
+        Seat.objects.get(auditorium=self.aud, row=3, col=1).delete()
+        self.assertFalse(SeatMap.objects.filter(showtime=self.showtime).exists())
+        showtime = Showtime.objects.select_related('auditorium').get(pk=self.showtime.pk)
+        self.assertEqual(seatmap.get_seat_map(showtime).get(3, 1), SeatState.EMPTY)
+
+
+# ──────────────────────────────── BUTACAS ────────────────────────────────
+class SeatLayoutTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime(rows=3, cols=4)
+        self.aud = self.showtime.auditorium
+
+    def test_generates_grid_on_create(self):
+        self.assertEqual(self.aud.seats.count(), 12)
+        self.assertTrue(seatmap.get_seat_map(self.showtime).has_seats)
+
+    def test_resync_applies_layout_without_touching_sold_seats(self):
+        make_customer()
+        reserve_seats(self.showtime, Customer.objects.get(), [(1, 2)])
+        self.aud.seat_layout = {'aisles': [2], 'row_types': {'3': 'VIP'}, 'seat_types': {'1-1': 'wheelchair'}}
+        self.aud.save()
+
+        seats = dict(((s.row, s.col), s.seat_type) for s in self.aud.seats.all())
+        self.assertEqual(len(seats), 10)                 # 3 del pasillo, menos 1 con boleto
+        self.assertIn((1, 2), seats)
+        self.assertNotIn((2, 2), seats)
+        self.assertEqual(seats[(3, 4)], 'VIP')
+        self.assertEqual(seats[(1, 1)], 'wheelchair')
+        self.assertFalse(SeatMap.objects.filter(showtime=self.showtime).exists())
+
+        # Sin cambios no hay escrituras: sólo la lectura y la revisión de la sobrante protegida
+        with self.assertNumQueries(4):
+            result = sync_seats(self.aud)
+        self.assertEqual((result.created, result.updated, result.deleted, result.protected), (0, 0, 0, 1))
+
+    def test_removed_seats_invalidate_maps_once(self):
+        seatmap.get_seat_map(self.showtime)
+        self.aud.seat_layout = {'aisles': [2, 3, 4]}
+        with CaptureQueriesContext(connection) as ctx:
+            result = sync_seats(self.aud)
+        self.assertEqual(result.deleted, 9)
+        self.assertEqual(self.aud.seats.count(), 3)
+        self.assertEqual(sum('DELETE FROM "cinema_seatmap"' in q['sql'] for q in ctx.captured_queries), 1)
+        self.assertFalse(SeatMap.objects.filter(showtime=self.showtime).exists())
+
+
+# ────────────────────────────── PROGRAMACIÓN ──────────────────────────────
+class SchedulingTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime(start_time=timezone.now().replace(hour=12, minute=0) + timedelta(days=1))
+        self.aud, self.movie = self.showtime.auditorium, self.showtime.movie      # 100 min + 15 de limpieza
+
+    def test_end_time_and_model_validation(self):
+        self.assertEqual(self.showtime.end_time - self.showtime.start_time, timedelta(minutes=115))
+        clash = Showtime(movie=self.movie, auditorium=self.aud, language='SUB', format='2D',
+                         base_price=Decimal('80.00'), start_time=self.showtime.start_time + timedelta(minutes=110))
+        with self.assertRaises(ValidationError):
+            clash.full_clean()
+        clash.start_time = self.showtime.end_time
+        clash.full_clean()
+
+        self.movie.duration_min = 180
+        self.movie.save()
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.end_time - self.showtime.start_time, timedelta(minutes=195))
+
+    def test_interval_index(self):
+        index, t0 = IntervalIndex(), self.showtime.start_time
+        index.add(1, t0, t0 + timedelta(hours=4), 'larga')
+        index.add(1, t0 + timedelta(hours=1), t0 + timedelta(hours=2), 'corta')
+        self.assertEqual(index.overlapping(1, t0 + timedelta(hours=3), t0 + timedelta(hours=5)), ['larga'])
+        self.assertEqual(index.overlapping(1, t0 + timedelta(minutes=90), t0 + timedelta(hours=5)),
+                         ['larga', 'corta'])
+        self.assertEqual(index.overlapping(1, t0 + timedelta(hours=4), t0 + timedelta(hours=5)), [])
+        self.assertEqual(index.overlapping(2, t0, t0 + timedelta(hours=5)), [])
+
+    def test_schedule_week_reports_conflicts(self):
+        local = timezone.localtime(self.showtime.start_time)
+        plan = {self.aud.pk: [
+            (local.time(), self.movie.pk, 'SUB', '2D', '80.00'),          # choca el primer día
+            ((local + timedelta(hours=2)).time(), self.movie.pk, 'DUB', '2D', '70.00'),
+            ((local + timedelta(hours=3)).time(), self.movie.pk, 'DUB', '2D', '70.00'),   # choca con la anterior
+        ]}
+        with self.assertNumQueries(5):      # películas, índice, SAVEPOINT, INSERT, RELEASE
+            result = schedule_week(local.date(), plan, days=7)
+        self.assertEqual(len(result.created), 13)
+        self.assertEqual(len(result.conflicts), 8)
+        self.assertEqual(Showtime.objects.filter(auditorium=self.aud).count(), 14)
+
+        again = schedule([ShowtimeSlot(self.aud.pk, self.movie.pk, self.showtime.start_time)], commit=False)
+        self.assertEqual(len(again.conflicts), 1)
+
+
+# ───────────────────────────── RESERVACIONES ─────────────────────────────
+class ReserveSeatsTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime()
+        self.customer = make_customer()
+        seatmap.build(self.showtime)
+        pricing.price_table(self.showtime)      # la tabla se compila una vez por función (caché)
+
+    def test_reserves_in_fixed_number_of_queries(self):
+        # Las consultas no crecen con el número de butacas (incluye SAVEPOINTs)
+        with self.assertNumQueries(14):
+            order = reserve_seats(self.showtime, self.customer, [(1, 1), (1, 2), (2, 3)])
+        self.assertEqual(order.order_tickets.count(), 3)
+        self.assertEqual(order.total_amount, Decimal('240.00'))
+        seat_map = SeatMap.objects.get(showtime=self.showtime)
+        self.assertEqual(seat_map.get(2, 3), SeatState.HELD)
+
+        many = [(r, c) for r in (3, 4) for c in range(1, 6)]
+        with self.assertNumQueries(14):
+            reserve_seats(self.showtime, self.customer, many)
+
+    def test_rejects_held_and_paid_seats(self):
+        reserve_seats(self.showtime, self.customer, [(1, 1)])
+        Ticket.objects.filter(seat__row=1, seat__col=1).update(status=ReservationStatus.PAID)
+        other = make_customer('otro')
+        with self.assertRaises(SeatUnavailable) as ctx:
+            reserve_seats(self.showtime, other, [(1, 1), (1, 2)])
+        self.assertEqual(ctx.exception.cells, [(1, 1)])
+        self.assertFalse(Ticket.objects.filter(seat__col=2).exists())
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_reuses_canceled_tickets(self):
+        first = reserve_seats(self.showtime, self.customer, [(1, 1)])
+        Ticket.objects.update(status=ReservationStatus.CANCELED, customer=None)
+        other = make_customer('otro')
+        second = reserve_seats(self.showtime, other, [(1, 1)])
+        ticket = Ticket.objects.get()
+        self.assertEqual(ticket.customer, other)
+        self.assertEqual(ticket.status, ReservationStatus.RESERVED)
+        self.assertFalse(first.order_tickets.exists())
+        self.assertEqual(second.order_tickets.get().ticket, ticket)
+
+    def test_unknown_seat(self):
+        with self.assertRaises(SeatUnavailable):
+            reserve_seats(self.showtime, self.customer, [(9, 9)])
+
+
+class HoldSweepTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime()
+        self.customer = make_customer()
+
+    def test_releases_expired_holds_in_batches(self):
+        stale = [reserve_seats(self.showtime, self.customer, [(1, c)]) for c in range(1, 4)]
+        fresh = reserve_seats(self.showtime, self.customer, [(2, 1)])
+        Ticket.objects.filter(seat__row=1).update(hold_expires_at=timezone.now() - timedelta(minutes=1))
+
+        result = release_expired_holds(batch_size=2)
+
+        self.assertEqual((result.released_seats, result.canceled_orders, result.batches), (3, 3, 2))
+        self.assertEqual(Order.objects.filter(pk__in=[o.pk for o in stale],
+                                              status=Order.Status.CANCELED).count(), 3)
+        self.assertEqual(Order.objects.get(pk=fresh.pk).status, Order.Status.PENDING)
+        self.assertFalse(OrderTicket.objects.filter(ticket__seat__row=1).exists())
+        self.assertEqual(set(Order.objects.filter(pk__in=[o.pk for o in stale])
+                             .values_list('ticket_total', 'item_count', 'total_amount')),
+                         {(Decimal('0.00'), 0, Decimal('0.00'))})
+        self.assertEqual(Order.objects.get(pk=fresh.pk).total_amount, Decimal('80.00'))
+        seat_map = SeatMap.objects.get(showtime=self.showtime)
+        self.assertEqual(seat_map.get(1, 2), SeatState.FREE)
+        self.assertEqual(seat_map.get(2, 1), SeatState.HELD)
+        # Las butacas liberadas vuelven a venderse
+        reserve_seats(self.showtime, make_customer('otro'), [(1, 1)])
+
+    def test_cancel_view_releases_seats_in_bulk(self):
+        order = reserve_seats(self.showtime, self.customer, [(1, c) for c in range(1, 5)])
+        self.client.force_login(self.customer.user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertRedirects(self.client.post(f'/order/{order.pk}/cancel/'), '/orders/',
+                                 fetch_redirect_response=False)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE "cinema_ticket"') for q in ctx.captured_queries), 1)
+        self.assertEqual(sum(q['sql'].startswith('DELETE FROM "cinema_orderticket"') for q in ctx.captured_queries), 1)
+
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.item_count, order.total_amount),
+                         (Order.Status.CANCELED, 0, Decimal('0.00')))
+        self.assertFalse(OrderTicket.objects.exists())
+        self.assertEqual(set(Ticket.objects.values_list('status', 'customer', 'hold_expires_at')),
+                         {(ReservationStatus.CANCELED, None, None)})
+        seat_map = SeatMap.objects.get(showtime=self.showtime)
+        self.assertEqual([seat_map.get(1, c) for c in range(1, 5)], [SeatState.FREE] * 4)
+        reserve_seats(self.showtime, make_customer('otro'), [(1, 1)])
+
+    def test_cancel_view_leaves_paid_orders_alone(self):
+        order = reserve_seats(self.showtime, self.customer, [(1, 1)])
+        Order.objects.filter(pk=order.pk).update(status=Order.Status.PAID)
+        Ticket.objects.update(status=ReservationStatus.PAID)
+        self.client.force_login(self.customer.user)
+        self.assertEqual(self.client.post(f'/order/{order.pk}/cancel/').status_code, 404)
+        self.assertEqual(Ticket.objects.get().status, ReservationStatus.PAID)
+        self.assertTrue(OrderTicket.objects.filter(order=order).exists())
+
+
+class ReserveSeatsConcurrencyTests(TransactionTestCase):
+    """Cientos de compradores en hilos compitiendo por las mismas butacas."""
+    BUYERS = 200
+
+    def test_no_seat_is_sold_twice(self):
+        showtime = make_showtime(rows=2, cols=5)
+        customers = [make_customer(f'c{i}') for i in range(self.BUYERS)]
+        cells = [(r, c) for r in (1, 2) for c in range(1, 6)]
+        rng = random.Random(7)
+        wishes = [rng.sample(cells, rng.randint(1, 3)) for _ in customers]
+        start = threading.Barrier(20)
+
+        def buy(args):
+            customer, wish = args
+            try:
+                try:
+                    start.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    pass
+                return reserve_seats(showtime, customer, wish).pk
+            except (SeatUnavailable, OperationalError):
+                return None
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            winners = [pk for pk in pool.map(buy, zip(customers, wishes)) if pk]
+
+        self.assertTrue(winners)
+        held = Ticket.objects.filter(showtime=showtime, status=ReservationStatus.RESERVED)
+        lines = OrderTicket.objects.filter(ticket__showtime=showtime)
+        # Cada boleto apartado pertenece a exactamente una orden ganadora…
+        self.assertEqual(lines.count(), held.count())
+        self.assertEqual(set(lines.values_list('order_id', flat=True)), set(winners))
+        # …cada orden ganadora obtuvo todas sus butacas, sin traslapes…
+        by_order = {}
+        for order_id, row, col in lines.values_list('order_id', 'ticket__seat__row', 'ticket__seat__col'):
+            by_order.setdefault(order_id, set()).add((row, col))
+        taken = [cell for seats in by_order.values() for cell in seats]
+        self.assertEqual(len(taken), len(set(taken)))
+        # …y el mapa de disponibilidad coincide con la tabla de boletos.
+        seat_map = SeatMap.objects.get(showtime=showtime)
+        for row, col in cells:
+            expected = SeatState.HELD if (row, col) in taken else SeatState.FREE
+            self.assertEqual(seat_map.get(row, col), expected, (row, col))
+
+
+# ──────────────────────────── ASIENTOS EN VIVO ────────────────────────────
+class SeatStreamTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime()
+        self.spool = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool, ignore_errors=True)
+
+    def test_local_broker_fans_out_from_other_threads(self):
+        broker = realtime.LocalBroker(queue_size=2)
+
+        async def listen():
+            subs = [broker.subscribe(1), broker.subscribe(1)]
+            pending = [asyncio.ensure_future(anext(sub)) for sub in subs]
+            await asyncio.sleep(0)      # que ambos queden registrados
+            await asyncio.to_thread(broker.publish, 1, [[1, 1, SeatState.HELD]])
+            await asyncio.to_thread(broker.publish, 2, [[9, 9, SeatState.SOLD]])
+            received = [await p for p in pending]
+            for _ in range(3):          # se desborda: la cola se vacía y pide resync
+                broker.publish(1, [[1, 2, SeatState.FREE]])
+            await asyncio.sleep(0)
+            overflow = await anext(subs[0])
+            for sub in subs:
+                await sub.aclose()
+            return received, overflow
+
+        received, overflow = asyncio.run(listen())
+        self.assertEqual(received, [[[1, 1, SeatState.HELD]]] * 2)
+        self.assertIs(overflow, realtime.RESYNC)
+        self.assertFalse(broker._subscribers)
+
+    def test_reservation_publishes_after_commit(self):
+        broker = realtime.SpoolBroker(self.spool)
+        self.addCleanup(setattr, realtime, '_broker', realtime._broker)
+        realtime._broker = broker
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(self.showtime, make_customer(), [(1, 1), (2, 2)])
+            self.assertFalse(os.listdir(self.spool))
+        with open(broker._path(self.showtime.pk)) as fh:
+            events = [json.loads(line) for line in fh]
+        # El primer apartado construye el mapa: se publica igual
+        self.assertEqual(sorted(map(tuple, events[0])),
+                         [(1, 1, SeatState.HELD), (2, 2, SeatState.HELD)])
+
+    async def test_stream_starts_with_snapshot(self):
+        response = await AsyncClient().get(f'/showtime/{self.showtime.pk}/seats/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+        event, data = (await anext(chunks)).decode().strip().split('\n')
+        self.assertEqual(event, 'event: snapshot')
+        self.assertEqual(len(json.loads(data.removeprefix('data: '))), 20)
+        await chunks.aclose()
+
+    def test_stream_is_only_offered_under_asgi(self):
+        client = Client()
+        client.force_login(User.objects.create(username='wsgi'))
+        # WSGI: el stream no se abre y la página no intenta conectarse
+        self.assertEqual(client.get(f'/showtime/{self.showtime.pk}/seats/stream/').status_code, 204)
+        response = client.get(f'/showtime/{self.showtime.pk}/seats/')
+        self.assertFalse(response.context['live_seats'])
+        self.assertNotContains(response, 'EventSource(')
+
+        async_client = AsyncClient()
+        async_to_sync(async_client.aforce_login)(User.objects.get(username='wsgi'))
+        response = async_to_sync(async_client.get)(f'/showtime/{self.showtime.pk}/seats/')
+        self.assertContains(response, 'EventSource(')
+
+
+# ─────────────────────────── CATÁLOGO (ASYNC) ───────────────────────────
+class AsyncCatalogTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime()
+        for i in range(15):
+            make_snack(f'Snack {i:02}')
+
+    def test_catalog_pages(self):
+        # Cliente ASGI; las consultas async vuelven a este hilo (y a su transacción)
+        get = async_to_sync(AsyncClient().get)
+        self.assertContains(get('/peliculas/'), 'Gatos en el espacio')
+        self.assertContains(get(f'/showtime/{self.showtime.pk}/'), 'Cine Centro')
+        self.assertEqual(get('/showtime/999999/').status_code, 404)
+
+        # Conteo + una página, sin consultas desde la plantilla
+        with self.assertNumQueries(2):
+            response = get('/snacks/', {'page': 2})
+        self.assertEqual([s.name for s in response.context['snacks']], ['Snack 12', 'Snack 13', 'Snack 14'])
+        self.assertTrue(response.context['is_paginated'])
+        self.assertEqual(get('/snacks/', {'page': 9}).status_code, 404)
+
+
+# ──────────────────────────────── BÚSQUEDA ────────────────────────────────
+class MovieSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, search, '_index', None)
+        search._index = None
+        today = timezone.now().date()
+        accion, drama = Genre.objects.create(name='Acción'), Genre.objects.create(name='Drama')
+        self.movies = {}
+        for title, original, synopsis, genres in [
+            ('El Señor de los Anillos', 'The Lord of the Rings', 'Un anillo y una comunidad.', [accion]),
+            ('Misión Imposible', 'Mission: Impossible', 'Un agente en una misión.', [accion]),
+            ('La Sirenita', 'The Little Mermaid', 'Una sirena que sueña con la superficie.', [drama]),
+        ]:
+            movie = Movie.objects.create(title=title, original_title=original, synopsis=synopsis,
+                                         duration_min=120, release_date=today, rating='B')
+            movie.genres.set(genres)
+            self.movies[title] = movie.pk
+
+    def titles(self, query):
+        return [title for _, title in search.suggest(query)]
+
+    def test_accents_prefix_typos_and_ranking(self):
+        self.assertEqual(self.titles('senor anillos'), ['El Señor de los Anillos'])
+        self.assertEqual(self.titles('mision'), ['Misión Imposible'])
+        self.assertEqual(self.titles('sire'), ['La Sirenita'])                 # prefijo
+        self.assertEqual(self.titles('imposbile'), ['Misión Imposible'])       # transposición
+        self.assertEqual(self.titles('sirenita'), ['La Sirenita'])
+        self.assertEqual(self.titles('accion'), ['El Señor de los Anillos', 'Misión Imposible'])
+        # En el título pesa más que en la sinopsis
+        self.assertEqual(self.titles('anillo')[0], 'El Señor de los Anillos')
+        self.assertEqual(self.titles('zzzz'), [])
+
+    def test_reads_wait_for_index_updates(self):
+        search.get_index()
+        with ThreadPoolExecutor(1) as pool:
+            with search._lock:          # como un reindex() en curso en otro hilo
+                pending = pool.submit(self.titles, 'sirenita')
+                with self.assertRaises(TimeoutError):
+                    pending.result(timeout=0.05)
+            self.assertEqual(pending.result(timeout=5), ['La Sirenita'])
+
+    def test_signals_update_index_incrementally(self):
+        search.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            movie = Movie.objects.get(pk=self.movies['La Sirenita'])
+            movie.title = 'La Sirenita: Regreso al Mar'
+            movie.save()
+            Movie.objects.get(pk=self.movies['Misión Imposible']).genres.clear()
+        index = search._index
+        self.assertIsNotNone(index)     # actualizado en sitio, no reconstruido
+        self.assertEqual(self.titles('regreso'), ['La Sirenita: Regreso al Mar'])
+        self.assertEqual(self.titles('accion'), ['El Señor de los Anillos'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Movie.objects.filter(pk=self.movies['La Sirenita']).update(is_active=False)
+            Movie.objects.get(pk=self.movies['La Sirenita']).save()
+        self.assertIs(search._index, index)
+        self.assertEqual(self.titles('sirenita'), [])
+
+    def test_search_page_and_json(self):
+        response = self.client.get('/peliculas/', {'q': 'anillos'})
+        self.assertEqual([m.title for m in response.context['peliculas']], ['El Señor de los Anillos'])
+        with self.assertNumQueries(0):
+            response = self.client.get('/peliculas/buscar/', {'q': 'misi'})
+        self.assertEqual(response.json()['results'][0]['title'], 'Misión Imposible')
+
+
+# ───────────────────────────────── FACETAS ────────────────────────────────
+class FacetBrowseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(setattr, facets, '_index', None)
+        facets._index = None
+        self.base = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        self.show = make_showtime(start_time=self.base)                     # Apizaco · SUB 2D
+        self.movie, self.aud = self.show.movie, self.show.auditorium
+        self.movie.genres.add(Genre.objects.create(name='Comedia'))
+        other = Cinema.objects.create(name='Cine Norte', address='Av. 2', city='Puebla', state='Puebla')
+        self.other_aud = Auditorium.objects.create(cinema=other, name='Sala 1', total_rows=1, total_cols=1)
+        for hours, fmt in ((3, 'IMAX'), (6, '2D')):
+            Showtime.objects.create(movie=self.movie, auditorium=self.other_aud, start_time=self.base + timedelta(hours=hours),
+                                    language='DUB', format=fmt, base_price=Decimal('90.00'))
+
+    def counts(self, data, facet):
+        return {c['value']: c['count'] for c in data['facets'][facet]}
+
+    def test_filters_and_disjunctive_counts(self):
+        data = facets.browse({})
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([r['format'] for r in data['results']], ['2D', 'IMAX', '2D'])
+        self.assertEqual(self.counts(data, 'city'), {'Apizaco': 1, 'Puebla': 2})
+
+        with self.assertNumQueries(0):
+            data = facets.browse({'city': ['Puebla'], 'format': ['IMAX']})
+        self.assertEqual(data['count'], 1)
+        # Cada faceta cuenta ignorando su propio filtro
+        self.assertEqual(self.counts(data, 'city'), {'Puebla': 1})      # Apizaco no tiene IMAX
+        self.assertEqual(self.counts(data, 'format'), {'2D': 1, 'IMAX': 1})
+        self.assertEqual(self.counts(data, 'genre'), {str(self.movie.genres.get().pk): 1})
+
+        # Las que ya empezaron no cuentan
+        later = facets.browse({}, now=self.base + timedelta(hours=1))
+        self.assertEqual(later['count'], 2)
+
+    def test_reads_wait_for_refresh(self):
+        facets.get_index()
+        with ThreadPoolExecutor(1) as pool:
+            with facets._lock:          # como un refresh() en curso en otro hilo
+                pending = pool.submit(facets.browse, {'city': ['Puebla']})
+                with self.assertRaises(TimeoutError):
+                    pending.result(timeout=0.05)
+            self.assertEqual(pending.result(timeout=5)['count'], 2)
+
+    def test_signals_keep_index_current(self):
+        facets.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Showtime.objects.create(movie=self.movie, auditorium=self.aud, start_time=self.base + timedelta(hours=4),
+                                    language='SUB', format='3D', base_price=Decimal('80.00'))
+            self.show.delete()
+        data = facets.browse({'city': ['Apizaco']})
+        self.assertEqual([r['format'] for r in data['results']], ['3D'])
+        self.assertEqual(facets.browse({})['count'], 3)
+        self.assertEqual([r['format'] for r in facets.browse({})['results']], ['IMAX', '3D', '2D'])
+
+    def test_browse_api(self):
+        response = self.client.get('/cartelera/', {'language': 'DUB', 'limit': 1, 'offset': 1})
+        data = response.json()
+        self.assertEqual((data['count'], len(data['results'])), (2, 1))
+        self.assertEqual(data['results'][0]['format'], '2D')
+        self.assertEqual(self.client.get('/cartelera/', {'limit': 'x'}).status_code, 400)
+
+
+# ───────────────────────────── TOTALES DE ORDEN ─────────────────────────────
+class OrderTotalsTests(TestCase):
+    def test_totals_from_aggregates(self):
+        showtime = make_showtime()
+        customer = make_customer()
+        order = reserve_seats(showtime, customer, [(1, 1), (1, 2)])
+        OrderSnack.objects.create(order=order, snack=make_snack(), qty=3, price=Decimal('55.50'))
+        OrderSnack.objects.create(order=order, snack=make_snack('Agua', '20.00'), qty=1,
+                                  price=Decimal('20.00'))
+        empty = Order.objects.create(customer=customer, total_amount=Decimal('99'))
+
+        with self.assertNumQueries(4):     # UPDATE + SELECT entre SAVEPOINTs
+            recompute_order_totals(order)
+        self.assertEqual(order.ticket_total, Decimal('160.00'))
+        self.assertEqual(order.snack_total, Decimal('186.50'))
+        self.assertEqual(order.total_amount, Decimal('346.50'))
+        self.assertEqual(order.item_count, 6)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(refresh_order_totals([order.pk, empty.pk]), 2)
+        empty.refresh_from_db()
+        self.assertEqual((empty.total_amount, empty.item_count), (Decimal('0'), 0))
+
+
+# ──────────────────────────── HISTORIAL DE ÓRDENES ──────────────────────────
+class OrderListTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime(rows=6, cols=10)
+        self.customer = make_customer()
+        self.snack = make_snack()
+        self.client = Client()
+        self.client.force_login(self.customer.user)
+
+    def place_orders(self, count, start=0):
+        for i in range(start, start + count):
+            order = reserve_seats(self.showtime, self.customer, [(i // 10 + 1, i % 10 + 1)])
+            OrderSnack.objects.create(order=order, snack=self.snack, qty=2, price=self.snack.price)
+
+    def test_constant_queries_regardless_of_history_size(self):
+        self.place_orders(3)
+        with self.assertNumQueries(5):      # sesión, usuario, órdenes y dos prefetch
+            small = self.client.get('/orders/')
+        self.place_orders(40, start=3)
+        with self.assertNumQueries(5):
+            large = self.client.get('/orders/')
+        self.assertEqual(len(small.context['orders']), 3)
+        self.assertEqual(len(large.context['orders']), 10)
+        self.assertContains(large, 'Boletos (1)')
+
+    def test_keyset_pages_cover_history_once(self):
+        self.place_orders(23)
+        seen, cursor = [], ''
+        while True:
+            response = self.client.get('/orders/', {'cursor': cursor} if cursor else {})
+            seen += [o.pk for o in response.context['orders']]
+            cursor = response.context['next_cursor']
+            if not cursor:
+                break
+        expected = list(Order.objects.order_by('-created', '-id').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+
+# ──────────────────────────────── CARTELERA ───────────────────────────────
+class CarteleraCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.showtime = make_showtime()
+
+    def test_queries_only_when_something_changed(self):
+        first = cartelera.get_cartelera()
+        self.assertEqual(first['showtimes'], [self.showtime])
+        with self.assertNumQueries(0):
+            cartelera.get_cartelera()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.showtime.movie.is_active = False
+            self.showtime.movie.save()
+        with self.assertNumQueries(2):
+            self.assertEqual(cartelera.get_cartelera()['showtimes'], [])
+
+    def test_rolls_forward_when_first_showtime_starts(self):
+        cartelera.get_cartelera()
+        later = self.showtime.start_time + timedelta(minutes=1)
+        with self.assertNumQueries(2):
+            self.assertEqual(cartelera.get_cartelera(now=later)['showtimes'], [])
+
+
+# ─────────────────────────────── BOLETOS PDF ──────────────────────────────
+class TicketPDFTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        self.showtime = make_showtime()
+        self.customer = make_customer()
+        self.client = Client()
+        self.client.force_login(self.customer.user)
+
+    def test_pdf_generated_once_on_payment_and_served_with_etag(self):
+        order = reserve_seats(self.showtime, self.customer, [(1, 1), (1, 2)])
+        with override_settings(MEDIA_ROOT=self.media, TICKET_PDF_WORKERS=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/order/{order.pk}/confirm/', {'payment_method': 'CRD'})
+            order.refresh_from_db()
+            self.assertTrue(order.ticket_pdf.name.startswith('tickets/pdf/'))
+            self.assertEqual(Ticket.objects.exclude(qr_code='').count(), 2)
+
+            with self.assertNumQueries(3):      # sesión, usuario y orden
+                response = self.client.get(f'/order/{order.pk}/ticket.pdf')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+            again = self.client.get(f'/order/{order.pk}/ticket.pdf',
+                                    HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(again.status_code, 304)
+
+    def test_batch_export_one_page_per_seat(self):
+        first = reserve_seats(self.showtime, self.customer, [(1, 1), (1, 2), (1, 3)])
+        second = reserve_seats(self.showtime, make_customer('otro'), [(2, 1)])
+        Ticket.objects.filter(orderticket__order__in=[first, second]).update(status=ReservationStatus.PAID)
+        reserve_seats(self.showtime, make_customer('sin-pagar'), [(3, 1)])     # apartado: no se imprime
+        orders = list(ticket_pdf.iter_batch_orders(showtime_ids=[self.showtime.pk], chunk_size=2))
+        self.assertEqual([o['order_id'] for o in orders], [first.pk, second.pk])
+
+        out = io.BytesIO()
+        self.assertEqual(ticket_pdf.export_pdf(orders, out, workers=0), 4)
+        self.assertTrue(out.getvalue().startswith(b'%PDF'))
+
+        out = io.BytesIO()
+        self.assertEqual(ticket_pdf.export_zip(iter(orders), out, workers=2), 2)
+        self.assertEqual(sorted(zipfile.ZipFile(out).namelist()),
+                         [f'orden_{first.pk}.pdf', f'orden_{second.pk}.pdf'])
+        self.assertIs(ticket_pdf._pool(2), ticket_pdf._pool(2))     # un solo pool por proceso
+
+
+# ──────────────────────────── PLANES DE CONSULTA ────────────────────────────
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN es de SQLite')
+class QueryPlanTests(TestCase):
+    """Las consultas de las vistas calientes no deben recorrer tablas completas."""
+    FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+    # Tablas que se leen completas a propósito (catálogos chicos)
+    ALLOWED = {'cinema_snackcategory', 'cinema_pricingrule', 'django_content_type'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.showtime = make_showtime(rows=6, cols=10)
+        cls.customer = make_customer()
+        cls.snack = make_snack()
+        for i in range(5):
+            reserve_seats(cls.showtime, cls.customer, [(1, i + 1)])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.customer.user)
+
+    def full_scans(self, queries):
+        found = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                for *_, detail in cursor.fetchall():
+                    match = self.FULL_SCAN.match(detail)
+                    if match and match.group(1) not in self.ALLOWED:
+                        found.append(f'{detail}  ←  {sql}')
+        return found
+
+    def assertNoFullScans(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            result = func(*args, **kwargs)
+        scans = self.full_scans(ctx.captured_queries)
+        self.assertFalse(scans, '\n'.join(scans))
+        return result
+
+    def test_catalog_views(self):
+        for path in ('/', '/peliculas/', '/estrenos/', '/snacks/', f'/showtime/{self.showtime.pk}/',
+                     f'/showtime/{self.showtime.pk}/seats/', '/orders/'):
+            with self.subTest(path=path):
+                response = self.assertNoFullScans(self.client.get, path)
+                self.assertEqual(response.status_code, 200)
+
+    def test_purchase_flow(self):
+        self.client.force_login(make_customer('comprador').user)
+        self.assertNoFullScans(self.client.post, f'/snacks/{self.snack.pk}/', {'qty': 2})
+        response = self.assertNoFullScans(
+            self.client.post, f'/showtime/{self.showtime.pk}/seats/', {'seats': ['3-3', '3-4']})
+        order_id = int(response['Location'].rstrip('/').split('/')[-2])
+        self.assertNoFullScans(self.client.get, f'/order/{order_id}/confirm/')
+
+    def test_hold_sweep(self):
+        self.assertNoFullScans(release_expired_holds, now=timezone.now() + timedelta(hours=1))
+
+
+# ───────────────────────── PRESUPUESTOS DE CONSULTAS ─────────────────────────
+class QueryBudgetTests(TestCase):
+    """Cada vista con presupuesto en ``settings.QUERY_BUDGETS`` debe respetarlo.
+
+    Los presupuestos cubren la primera visita; con mapa y precios ya en caché
+    (como aquí) las vistas de ``WARM`` deben quedarse en su número menor.
+    """
+    WARM = {'seat_selection': 3, 'POST seat_selection': 18, 'ticket_pdf': 4}
+
+    def setUp(self):
+        cache.clear()
+        self.showtime = make_showtime(rows=6, cols=10)
+        self.customer = make_customer()
+        self.snack = make_snack()
+        for i in range(8):
+            order = reserve_seats(self.showtime, self.customer, [(2, i + 1)])
+            OrderSnack.objects.create(order=order, snack=self.snack, qty=1, price=self.snack.price)
+        self.order = order
+        self.client.force_login(self.customer.user)
+        self.visited, self.over = set(), []
+
+    def visit(self, path, data=None, method='get'):
+        response = getattr(self.client, method)(path, data or {})
+        profile = response.wsgi_request.profile
+        self.visited |= {profile.view, f'{profile.method} {profile.view}'}
+        warm = self.WARM.get(f'{profile.method} {profile.view}', self.WARM.get(profile.view))
+        if profile.over_budget or (warm is not None and profile.queries > warm):
+            self.over.append((profile.method, profile.view, profile.queries, warm or profile.budget))
+        return response
+
+    def test_views_stay_within_budget(self):
+        profiling.registry.reset()
+        for path in ('/', '/', '/peliculas/', '/estrenos/', '/snacks/', f'/showtime/{self.showtime.pk}/',
+                     f'/showtime/{self.showtime.pk}/seats/', '/orders/',
+                     f'/order/{self.order.pk}/confirm/', f'/order/{self.order.pk}/success/',
+                     f'/order/{self.order.pk}/ticket.pdf'):
+            self.assertLess(self.visit(path).status_code, 400, path)
+        response = self.visit(f'/showtime/{self.showtime.pk}/seats/', {'seats': ['4-1', '4-2']}, 'post')
+        self.assertEqual(response.status_code, 302)
+        self.visit(response.url, {'payment_method': PaymentMethod.CARD}, 'post')
+        self.visit(f'/snacks/{self.snack.pk}/', {'qty': 2}, 'post')
+        self.visit('/carrito/')
+        self.assertEqual(self.visit('/carrito/', {'action': 'checkout'}, 'post').status_code, 302)
+
+        budgets = settings.QUERY_BUDGETS
+        self.assertEqual(set(budgets) - self.visited, set(), 'vistas con presupuesto sin probar')
+        self.assertEqual(self.over, [])
+
+        metrics = self.client.get('/metrics/').json()
+        self.assertEqual(metrics['home']['requests'], 2)
+        self.assertEqual(metrics['seat_selection']['query_budget'], budgets['seat_selection'])
+        self.assertIn('total_ms_p99', metrics['orders_list'])
+
+    def test_over_budget_fails_only_when_strict(self):
+        with override_settings(QUERY_BUDGETS={'home': 0}):
+            with self.assertRaisesMessage(profiling.QueryBudgetExceeded, 'GET home hizo'):
+                self.client.get('/')
+            with override_settings(QUERY_BUDGETS_STRICT=False), self.assertLogs('cinema.profiling', 'WARNING'):
+                self.assertEqual(self.client.get('/').status_code, 200)
+
+
+# ───────────────────────────── ADMIN ─────────────────────────────
+class AdminChangelistTests(TestCase):
+    """Las listas del admin cuestan lo mismo con 2 filas que con 12."""
+
+    CHANGELISTS = ('showtime', 'auditorium', 'order', 'ticket', 'customer')
+
+    def setUp(self):
+        self.showtime = make_showtime(rows=4, cols=5)
+        self.snack = make_snack()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+    def add_rows(self, n):
+        aud = self.showtime.auditorium
+        for _ in range(n):
+            Auditorium.objects.create(cinema=aud.cinema, name=f'Sala {Auditorium.objects.count() + 1}',
+                                      total_rows=2, total_cols=3)
+            showtime = Showtime.objects.create(
+                movie=self.showtime.movie, auditorium=aud, language='SUB', format='2D',
+                base_price=Decimal('80.00'), start_time=timezone.now() + timedelta(days=Showtime.objects.count() + 1),
+            )
+            order = reserve_seats(showtime, make_customer(f'cliente-{showtime.pk}'), [(1, 1), (1, 2)])
+            OrderSnack.objects.create(order=order, snack=self.snack, qty=3, price=self.snack.price)
+
+    def changelist_queries(self):
+        counts = {}
+        for name in self.CHANGELISTS:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(f'/admin/cinema/{name}/')
+            self.assertEqual(response.status_code, 200, name)
+            counts[name] = len(ctx.captured_queries)
+        return counts
+
+    def test_constant_queries_per_page(self):
+        self.add_rows(2)
+        few = self.changelist_queries()
+        self.add_rows(10)
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_annotated_columns_sort(self):
+        showtime = self.showtime
+        order = reserve_seats(showtime, make_customer(), [(1, 1), (1, 2), (2, 2)])
+        # Más unidades pero menos dinero en snacks que las otras órdenes
+        water = make_snack('Agua', '10.00')
+        OrderSnack.objects.create(order=order, snack=water, qty=4, price=water.price)
+        recompute_order_totals(order)
+        Ticket.objects.filter(orderticket__order=order).update(status=ReservationStatus.PAID)
+        self.add_rows(1)
+
+        # ``o`` = índice en list_display
+        rows = self.client.get('/admin/cinema/showtime/', {'o': '-7'}).context['cl'].result_list
+        self.assertEqual((rows[0].pk, rows[0].tickets_sold, rows[0].occupancy), (showtime.pk, 3, 15.0))
+        self.assertEqual(rows[1].occupancy, 0.0)
+        response = self.client.get('/admin/cinema/order/', {'o': '-3'})
+        self.assertEqual([o.pk for o in response.context['cl'].result_list], [order.pk, order.pk + 1])
+        self.assertEqual(re.findall(r'<td class="field-snack_units_display">(\d+)</td>', response.content.decode()),
+                         ['4', '3'])
+        rows = self.client.get('/admin/cinema/auditorium/', {'o': '4'}).context['cl'].result_list
+        self.assertEqual([a.seat_count for a in rows], [6, 20])
+
+
+# ──────────────────────────── REPORTES ────────────────────────────
+class ReportingTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime(rows=4, cols=5)
+        self.snack = make_snack(price='50.00')
+        self.customer = make_customer()
+        self.client.force_login(self.customer.user)
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media, TICKET_PDF_WORKERS=0))
+
+    def pay(self, cells, method, snacks=0):
+        order = reserve_seats(self.showtime, self.customer, cells)
+        if snacks:
+            OrderSnack.objects.create(order=order, snack=self.snack, qty=snacks, price=self.snack.price)
+            recompute_order_totals(order)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/order/{order.pk}/confirm/', {'payment_method': method})
+        return order
+
+    def snapshot(self):
+        return (
+            list(SalesDaily.objects.order_by('pk').values(
+                'day', 'cinema', 'movie', 'orders', 'tickets', 'ticket_revenue', 'snack_orders', 'snack_revenue')),
+            list(ShowtimeSales.objects.values('showtime', 'seats', 'tickets_sold', 'revenue')),
+            list(PaymentDaily.objects.order_by('payment_method').values('day', 'payment_method', 'orders', 'amount')),
+        )
+
+    def test_rollup_on_payment(self):
+        self.pay([(1, 1), (1, 2)], PaymentMethod.CARD, snacks=2)
+        self.pay([(2, 1)], PaymentMethod.CASH)
+        reserve_seats(self.showtime, self.customer, [(3, 1)])      # pendiente: no cuenta
+
+        today = timezone.localdate()
+        sales = SalesDaily.objects.get()
+        self.assertEqual((sales.day, sales.orders, sales.tickets, sales.ticket_revenue,
+                          sales.snack_orders, sales.snack_revenue),
+                         (today, 2, 3, Decimal('240.00'), 1, Decimal('100.00')))
+        self.assertAlmostEqual(ShowtimeSales.objects.get().occupancy, 3 / 20)
+        self.assertEqual(reporting.attach_rate(today, today), 0.5)
+        mix = {row['payment_method']: (row['orders'], row['amount']) for row in reporting.payment_mix(today, today)}
+        self.assertEqual(mix, {PaymentMethod.CARD: (1, Decimal('260.00')), PaymentMethod.CASH: (1, Decimal('80.00'))})
+
+        # El recálculo desde cero deja las mismas tablas
+        before = self.snapshot()
+        reporting.rebuild()
+        self.assertEqual(self.snapshot(), before)
+
+    def test_reports_view(self):
+        self.pay([(1, 1)], PaymentMethod.WALLET, snacks=1)
+        self.assertEqual(self.client.get('/reportes/').status_code, 404)
+
+        self.client.force_login(User.objects.create(username='gerente', is_staff=True))
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        with self.assertNumQueries(8):      # sesión, usuario y una consulta por reporte
+            data = self.client.get('/reportes/', {'hasta': tomorrow}).json()
+        self.assertEqual(Decimal(data['revenue_by_movie'][0]['revenue']), Decimal('130'))
+        self.assertEqual(data['occupancy'][0]['tickets_sold'], 1)
+        self.assertEqual(data['snack_attach_rate'], 1.0)
+        self.assertEqual(data['payment_mix'][0]['share'], 1.0)
+        self.assertEqual(self.client.get('/reportes/', {'desde': '2024-02-30'}).status_code, 400)
+
+
+# ──────────────────────────── EXPORTACIÓN ────────────────────────────
+class SalesExportTests(TestCase):
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.out, ignore_errors=True)
+        self.showtime = make_showtime(rows=4, cols=5)
+        self.customer = make_customer()
+        self.snack = make_snack()
+        for row in range(1, 4):
+            order = reserve_seats(self.showtime, self.customer, [(row, 1), (row, 2)])
+            OrderSnack.objects.create(order=order, snack=self.snack, qty=row, price=self.snack.price)
+            recompute_order_totals(order)
+
+    def read_csv(self, name):
+        path, = Path(self.out).glob(f'{name}-*.csv.gz')
+        with gzip.open(path, 'rt', newline='') as fh:
+            rows = list(csv.DictReader(fh))
+        path.unlink()
+        return rows
+
+    def test_keyset_chunks_cost_one_query_each(self):
+        table = export.TABLES['tickets']
+        with self.assertNumQueries(4):      # 6 boletos en bloques de 2 + la consulta vacía final
+            chunks = list(export.iter_chunks(table, None, timezone.now(), chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 2])
+        ids = [row[table.columns.index('id')] for chunk in chunks for row in chunk]
+        self.assertEqual(sorted(ids), sorted(Ticket.objects.values_list('id', flat=True)))
+
+    def test_incremental_export_from_watermark(self):
+        results = export.export(self.out, lag=0, chunk_size=2)
+        self.assertEqual({r.table: r.rows for r in results},
+                         {'tickets': 6, 'orders': 3, 'order_tickets': 6, 'order_snacks': 3})
+        orders = self.read_csv('orders')
+        self.assertEqual(sorted(Decimal(o['snack_total']) for o in orders),
+                         [Decimal('55.50'), Decimal('111.00'), Decimal('166.50')])
+        self.assertEqual(len(self.read_csv('order_snacks')), 3)
+        self.assertEqual(len(self.read_csv('order_tickets')), 6)
+        self.assertEqual(len(self.read_csv('tickets')), 6)
+
+        # Segunda corrida: sólo la orden nueva y la que cambió
+        order = reserve_seats(self.showtime, self.customer, [(4, 1)])
+        changed = Order.objects.order_by('id').first()
+        OrderSnack.objects.filter(order=changed).update(qty=5)
+        recompute_order_totals(changed)
+        results = export.export(self.out, lag=0)
+        self.assertEqual({r.table: r.rows for r in results},
+                         {'tickets': 1, 'orders': 2, 'order_tickets': 3, 'order_snacks': 1})
+        self.assertEqual({int(o['id']) for o in self.read_csv('orders')}, {order.pk, changed.pk})
+        self.assertEqual(self.read_csv('order_snacks')[0]['qty'], '5')
+        self.assertEqual(len(self.read_csv('order_tickets')), 3)
+        self.assertEqual(self.read_csv('tickets')[0]['seat_id'], str(order.order_tickets.get().ticket.seat_id))
+
+        # Sin cambios no se escriben archivos
+        self.assertEqual(sum(r.rows for r in export.export(self.out, lag=0)), 0)
+        self.assertEqual(sorted(p.name for p in Path(self.out).iterdir()), ['watermark.json'])
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'requiere pyarrow')
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+        export.export(self.out, ['orders'], ['parquet'], lag=0, chunk_size=2)
+        path, = Path(self.out).glob('orders-*.parquet')
+        parquet = pq.ParquetFile(path)
+        self.assertEqual((parquet.metadata.num_rows, parquet.metadata.num_row_groups), (3, 2))
+
+
+# ──────────────────────────── IMPORTACIÓN ────────────────────────────
+class BulkImportTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime(rows=4, cols=5)
+        self.aud = self.showtime.auditorium
+        self.movie = self.showtime.movie
+
+    def run_import(self, kind, text, fmt='csv', **kwargs):
+        return importer.import_file(kind, io.StringIO(text), fmt, **kwargs)
+
+    def test_movies_with_genres(self):
+        csv_text = (
+            'title,release_date,duration_min,rating,genres\n'
+            'Ruta al sur,2026-03-01,95,B,Acción|Drama\n'
+            'La casa vacía,2026-03-08,110,B15,Terror\n'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.run_import('movies', csv_text)
+        self.assertEqual((result.created, result.updated, result.errors, result.committed), (2, 0, [], True))
+        self.assertEqual(sorted(Movie.objects.get(title='Ruta al sur').genres.values_list('name', flat=True)),
+                         ['Acción', 'Drama'])
+        self.assertEqual([title for _, title in search.suggest('casa')], ['La casa vacía'])
+
+        # Misma llave (título, estreno): se actualiza y se reemplazan los géneros
+        result = self.run_import('movies', '{"title": "Ruta al sur", "release_date": "2026-03-01", '
+                                           '"duration_min": 99, "rating": "B", "genres": ["Drama"]}\n', 'jsonl')
+        self.assertEqual((result.created, result.updated), (0, 1))
+        movie = Movie.objects.get(title='Ruta al sur')
+        self.assertEqual((movie.duration_min, list(movie.genres.values_list('name', flat=True))), (99, ['Drama']))
+
+    def test_auditoriums_generate_seats(self):
+        rows = [
+            {'cinema': self.aud.cinema.name, 'name': 'Sala 2', 'total_rows': 3, 'total_cols': 4,
+             'seat_layout': {'aisles': [2]}},
+            {'cinema_id': self.aud.cinema_id, 'name': 'Sala 1', 'total_rows': 2, 'total_cols': 2},
+        ]
+        result = self.run_import('auditoriums', json.dumps(rows), 'json')
+        self.assertEqual((result.created, result.updated, result.errors), (1, 1, []))
+        self.assertEqual(Seat.objects.filter(auditorium__name='Sala 2').count(), 9)
+        self.assertEqual(Seat.objects.filter(auditorium=self.aud).count(), 4)
+
+        bad = self.run_import('auditoriums', json.dumps([
+            {'cinema': 'Otro', 'name': 'X', 'total_rows': 2, 'total_cols': 1},
+            {'cinema': self.aud.cinema.name, 'name': 'Y', 'total_rows': 99, 'total_cols': 1},
+        ]), 'json')
+        self.assertFalse(bad.committed)
+        self.assertIn('no existe el cine', bad.errors[0][1])
+        self.assertIn('total_rows', bad.errors[1][1])
+
+    def showtime_csv(self, starts, movie=None):
+        cinema = self.aud.cinema.name
+        lines = ['cinema,auditorium,movie,start_time,language,format,base_price']
+        lines += [f'{cinema},{self.aud.name},{movie or self.movie.title},{start:%Y-%m-%dT%H:%M},SUB,2D,75.00'
+                  for start in starts]
+        return '\n'.join(lines) + '\n'
+
+    def test_showtimes_validated_before_writing(self):
+        base = timezone.localtime(self.showtime.start_time).replace(tzinfo=None)
+        starts = [base + timedelta(days=d) for d in range(1, 4)]
+        text = self.showtime_csv(starts + [starts[0], base + timedelta(minutes=30)])
+        text += self.showtime_csv([base + timedelta(days=9)], movie='Desconocida').split('\n', 1)[1]
+
+        result = self.run_import('showtimes', text)
+        self.assertFalse(result.committed)
+        self.assertEqual([line for line, _ in result.errors], [5, 6, 7])
+        self.assertIn('duplicada (línea 2)', result.errors[0][1])
+        self.assertIn('Se empalma con', result.errors[1][1])
+        self.assertEqual(Showtime.objects.count(), 1)
+
+        result = self.run_import('showtimes', text, partial=True)
+        self.assertEqual((result.created, result.committed), (3, True))
+        self.assertEqual(Showtime.objects.count(), 4)
+        self.assertTrue(all(st.end_time for st in Showtime.objects.all()))
+
+    def test_movie_duration_update_moves_showtime_end(self):
+        released = self.movie.release_date.isoformat()
+        result = self.run_import('movies', f'title,release_date,duration_min,rating\n'
+                                           f'{self.movie.title},{released},180,A\n')
+        self.assertEqual(result.updated, 1)
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.end_time,
+                         self.showtime.start_time + timedelta(minutes=180) + cleaning_buffer())
+
+        # La sala queda ocupada por la duración nueva: no se le puede empalmar otra función
+        start = timezone.localtime(self.showtime.start_time).replace(tzinfo=None) + timedelta(minutes=120)
+        result = self.run_import('showtimes', self.showtime_csv([start]))
+        self.assertFalse(result.committed)
+        self.assertIn('Se empalma con', result.errors[0][1])
+
+    def test_showtime_import_queries_do_not_grow_with_rows(self):
+        base = timezone.localtime(self.showtime.start_time).replace(tzinfo=None) + timedelta(days=30)
+        counts = []
+        for offset, n in ((0, 5), (100, 50)):
+            text = self.showtime_csv([base + timedelta(days=offset + d) for d in range(n)])
+            with CaptureQueriesContext(connection) as ctx:
+                result = self.run_import('showtimes', text)
+            self.assertEqual(result.created, n)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_admin_upload(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        self.assertContains(self.client.get('/admin/cinema/genre/'), 'importar/')
+        upload = io.BytesIO('name\nComedia\nDrama\n'.encode())
+        upload.name = 'generos.csv'
+        response = self.client.post('/admin/cinema/genre/importar/', {'file': upload})
+        self.assertRedirects(response, '/admin/cinema/genre/')
+        self.assertEqual(set(Genre.objects.values_list('name', flat=True)), {'Comedia', 'Drama'})
+
+        upload = io.BytesIO('name\nTerror\nTerror\n'.encode())
+        upload.name = 'generos.csv'
+        response = self.client.post('/admin/cinema/genre/importar/', {'file': upload})
+        self.assertContains(response, 'género duplicado')
+        self.assertFalse(Genre.objects.filter(name='Terror').exists())
+
+    def test_json_that_is_not_an_array_of_objects(self):
+        for text, fmt, message in (('[1, 2]', 'json', 'la fila 1 no es un objeto'),
+                                   ('{"title": "x"}', 'json', 'se esperaba un arreglo de objetos'),
+                                   ('{"name": "Drama"}\n["Terror"]\n', 'jsonl', 'la fila 2 no es un objeto')):
+            with self.subTest(text=text):
+                result = self.run_import('genres', text, fmt)
+                self.assertFalse(result.committed)
+                self.assertEqual(len(result.errors), 1)
+                self.assertEqual(result.errors[0][0], 0)
+                self.assertIn(message, result.errors[0][1])
+        self.assertFalse(Genre.objects.exists())
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        for text in ('[1, 2]', '{"title": "x"}'):
+            upload = io.BytesIO(text.encode())
+            upload.name = 'peliculas.json'
+            response = self.client.post('/admin/cinema/movie/importar/', {'file': upload})
+            self.assertContains(response, 'No se pudo leer el archivo')
+        self.assertFalse(Movie.objects.filter(title='x').exists())
+
+
+# ───────────────────────────── BANCO DEL EMBUDO ─────────────────────────────
+class FunnelBenchTests(TestCase):
+    """Siembra mínima y un comprador de principio a fin (la carga concurrente no cabe en un TestCase)."""
+
+    CONFIG = loadtest.SeedConfig(cinemas=1, auditoriums=2, rows=3, cols=4, days=1, ahead=1,
+                                 shows_per_day=2, movies=3, customers=3, orders=10)
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media, TICKET_PDF_WORKERS=0))
+        self.counts = loadtest.seed(self.CONFIG)
+
+    def test_seed_builds_consistent_chain(self):
+        self.assertEqual((self.counts['salas'], self.counts['butacas'], self.counts['funciones']), (2, 24, 12))
+        self.assertGreater(self.counts['órdenes'], 0)
+        # Cada boleto del historial es de una orden pagada, en una función pasada
+        self.assertEqual(OrderTicket.objects.count(), Ticket.objects.count())
+        self.assertFalse(Ticket.objects.filter(showtime__start_time__gte=timezone.now()).exists())
+        self.assertEqual(ShowtimeSales.objects.aggregate(n=Sum('tickets_sold'))['n'], Ticket.objects.count())
+
+    def test_funnel_and_baseline_comparison(self):
+        user_id, showtime_id, cells = loadtest._buyers(customers=1)[0]
+        client = Client()
+        client.force_login(User.objects.get(pk=user_id))
+        report = loadtest.LoadReport(funnels=1, elapsed=1.0)
+        report.add(loadtest.run_funnel(client, showtime_id, cells))
+        self.assertEqual(tuple(report.steps), loadtest.STEPS)
+        self.assertEqual([s.errors for s in report.steps.values()], [0] * len(loadtest.STEPS))
+        order = Order.objects.get(customer__user_id=user_id, order_tickets__ticket__showtime_id=showtime_id,
+                                  order_tickets__ticket__seat__row=cells[0][0], order_tickets__ticket__seat__col=cells[0][1])
+        self.assertEqual((order.status, order.item_count), (Order.Status.PAID, len(cells)))
+
+        baseline = report.as_baseline()
+        self.assertEqual(loadtest.compare(report, baseline), [])
+        baseline['steps']['order_success']['queries'] -= 1
+        baseline['steps']['home']['p99_ms'] = report.as_baseline()['steps']['home']['p99_ms'] / 3
+        problems = loadtest.compare(report, baseline, tolerance=0.5)
+        self.assertEqual(len(problems), 2)
+        self.assertTrue(problems[0].startswith('home: p99'))
+        self.assertIn('order_success', problems[1])
+
+
+# ───────────────────────────── PAGO ─────────────────────────────
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.showtime = make_showtime()
+        self.customer = make_customer()
+        seatmap.build(self.showtime)
+        self.gateway = checkout.FakeGateway()
+
+    def test_settles_tickets_points_and_map_in_fixed_queries(self):
+        counts = []
+        for cells in ([(1, 1)], [(2, c) for c in range(1, 6)]):
+            order = reserve_seats(self.showtime, self.customer, cells)
+            with CaptureQueriesContext(connection) as ctx:
+                paid = checkout.settle(order.pk, self.customer, PaymentMethod.CARD, self.gateway)
+            counts.append(len(ctx.captured_queries))
+            self.assertEqual(paid.status, Order.Status.PAID)
+        self.assertEqual(counts[0], counts[1])
+
+        order = Order.objects.get(pk=paid.pk)
+        self.assertEqual((order.status, order.payment_method), (Order.Status.PAID, PaymentMethod.CARD))
+        self.assertEqual(order.payment_ref, self.gateway.charges[-1].reference)
+        self.assertEqual(set(Ticket.objects.values_list('status', 'hold_expires_at')), {(ReservationStatus.PAID, None)})
+        self.assertEqual(SeatMap.objects.get(showtime=self.showtime).get(2, 5), SeatState.SOLD)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.loyalty_pts, 8 + 40)      # $80 y $400, un punto por cada $10
+
+    def test_locks_tickets_before_the_order(self):
+        # Mismo orden que el barrido de apartados (boletos → orden): sin interbloqueos entre ambos
+        order = reserve_seats(self.showtime, self.customer, [(1, 1)])
+        with CaptureQueriesContext(connection) as ctx:
+            checkout.settle(order.pk, self.customer, PaymentMethod.CARD, self.gateway)
+        sql = [q['sql'] for q in ctx.captured_queries]
+        lock = next(i for i, q in enumerate(sql) if q.startswith('SELECT') and '"seat__row"' in q)
+        update = next(i for i, q in enumerate(sql) if q.startswith('UPDATE "cinema_order"'))
+        self.assertLess(lock, update)
+
+    def test_rejects_bad_method_and_declined_payment(self):
+        order = reserve_seats(self.showtime, self.customer, [(1, 1)])
+        with self.assertRaises(checkout.InvalidPaymentMethod):
+            checkout.settle(order.pk, self.customer, 'XXX', self.gateway)
+        gateway = checkout.FakeGateway(decline=(PaymentMethod.WALLET,))
+        with self.assertRaises(checkout.PaymentDeclined):
+            checkout.settle(order.pk, self.customer, PaymentMethod.WALLET, gateway)
+        self.assertEqual(self.gateway.charges + gateway.charges, [])
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.PENDING)
+        self.assertEqual(Ticket.objects.get().status, ReservationStatus.RESERVED)
+        with self.assertRaises(Order.DoesNotExist):
+            checkout.settle(order.pk, make_customer('otro'), PaymentMethod.CARD, self.gateway)
+
+    def test_gateway_runs_outside_transaction_and_refunds_lost_holds(self):
+        order = reserve_seats(self.showtime, self.customer, [(1, 1), (1, 2)])
+        outer = len(connection.atomic_blocks)      # las del TestCase
+        seen = []
+
+        class SlowGateway(checkout.FakeGateway):
+            async def charge(gw, order_id, amount, method):
+                seen.append(await sync_to_async(lambda: len(connection.atomic_blocks))())
+                # Mientras se cobra, el barrido libera los apartados vencidos
+                await sync_to_async(release_expired_holds)(timezone.now() + timedelta(hours=1))
+                return await super().charge(order_id, amount, method)
+
+        gateway = SlowGateway()
+        with self.assertRaises(checkout.CheckoutError), self.assertLogs('cinema.checkout', 'WARNING'):
+            checkout.settle(order.pk, self.customer, PaymentMethod.CARD, gateway)
+        self.assertEqual(seen, [outer])
+        self.assertEqual(gateway.refunds, gateway.charges)
+        self.assertEqual(len(gateway.refunds), 1)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, Order.Status.CANCELED)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.loyalty_pts, 0)
+
+    def test_snacks_added_during_charge_refund_the_payment(self):
+        order = reserve_seats(self.showtime, self.customer, [(1, 1)])
+        snack = make_snack()
+        customer = self.customer
+
+        class CartGateway(checkout.FakeGateway):
+            async def charge(gw, order_id, amount, method):
+                # Mientras se cobra, el cliente paga su carrito en otra pestaña
+                def add_snacks():
+                    basket = cart.Cart(self.client.session)
+                    basket.add(snack.pk, 2)
+                    cart.checkout(basket, customer, Order.objects.get(pk=order_id))
+                await sync_to_async(add_snacks)()
+                return await super().charge(order_id, amount, method)
+
+        gateway = CartGateway()
+        with self.assertRaises(checkout.CheckoutError), self.assertLogs('cinema.checkout', 'WARNING'):
+            checkout.settle(order.pk, self.customer, PaymentMethod.CARD, gateway)
+        self.assertEqual(gateway.refunds, gateway.charges)
+        self.assertEqual(len(gateway.refunds), 1)
+        paid = order.total_amount
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.PENDING)
+        self.assertEqual(order.total_amount, paid + 2 * snack.price)
+        self.assertEqual(Ticket.objects.get().status, ReservationStatus.RESERVED)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.loyalty_pts, 0)
+
+    def test_confirm_view(self):
+        order = reserve_seats(self.showtime, self.customer, [(1, 1)])
+        self.client.force_login(self.customer.user)
+        url = f'/order/{order.pk}/confirm/'
+        self.assertRedirects(self.client.post(url, {'payment_method': 'XXX'}), url)
+        self.assertRedirects(self.client.post(url, {'payment_method': PaymentMethod.CASH}),
+                             f'/order/{order.pk}/success/')
+        self.assertEqual(Ticket.objects.get().status, ReservationStatus.PAID)
+        self.assertRedirects(self.client.post(url, {'payment_method': PaymentMethod.CASH}), '/orders/')
+        self.assertEqual(self.client.post(f'/order/{order.pk + 1}/confirm/', {'payment_method': 'CSH'}).status_code, 404)
+
+
+# ───────────────────────────── LEALTAD ─────────────────────────────
+class LoyaltyTests(TestCase):
+    def setUp(self):
+        self.customer = make_customer()
+        self.now = timezone.now()
+
+    def balance(self, customer=None):
+        customer = customer or self.customer
+        customer.refresh_from_db()
+        ledger = LoyaltyEntry.objects.filter(customer=customer).aggregate(n=Sum('points'))['n'] or 0
+        self.assertEqual(customer.loyalty_pts, ledger)
+        return customer.loyalty_pts
+
+    def test_redeem_takes_oldest_lots_first(self):
+        newer = loyalty.earn(self.customer.pk, 30, now=self.now)
+        older = loyalty.earn(self.customer.pk, 20, now=self.now - timedelta(days=100))
+        with self.assertNumQueries(6):          # 4 + SAVEPOINT/RELEASE
+            loyalty.redeem(self.customer.pk, 25)
+        older.refresh_from_db()
+        newer.refresh_from_db()
+        self.assertEqual((older.remaining, newer.remaining), (0, 25))
+        self.assertEqual(self.balance(), 25)
+
+        with self.assertRaises(loyalty.InsufficientPoints):
+            loyalty.redeem(self.customer.pk, 26)
+        self.assertEqual(self.balance(), 25)
+        self.assertEqual(LoyaltyEntry.objects.filter(kind=LoyaltyEntry.Kind.REDEEM).count(), 1)
+
+    def test_expiry_sweep_in_batches(self):
+        other = make_customer('otro')
+        past = self.now - loyalty.points_ttl() - timedelta(days=1)
+        loyalty.earn(self.customer.pk, 10, now=past)
+        loyalty.earn(self.customer.pk, 7, now=past)
+        loyalty.earn(self.customer.pk, 5, now=self.now)
+        loyalty.earn(other.pk, 4, now=past)
+        loyalty.redeem(self.customer.pk, 12)         # agota el primer lote caduco y deja 5 del segundo
+
+        result = loyalty.expire_points(now=self.now, batch_size=1)
+        self.assertEqual((result.expired_points, result.customers, result.batches), (5 + 4, 2, 2))
+        self.assertEqual(self.balance(), 5)
+        self.assertEqual(self.balance(other), 0)
+        self.assertEqual(loyalty.expire_points(now=self.now).expired_points, 0)
+
+    def test_reconcile_fixes_drift(self):
+        loyalty.earn(self.customer.pk, 40)
+        clean = make_customer('limpio')
+        Customer.objects.filter(pk=self.customer.pk).update(loyalty_pts=3)     # escritura "a mano"
+        self.assertEqual(loyalty.reconcile(fix=False), [(self.customer.pk, 3, 40)])
+        with self.assertLogs('cinema.loyalty', 'WARNING'):
+            loyalty.reconcile()
+        self.assertEqual(self.balance(), 40)
+        self.assertEqual(self.balance(clean), 0)
+        self.assertEqual(loyalty.reconcile(), [])
+
+    def test_pay_with_points(self):
+        showtime = make_showtime()
+        seatmap.build(showtime)
+        first = reserve_seats(showtime, self.customer, [(1, c) for c in range(1, 5)])      # $320
+        checkout.settle(first.pk, self.customer, PaymentMethod.CARD, checkout.FakeGateway())
+        self.assertEqual(self.balance(), 32)
+
+        second = reserve_seats(showtime, self.customer, [(2, 1)])       # $80: no alcanzan
+        with self.assertRaises(checkout.PaymentDeclined):
+            checkout.settle(second.pk, self.customer, PaymentMethod.POINTS)
+        self.assertEqual(Order.objects.get(pk=second.pk).status, Order.Status.PENDING)
+        self.assertEqual(self.balance(), 32)
+
+        loyalty.earn(self.customer.pk, 60)
+        gateway = checkout.FakeGateway()
+        checkout.settle(second.pk, self.customer, PaymentMethod.POINTS, gateway)
+        self.assertEqual(gateway.charges, [])
+        self.assertEqual(self.balance(), 12)        # con puntos no se acumulan
+        self.assertEqual(Ticket.objects.get(seat__row=2).status, ReservationStatus.PAID)
+        self.assertEqual(LoyaltyEntry.objects.get(kind=LoyaltyEntry.Kind.REDEEM).order_id, second.pk)
+
+
+class LoyaltyConcurrencyTests(TransactionTestCase):
+    """Canjes simultáneos del mismo cliente: nunca se gasta más de lo que hay."""
+
+    def test_concurrent_redeems_never_overdraw(self):
+        customer = make_customer()
+        loyalty.earn(customer.pk, 100)
+        start = threading.Barrier(10)
+
+        def spend(_):
+            try:
+                try:
+                    start.wait(timeout=5)
+                except threading.BrokenBarrierError:
+                    pass
+                loyalty.redeem(customer.pk, 30)
+                return 30
+            except (loyalty.InsufficientPoints, OperationalError):
+                return 0
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            spent = sum(pool.map(spend, range(10)))
+
+        # Con SQLite algunos pierden por el candado de escritura; ninguno gasta de más
+        customer.refresh_from_db()
+        self.assertIn(spent, (30, 60, 90))
+        self.assertEqual(customer.loyalty_pts, 100 - spent)
+        self.assertEqual(LoyaltyEntry.objects.aggregate(n=Sum('points'))['n'], 100 - spent)
+        self.assertEqual(LoyaltyEntry.objects.get(kind=LoyaltyEntry.Kind.EARN).remaining, 100 - spent)
+
+
+# ───────────────────────────── PRECIOS ─────────────────────────────
+class PricingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.showtime = make_showtime(rows=4, cols=5)
+        self.aud = self.showtime.auditorium
+        self.aud.seat_layout = {'row_types': {'4': 'VIP'}}
+        self.aud.save()
+        self.customer = make_customer()
+        weekday = str(timezone.localtime(self.showtime.start_time).weekday())
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingRule.objects.create(name='VIP', priority=10, seat_type='VIP', amount=Decimal('1.5'))
+            PricingRule.objects.create(name='Fin de semana', priority=20, action=PricingRule.Action.ADD,
+                                       weekdays=weekday, amount=Decimal('10'))
+            PricingRule.objects.create(name='IMAX', format='IMAX', amount=Decimal('2'))
+            PricingRule.objects.create(name='Sobreprecio', priority=90, min_occupancy=50, amount=Decimal('1.2'))
+
+    def test_compiles_table_by_seat_type_and_tier(self):
+        table = pricing.price_table(self.showtime)
+        self.assertEqual(table.tiers, (0, 50))
+        self.assertEqual(table.default, (Decimal('90.00'), Decimal('108.00')))
+        self.assertEqual(table.prices, {'VIP': (Decimal('130.00'), Decimal('156.00'))})
+        self.assertEqual(table.quote(9, 20)['standard'], Decimal('90.00'))
+        self.assertEqual(table.quote(10, 20)['VIP'], Decimal('156.00'))
+        self.assertEqual(table.quote(10, 0)['VIP'], Decimal('130.00'))
+
+        # En caché: no se vuelven a leer las reglas, hasta que una cambia
+        with self.assertNumQueries(0):
+            pricing.price_table(self.showtime)
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingRule.objects.filter(name='IMAX').update(format='')     # sin señal: sigue en caché
+            PricingRule.objects.get(name='VIP').delete()
+        self.assertEqual(pricing.price_table(self.showtime).prices, {})
+        self.assertEqual(pricing.price_table(self.showtime).default[0], Decimal('180.00'))
+
+    def test_reservations_price_each_seat_and_surge_reads_counters(self):
+        order = reserve_seats(self.showtime, self.customer, [(1, 1), (4, 1)])
+        self.assertEqual(order.total_amount, Decimal('220.00'))
+        self.assertEqual(sorted(Ticket.objects.values_list('price', flat=True)),
+                         [Decimal('90.00'), Decimal('130.00')])
+
+        # Vendemos media sala: el contador del mapa sube sin contar boletos
+        paid = reserve_seats(self.showtime, self.customer, [(r, c) for r in (2, 3) for c in range(1, 6)])
+        checkout.settle(paid.pk, self.customer, PaymentMethod.CARD, checkout.FakeGateway())
+        seat_map = SeatMap.objects.get(showtime=self.showtime)
+        self.assertEqual((seat_map.sold, seat_map.seats), (10, 20))
+        seat_map.delete()
+        rebuilt = seatmap.build(Showtime.objects.select_related('auditorium').get(pk=self.showtime.pk))
+        self.assertEqual((rebuilt.sold, rebuilt.seats), (10, 20))
+
+        with self.assertNumQueries(1):
+            prices = pricing.quote(self.showtime)
+        self.assertEqual(prices['VIP'], Decimal('156.00'))
+        surge = reserve_seats(self.showtime, self.customer, [(4, 5)])
+        self.assertEqual(surge.total_amount, Decimal('156.00'))
+
+    def test_seat_page_shows_price_per_seat(self):
+        self.client.force_login(self.customer.user)
+        response = self.client.get(f'/showtime/{self.showtime.pk}/seats/')
+        self.assertContains(response, 'data-price="130.00"', count=5)
+        self.assertContains(response, 'data-price="90.00"', count=15)
+        self.assertEqual(response.context['price_list'], [('VIP', Decimal('130.00')), ('standard', Decimal('90.00'))])
+
+        # Una butaca editada a mano (SeatAdmin) se muestra al precio con el que se cobra
+        seat = Seat.objects.get(auditorium=self.aud, row=1, col=1)
+        seat.seat_type = 'VIP'
+        seat.save()
+        response = self.client.get(f'/showtime/{self.showtime.pk}/seats/')
+        self.assertContains(response, 'data-price="130.00"', count=6)
+        order = reserve_seats(self.showtime, self.customer, [(1, 1)])
+        self.assertEqual(order.total_amount, Decimal('130.00'))
+
+
+# ───────────────────────────── CARRITO ─────────────────────────────
+class CartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = make_customer()
+        self.popcorn = make_snack()
+        self.soda = make_snack('Refresco', '35.00')
+        self.client.force_login(self.customer.user)
+
+    def session_cart(self):
+        return cart.Cart(self.client.session)
+
+    def test_adding_only_touches_the_session(self):
+        cart.catalog()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(f'/snacks/{self.popcorn.pk}/', {'qty': 2})
+            self.client.post(f'/snacks/{self.popcorn.pk}/', {'qty': 30})
+            self.client.post(f'/snacks/{self.soda.pk}/', {'qty': 'x'})
+        tables = {t for q in ctx.captured_queries for t in re.findall(r'"(cinema_\w+)"', q['sql'])}
+        self.assertEqual(tables, set())
+        self.assertEqual(self.session_cart().lines, {str(self.popcorn.pk): cart.MAX_QTY, str(self.soda.pk): 1})
+        self.assertFalse(Order.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SnackItem.objects.filter(pk=self.soda.pk).update(is_available=False)     # sin señal
+            self.popcorn.save()
+        response = self.client.post(f'/snacks/{self.soda.pk}/', {'qty': 1})
+        self.assertRedirects(response, '/snacks/', fetch_redirect_response=False)
+        response = self.client.get('/carrito/')
+        self.assertEqual([line.available for line in response.context['lines']], [True, False])
+        self.assertEqual(response.context['total'], Decimal('1110.00'))
+
+    def test_checkout_revalidates_and_bulk_creates_the_order(self):
+        self.client.post(f'/snacks/{self.popcorn.pk}/', {'qty': 2})
+        self.client.post(f'/snacks/{self.soda.pk}/', {'qty': 3})
+        self.client.post('/carrito/', {f'qty-{self.soda.pk}': 1, 'action': 'update'})
+        SnackItem.objects.filter(pk=self.popcorn.pk).update(price=Decimal('60.00'))   # el caché no lo sabe
+
+        current = self.session_cart()
+        with self.assertNumQueries(5):          # revalidación, orden, líneas y SAVEPOINTs
+            order = cart.checkout(current, self.customer)
+        self.assertEqual((order.snack_total, order.total_amount, order.item_count),
+                         (Decimal('155.00'), Decimal('155.00'), 3))
+        self.assertEqual(sorted(order.order_snacks.values_list('qty', 'price')),
+                         [(1, Decimal('35.00')), (2, Decimal('60.00'))])
+        self.assertEqual(current.lines, {})
+        with self.assertRaises(cart.CartError):
+            cart.checkout(current, self.customer)
+
+        paid = checkout.settle(order.pk, self.customer, PaymentMethod.CASH, checkout.FakeGateway())
+        self.assertEqual(paid.status, Order.Status.PAID)
+
+    def test_checkout_joins_the_pending_ticket_order(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media, TICKET_PDF_WORKERS=0))
+        showtime = make_showtime()
+        tickets = reserve_seats(showtime, self.customer, [(1, 1)])
+        OrderSnack.objects.create(order=tickets, snack=self.popcorn, qty=1, price=self.popcorn.price)
+        recompute_order_totals(tickets)
+        self.client.post(f'/snacks/{self.popcorn.pk}/', {'qty': 2})
+        self.client.post(f'/snacks/{self.soda.pk}/', {'qty': 1})
+
+        response = self.client.post('/carrito/', {'action': 'checkout'})
+        self.assertRedirects(response, f'/order/{tickets.pk}/confirm/', fetch_redirect_response=False)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(sorted(tickets.order_snacks.values_list('qty', 'price')),
+                         [(1, Decimal('35.00')), (3, Decimal('55.50'))])
+        totals = (Order.objects.filter(pk=tickets.pk)
+                  .values_list('snack_total', 'total_amount', 'item_count', 'ticket_total').get())
+        recompute_order_totals(tickets)
+        self.assertEqual(totals, (tickets.snack_total, tickets.total_amount, tickets.item_count, tickets.ticket_total))
+
+        # Pagada, la venta de snacks llega a los reportes
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout.settle(tickets.pk, self.customer, PaymentMethod.CASH, checkout.FakeGateway())
+        today = timezone.localdate()
+        self.assertEqual(reporting.attach_rate(today, today), 1.0)
+        self.assertEqual(SalesDaily.objects.get().snack_revenue, Decimal('201.50'))
+
+    def test_checkout_during_ticket_payment_keeps_snacks_and_recharges(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media, TICKET_PDF_WORKERS=0))
+        tickets = reserve_seats(make_showtime(), self.customer, [(1, 1)])
+        ticket_total = tickets.total_amount
+        self.client.post(f'/snacks/{self.popcorn.pk}/', {'qty': 2})
+        responses = []
+
+        class CartGateway(checkout.FakeGateway):
+            async def charge(gw, order_id, amount, method):
+                # El carrito se paga mientras el cobro de los boletos sigue en vuelo
+                if not responses:
+                    responses.append(await sync_to_async(self.client.post)('/carrito/', {'action': 'checkout'}))
+                return await super().charge(order_id, amount, method)
+
+        gateway = CartGateway()
+        with self.assertRaises(checkout.CheckoutError), self.assertLogs('cinema.checkout', 'WARNING'):
+            checkout.settle(tickets.pk, self.customer, PaymentMethod.CARD, gateway)
+        self.assertRedirects(responses[0], f'/order/{tickets.pk}/confirm/', fetch_redirect_response=False)
+        self.assertEqual(gateway.refunds, [gateway.charges[0]])
+        tickets.refresh_from_db()
+        self.assertEqual(tickets.status, Order.Status.PENDING)
+        self.assertEqual(tickets.order_snacks.get().qty, 2)
+
+        # El reintento cobra el total nuevo, boletos más snacks
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout.settle(tickets.pk, self.customer, PaymentMethod.CARD, gateway)
+        self.assertEqual(len(gateway.charges), 2)
+        self.assertEqual(gateway.charges[1].amount, ticket_total + 2 * self.popcorn.price)
+        self.assertEqual(Order.objects.get(pk=tickets.pk).status, Order.Status.PAID)
+
+    def test_checkout_drops_unavailable_snacks(self):
+        self.client.post(f'/snacks/{self.popcorn.pk}/', {'qty': 1})
+        self.client.post(f'/snacks/{self.soda.pk}/', {'qty': 1})
+        SnackItem.objects.filter(pk=self.soda.pk).update(is_available=False)
+        response = self.client.post('/carrito/', {'action': 'checkout'})
+        self.assertRedirects(response, '/carrito/', fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.session_cart().lines, {str(self.popcorn.pk): 1})
+
+        response = self.client.post('/carrito/', {'action': 'checkout'})
+        order = Order.objects.get()
+        self.assertRedirects(response, f'/order/{order.pk}/confirm/', fetch_redirect_response=False)
+        self.assertContains(self.client.get(response.url), '1 × Palomitas')
@@ -0,0 +1,216 @@
+# cinema/ticket_pdf.py
+"""Generación de boletos en PDF y códigos QR.
+
+Cuando una orden pasa a PAGADA se agenda :func:`generate_order_assets` en un
+pool de hilos: arma el PDF y un QR por boleto una sola vez y los guarda bajo
+``MEDIA_ROOT`` (``Order.ticket_pdf`` y ``Ticket.qr_code``).  Las descargas
+posteriores sólo sirven el archivo.
+
+Para taquilla, :func:`export_pdf` y :func:`export_zip` imprimen muchas
+órdenes/funciones a la vez (una página y un QR por asiento pagado), repartiendo
+el dibujo entre los procesos de un pool compartido y leyendo las órdenes por
+lotes.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import groupby
+from operator import attrgetter
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from reportlab.pdfgen import canvas
+
+from .models import Order, OrderTicket, ReservationStatus, Ticket
+from .ticket_render import (  # noqa: F401
+    PAGE_SIZE, draw_seat_page, order_qr_data, order_with_qrs, qr_png, render_order_pdf,
+    render_seat_pages, ticket_qr_data,
+)
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_export_executors: dict[int, ProcessPoolExecutor] = {}
+
+
+# ──────────────────────────────── DATOS ────────────────────────────────
+LINE_RELATED = ('ticket__seat', 'ticket__showtime__movie', 'ticket__showtime__auditorium__cinema')
+
+
+def _seat_entry(ot: OrderTicket) -> dict:
+    ticket, show = ot.ticket, ot.ticket.showtime
+    return {
+        'ticket_id': ticket.pk,
+        'row': ticket.seat.row,
+        'col': ticket.seat.col,
+        'seat_type': ticket.seat.seat_type,
+        'price': ticket.price,
+        'movie': show.movie.title,
+        'start_time': show.start_time,
+        'auditorium': show.auditorium.name,
+        'cinema': show.auditorium.cinema.name,
+    }
+
+
+def order_ticket_data(order: Order) -> dict:
+    """Datos planos de la orden para el PDF, en una sola consulta."""
+    lines = list(
+        OrderTicket.objects
+        .filter(order=order)
+        .select_related(*LINE_RELATED)
+        .order_by('ticket__seat__row', 'ticket__seat__col')
+    )
+    seats = [_seat_entry(ot) for ot in lines]
+    return {
+        'order_id': order.pk,
+        'user_id': order.customer.user_id if order.customer_id else None,
+        'total_amount': order.total_amount,
+        'seats': seats,
+    }
+
+
+# ─────────────────────────────── ARCHIVOS ──────────────────────────────
+def generate_order_assets(order_id: int) -> Order:
+    """Genera y guarda el PDF de la orden y el QR de cada boleto."""
+    order = Order.objects.select_related('customer').get(pk=order_id)
+    data = order_ticket_data(order)
+
+    tickets = []
+    for seat in data['seats']:
+        ticket = Ticket(pk=seat['ticket_id'])
+        ticket.qr_code.save(
+            f"ticket_{seat['ticket_id']}.png",
+            ContentFile(qr_png(ticket_qr_data(seat['ticket_id'], order.pk))),
+            save=False,
+        )
+        tickets.append(ticket)
+    Ticket.objects.bulk_update(tickets, ['qr_code'])
+
+    if order.ticket_pdf:
+        order.ticket_pdf.delete(save=False)
+    order.ticket_pdf.save(f"ticket_{order.pk}.pdf", ContentFile(render_order_pdf(data)), save=False)
+    order.save(update_fields=['ticket_pdf', 'updated'])
+    return order
+
+
+def _generate_in_worker(order_id: int) -> None:
+    close_old_connections()
+    try:
+        generate_order_assets(order_id)
+    except Exception:
+        logger.exception('No se pudo generar el PDF de la orden %s', order_id)
+    finally:
+        close_old_connections()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'TICKET_PDF_WORKERS', 2),
+            thread_name_prefix='ticket-pdf',
+        )
+    return _executor
+
+
+def schedule_order_assets(order: Order) -> None:
+    """Agenda la generación tras el commit; con ``TICKET_PDF_WORKERS = 0`` corre en línea."""
+    if getattr(settings, 'TICKET_PDF_WORKERS', 2) == 0:
+        transaction.on_commit(lambda: generate_order_assets(order.pk))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_generate_in_worker, order.pk))
+
+
+# ──────────────────────────── EXPORTACIÓN MASIVA ────────────────────────────
+def iter_batch_orders(order_ids: Iterable[int] = (), showtime_ids: Iterable[int] = (),
+                      chunk_size: int = 500) -> Iterator[dict]:
+    """Órdenes (datos planos) con sus asientos pagados, leídas por lotes.
+
+    Los apartados sin pagar no se imprimen: un boleto con QR vale como entrada.
+    Con ``showtime_ids`` sólo se incluyen los asientos de esas funciones.
+    """
+    lines = (
+        OrderTicket.objects
+        .filter(Q(order_id__in=list(order_ids)) | Q(ticket__showtime_id__in=list(showtime_ids)))
+        .filter(ticket__status=ReservationStatus.PAID)
+        .select_related('order__customer', *LINE_RELATED)
+        .order_by('order_id', 'ticket__showtime_id', 'ticket__seat__row', 'ticket__seat__col')
+        .iterator(chunk_size=chunk_size)
+    )
+    for _, group in groupby(lines, key=attrgetter('order_id')):
+        group = list(group)
+        order = group[0].order
+        yield {
+            'order_id': order.pk,
+            'user_id': order.customer.user_id if order.customer_id else None,
+            'total_amount': order.total_amount,
+            'seats': [_seat_entry(ot) for ot in group],
+        }
+
+
+class _InlineExecutor:
+    """Sustituto sin procesos (``workers=0``) con la misma interfaz ``submit``."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def _pool(workers: int):
+    """Pool de procesos del proceso actual, creado una sola vez por tamaño.
+
+    Arrancar procesos 'spawn' cuesta más que dibujar unos cuantos boletos, así
+    que las exportaciones lo reutilizan en vez de abrir uno por petición.
+    """
+    if workers == 0:
+        return _InlineExecutor()
+    executor = _export_executors.get(workers)
+    if executor is None:
+        # 'spawn': los hijos no heredan conexiones ni hilos del servidor
+        executor = _export_executors[workers] = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+        )
+    return executor
+
+
+def _window_map(executor, fn, items: Iterable, window: int) -> Iterator:
+    """Como ``executor.map`` pero con a lo sumo ``window`` tareas en vuelo (memoria acotada)."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def export_pdf(orders: Iterable[dict], fileobj, workers: int = 2) -> int:
+    """Un solo PDF multipágina; los QR se generan en paralelo. Devuelve las páginas escritas."""
+    pages = 0
+    p = canvas.Canvas(fileobj, pagesize=PAGE_SIZE)
+    orders_with_qrs = _window_map(_pool(workers), order_with_qrs, orders, max(1, workers) * 2)
+    for order, qrs in orders_with_qrs:
+        for seat, qr in zip(order['seats'], qrs):
+            draw_seat_page(p, order, seat, qr)
+            pages += 1
+    p.save()
+    return pages
+
+
+def export_zip(orders: Iterable[dict], fileobj, workers: int = 2) -> int:
+    """ZIP con un PDF por orden, dibujados en paralelo. Devuelve los archivos escritos."""
+    files = 0
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for order_id, pdf in _window_map(_pool(workers), render_seat_pages, orders, max(1, workers) * 2):
+            zf.writestr(f"orden_{order_id}.pdf", pdf)
+            files += 1
+    return files
@@ -0,0 +1,148 @@
+# cinema/ticket_render.py
+"""Dibujo de boletos con ReportLab.
+
+Sólo depende de ReportLab/qrcode y recibe datos planos (dicts), sin tocar el
+ORM, para poder ejecutarse en procesos hijos (ver exportación masiva en
+``cinema.ticket_pdf``).
+"""
+from __future__ import annotations
+
+import io
+from functools import lru_cache
+
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A6, landscape
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+import qrcode
+
+PAGE_SIZE = landscape(A6)
+
+
+@lru_cache(maxsize=2048)
+def qr_png(data: str) -> bytes:
+    """PNG del QR para ``data``; se memoriza porque el mismo QR se pide muchas veces."""
+    buffer = io.BytesIO()
+    qrcode.make(data).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def order_qr_data(order_id: int, user_id: int | None) -> str:
+    return f"ORDER-{order_id}-USER-{user_id}"
+
+
+def ticket_qr_data(ticket_id: int, order_id: int) -> str:
+    return f"TICKET-{ticket_id}-ORDER-{order_id}"
+
+
+def render_order_pdf(data: dict) -> bytes:
+    """Boleto A6 de la orden (mismo diseño que la descarga original)."""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=PAGE_SIZE)
+    width, height = PAGE_SIZE
+    show = data['seats'][0] if data['seats'] else None
+
+    # Encabezado principal
+    p.setFont("Helvetica-Bold", 16)
+    p.drawCentredString(width / 2, height - 15 * mm, "MIAU PELIS CINE")
+    p.setLineWidth(1)
+    p.line(5 * mm, height - 17 * mm, width - 5 * mm, height - 17 * mm)
+    p.setLineWidth(0.3)
+    p.line(5 * mm, height - 18 * mm, width - 5 * mm, height - 18 * mm)
+
+    # Información de la orden
+    p.setFont("Helvetica", 9)
+    y = height - 24 * mm
+    p.drawString(5 * mm, y, f"Orden #: {data['order_id']}")
+    if show:
+        y -= 5 * mm
+        p.drawString(5 * mm, y, f"Película: {show['movie']}")
+        y -= 5 * mm
+        p.drawString(5 * mm, y, f"Función: {show['start_time'].strftime('%d/%m/%Y %H:%M')}")
+        y -= 5 * mm
+        p.drawString(5 * mm, y, f"Sala: {show['auditorium']} ({show['cinema']})")
+
+    y -= 7 * mm
+    p.setFont("Helvetica-Bold", 10)
+    p.drawString(5 * mm, y, "Asientos:")
+
+    # Lista de asientos
+    p.setFont("Helvetica", 9)
+    x = 25 * mm
+    for seat in data['seats']:
+        p.drawString(x, y, f"{seat['row']}-{seat['col']}")
+        x += 15 * mm
+        if x > width - 20 * mm:
+            x = 25 * mm
+            y -= 5 * mm
+
+    y -= 10 * mm
+
+    # Total pagado
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(5 * mm, y, f"Total Pagado: ${data['total_amount']:.2f}")
+
+    # Código QR
+    qr = ImageReader(io.BytesIO(qr_png(order_qr_data(data['order_id'], data['user_id']))))
+    p.drawImage(qr, width - 35 * mm, 5 * mm, 30 * mm, 30 * mm)
+
+    # Leyenda QR
+    p.setFont("Helvetica-Oblique", 6)
+    p.drawCentredString(width - 20 * mm, 4 * mm, "Escanea para validar tu entrada")
+
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+# ──────────────────────────── UNA PÁGINA POR ASIENTO ────────────────────────
+def draw_seat_page(p: canvas.Canvas, order: dict, seat: dict, qr: bytes) -> None:
+    """Dibuja (y cierra) la página de un asiento con su propio QR."""
+    width, height = PAGE_SIZE
+
+    p.setFont("Helvetica-Bold", 16)
+    p.drawCentredString(width / 2, height - 15 * mm, "MIAU PELIS CINE")
+    p.setLineWidth(1)
+    p.line(5 * mm, height - 17 * mm, width - 5 * mm, height - 17 * mm)
+
+    p.setFont("Helvetica", 9)
+    y = height - 24 * mm
+    for text in (
+        f"Orden #: {order['order_id']}",
+        f"Película: {seat['movie']}",
+        f"Función: {seat['start_time'].strftime('%d/%m/%Y %H:%M')}",
+        f"Sala: {seat['auditorium']} ({seat['cinema']})",
+    ):
+        p.drawString(5 * mm, y, text)
+        y -= 5 * mm
+
+    y -= 3 * mm
+    p.setFont("Helvetica-Bold", 14)
+    p.drawString(5 * mm, y, f"Asiento {seat['row']}-{seat['col']}")
+    p.setFont("Helvetica", 9)
+    y -= 6 * mm
+    p.drawString(5 * mm, y, f"{seat['seat_type']} · ${seat['price']:.2f}")
+
+    p.drawImage(ImageReader(io.BytesIO(qr)), width - 35 * mm, 5 * mm, 30 * mm, 30 * mm)
+    p.setFont("Helvetica-Oblique", 6)
+    p.drawCentredString(width - 20 * mm, 4 * mm, "Escanea para validar tu entrada")
+    p.showPage()
+
+
+def seat_qrs(order: dict) -> list[bytes]:
+    """QR de cada asiento de la orden (trabajo pesado, apto para otro proceso)."""
+    return [qr_png(ticket_qr_data(seat['ticket_id'], order['order_id'])) for seat in order['seats']]
+
+
+def order_with_qrs(order: dict) -> tuple[dict, list[bytes]]:
+    return order, seat_qrs(order)
+
+
+def render_seat_pages(order: dict) -> tuple[int, bytes]:
+    """PDF de la orden con una página por asiento; devuelve ``(order_id, pdf)``."""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=PAGE_SIZE)
+    for seat, qr in zip(order['seats'], seat_qrs(order)):
+        draw_seat_page(p, order, seat, qr)
+    p.save()
+    return order['order_id'], buffer.getvalue()
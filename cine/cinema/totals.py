@@ -0,0 +1,72 @@
+# cinema/totals.py
+"""Totales de órdenes calculados en la base de datos.
+
+Los subtotales de boletos y snacks se obtienen con agregados SQL y se
+guardan desnormalizados en ``Order`` (``ticket_total``, ``snack_total``,
+``item_count`` y ``total_amount``) con un solo ``UPDATE``, para cualquier
+cantidad de órdenes.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Iterable
+
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Order, OrderSnack, OrderTicket
+
+MONEY = models.DecimalField(max_digits=8, decimal_places=2)
+ZERO = Value(Decimal('0.00'), output_field=MONEY)
+
+
+def _per_order(queryset, expression, default=ZERO):
+    """Subconsulta correlacionada: agregado de las líneas de cada orden."""
+    return Coalesce(
+        Subquery(
+            queryset
+            .filter(order=OuterRef('pk'))
+            .order_by()
+            .values('order')
+            .annotate(total=expression)
+            .values('total')[:1]
+        ),
+        default,
+        output_field=expression.output_field,
+    )
+
+
+def ticket_total_expr():
+    return _per_order(OrderTicket.objects, Sum('ticket__price', output_field=MONEY))
+
+
+def snack_total_expr():
+    return _per_order(OrderSnack.objects, Sum(F('qty') * F('price'), output_field=MONEY))
+
+
+def item_count_expr():
+    count = models.IntegerField()
+    tickets = _per_order(OrderTicket.objects, models.Count('id', output_field=count), Value(0))
+    snacks = _per_order(OrderSnack.objects, Sum('qty', output_field=count), Value(0))
+    return tickets + snacks
+
+
+def refresh_order_totals(order_ids: Iterable[int]) -> int:
+    """Recalcula los totales de varias órdenes en un solo ``UPDATE``."""
+    return Order.objects.filter(pk__in=list(order_ids)).update(
+        ticket_total=ticket_total_expr(),
+        snack_total=snack_total_expr(),
+        item_count=item_count_expr(),
+        total_amount=ticket_total_expr() + snack_total_expr(),
+        updated=timezone.now(),
+    )
+
+
+def recompute_order_totals(order: Order) -> Order:
+    """Recalcula y recarga los totales de ``order`` (dos consultas en una transacción)."""
+    with transaction.atomic():
+        refresh_order_totals([order.pk])
+        order.refresh_from_db(fields=['ticket_total', 'snack_total', 'item_count', 'total_amount'])
+    return order
@@ -1,17 +1,23 @@
 from django.urls import path 
 from .views import (
     NewsletterSubscribeView, HomeView, SeatSelectionView, ShowtimeDetailView,
-    SnackDetailView, SnackListView, PeliculasView, EstrenosView, RegistrarView,OrderConfirmView, OrderSuccessView, OrderListView, TicketPDFView, CancelOrderView
+    SnackDetailView, SnackListView, PeliculasView, EstrenosView, RegistrarView,OrderConfirmView, OrderSuccessView, OrderListView, TicketPDFView, CancelOrderView,
+    TicketBatchExportView, SeatStreamView, MovieSearchView, CarteleraBrowseView, MetricsView,
+    ReportsView, CartView,
 )
 
 urlpatterns = [
     path("", HomeView.as_view(), name="home"),
     path("peliculas/", PeliculasView.as_view(), name="peliculas"),
+    path("peliculas/buscar/", MovieSearchView.as_view(), name="movie_search"),
+    path("cartelera/", CarteleraBrowseView.as_view(), name="cartelera_browse"),
     path("estrenos/", EstrenosView.as_view(), name="estrenos"),
     path("showtime/<int:pk>/", ShowtimeDetailView.as_view(), name="showtime_detail"),
     path("snacks/", SnackListView.as_view(), name="snack_list"),
     path("snacks/<int:pk>/", SnackDetailView.as_view(), name="snack_detail"),
+    path("carrito/", CartView.as_view(), name="cart"),
     path("showtime/<int:pk>/seats/", SeatSelectionView.as_view(), name="seat_selection"),
+    path("showtime/<int:pk>/seats/stream/", SeatStreamView.as_view(), name="seat_stream"),
     path('newsletter/', NewsletterSubscribeView.as_view(), name='newsletter'),
     path('registrar/', RegistrarView.as_view(), name='registrar'),  # <-- Aquí agregas esta línea
 
@@ -23,6 +29,9 @@ urlpatterns = [
    path('order/<int:order_id>/success/',OrderSuccessView.as_view(),name='order_success'),
    path('orders/', OrderListView.as_view(), name='orders_list'),
    path('order/<int:order_id>/ticket.pdf',TicketPDFView.as_view(),name='ticket_pdf'),
+   path('tickets/export/', TicketBatchExportView.as_view(), name='ticket_export'),
 
    path('order/<int:order_id>/cancel/',CancelOrderView.as_view(),name='order_cancel'),
+   path('metrics/', MetricsView.as_view(), name='metrics'),
+   path('reportes/', ReportsView.as_view(), name='reports'),
 ]
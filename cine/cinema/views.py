@@ -10,6 +10,13 @@ from .models import Showtime, Ticket, Seat, ReservationStatus
 from .models import Customer, Order, OrderTicket, PaymentMethod, Showtime, SnackItem, OrderSnack
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from .cartelera import get_cartelera
+from .pagination import keyset_page
+from django.db.models import Count, Prefetch
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.http import Http404, JsonResponse
+from asgiref.sync import sync_to_async
+from . import cart, facets, search
 
 # Importaciones para registro de usuario
 from django.contrib.auth.forms import UserCreationForm
@@ -24,25 +31,10 @@ class HomeView(TemplateView):
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
 
-        # Cartelera: próximas 30 funciones ordenadas por hora
-        ctx["showtimes"] = (
-            Showtime.objects
-            .select_related("movie", "auditorium", "auditorium__cinema")
-            .filter(
-                movie__is_active=True,
-                auditorium__cinema__is_active=True,
-                start_time__gte=timezone.now(),
-            )
-            .order_by("start_time")[:30]
-        )
-
-        # Snacks destacados: los 6 primeros disponibles (puedes cambiar el criterio)
-        ctx["snacks"] = (
-            SnackItem.objects
-            .select_related("category")
-            .filter(is_available=True)
-            .order_by("-updated")[:6]
-        )
+        # Cartelera (próximas 30 funciones) y snacks destacados, desde caché
+        cartelera = get_cartelera()
+        ctx["showtimes"] = cartelera["showtimes"]
+        ctx["snacks"] = cartelera["snacks"]
         return ctx
 
 
@@ -71,32 +63,64 @@ class NewsletterSubscribeView(View):
         return redirect(request.META.get('HTTP_REFERER', '/'))
 
 
-class ShowtimeDetailView(DetailView):
-    model = Showtime
+# ─────────────────────────── CATÁLOGO (ASYNC) ───────────────────────────
+# Vistas de sólo lectura con el ORM async: bajo ASGI (cine.asgi) no ocupan
+# un hilo del worker mientras esperan a la base.  El usuario y la sesión se
+# cargan antes de dibujar, porque la plantilla no puede hacer consultas
+# desde el loop.
+async def arender(request, template_name, context):
+    request.user = await request.auser()
+    await request.session.aitems()      # carga la sesión (mensajes)
+    return render(request, template_name, context)
+
+
+async def apaginate(queryset, per_page, page_number):
+    """Como ``ListView.paginate_queryset`` pero con ``acount`` e iteración async."""
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()
+    try:
+        number = paginator.validate_number(page_number or 1)
+    except InvalidPage as exc:
+        raise Http404(str(exc))
+    bottom = (number - 1) * per_page
+    objects = [obj async for obj in queryset[bottom:bottom + per_page]]
+    return paginator, Page(objects, number, paginator)
+
+
+class ShowtimeDetailView(View):
     template_name = "showtime_detail.html"
-    context_object_name = "showtime"
 
-    def get_queryset(self):
-        return (
-            super()
-            .get_queryset()
-            .select_related("movie", "auditorium__cinema")
-        )
+    async def get(self, request, pk):
+        try:
+            showtime = await (
+                Showtime.objects
+                .select_related("movie", "auditorium__cinema")
+                .aget(pk=pk)
+            )
+        except Showtime.DoesNotExist:
+            raise Http404("Función no encontrada")
+        return await arender(request, self.template_name, {"showtime": showtime, "object": showtime})
 
 
-class SnackListView(ListView):
-    model = SnackItem
+class SnackListView(View):
     template_name = "snack_list.html"
-    context_object_name = "snacks"
     paginate_by = 12
 
-    def get_queryset(self):
-        return (
+    async def get(self, request):
+        queryset = (
             SnackItem.objects
             .filter(is_available=True)
             .select_related("category")
             .order_by("name")
         )
+        paginator, page = await apaginate(queryset, self.paginate_by, request.GET.get("page"))
+        return await arender(request, self.template_name, {
+            "snacks": page.object_list,
+            "object_list": page.object_list,
+            "paginator": paginator,
+            "page_obj": page,
+            "is_paginated": page.has_other_pages(),
+        })
 
 
 
@@ -110,106 +134,113 @@ class SnackDetailView(LoginRequiredMixin, DetailView):
 
 
    def post(self, request, *args, **kwargs):
-       self.object = self.get_object()  # el SnackItem
-       qty = int(request.POST.get('qty', 1))
-       if qty < 1:
+       # El carrito vive en la sesión y el snack sale del catálogo en caché: sin consultas
+       snack = cart.catalog().get(self.kwargs['pk'])
+       if snack is None:
+           messages.error(request, "Ese snack ya no está disponible.")
+           return redirect('snack_list')
+       try:
+           qty = max(int(request.POST.get('qty', 1)), 1)
+       except ValueError:
            qty = 1
-
-
-       # 1) Perfil de cliente
-       customer, _ = Customer.objects.get_or_create(user=request.user)
-
-
-       # 2) Orden PENDING (o la nueva si no existe)
-       order, _ = Order.objects.get_or_create(
-           customer=customer,
-           status=Order.Status.PENDING,
-           defaults={'total_amount': 0}
-       )
-
-
-       # 3) Añadimos o actualizamos la línea de snack
-       line, created = OrderSnack.objects.get_or_create(
-           order=order,
-           snack=self.object,
-           defaults={'qty': qty, 'price': self.object.price}
+       total = cart.Cart(request.session).add(self.kwargs['pk'], qty)
+       messages.success(request,
+           f"Añadiste {qty} × {snack.name} a tu carrito (llevas {total})."
        )
-       if not created:
-           line.qty += qty
-           line.save()
+       return redirect('snack_detail', pk=self.kwargs['pk'])
 
 
-       # 4) Recalculamos total (tickets + snacks)
-       total_tickets = sum(float(t.price) for t in order.order_tickets.all())
-       total_snacks  = sum(s.line_total() for s in order.order_snacks.all())
-       order.total_amount = total_tickets + total_snacks
-       order.save()
+class CartView(LoginRequiredMixin, View):
+   login_url = 'login'
+   template_name = 'cart.html'
 
 
-       messages.success(request,
-           f"Añadiste {qty} × {self.object.name} a tu orden #{order.id}."
-       )
-       return redirect('snack_detail', pk=self.object.pk)
+   def get(self, request):
+       current = cart.Cart(request.session)
+       return render(request, self.template_name, {
+           'lines': current.items(),
+           'total': current.total(),
+       })
 
 
-class SeatSelectionView(View):
-    template_name = "seat_selection.html"
+   def post(self, request):
+       current = cart.Cart(request.session)
+       if request.POST.get('action') != 'checkout':
+           # Actualizar cantidades: qty-<snack_id>; 0 quita la línea
+           for key in list(current.lines):
+               try:
+                   current.set(int(key), int(request.POST.get(f'qty-{key}', current.lines[key])))
+               except ValueError:
+                   pass
+           return redirect('cart')
 
-    def get(self, request, pk):
-        showtime = get_object_or_404(
-            Showtime.objects.select_related("auditorium__cinema", "movie"),
-            pk=pk
-        )
-        aud = showtime.auditorium
+       customer, _ = Customer.objects.get_or_create(user=request.user)
+       try:
+           order = cart.checkout(current, customer, cart.pending_ticket_order(customer))
+       except cart.CartError as exc:
+           messages.error(request, str(exc))
+           return redirect('cart')
+       return redirect('order_confirm', order_id=order.id)
 
-        # Asientos “tomados”
-        taken = set(
-            showtime.tickets
-            .filter(status__in=[ReservationStatus.RESERVED, ReservationStatus.PAID])
-            .values_list("seat_id", flat=True)
-        )
 
-        # Obtener los asientos creados en BD
-        seats_qs = aud.seats.all().order_by("row", "col")
-        if not seats_qs.exists():
-            return render(request, self.template_name, {
-                "showtime": showtime, 
-                "no_seats": True
-            })
-
-        # Agrupamos por fila
-        grid = {}
-        for seat in seats_qs:
-            grid.setdefault(seat.row, []).append(seat)
-
-        return render(request, self.template_name, {
-            "showtime": showtime,
-            "grid": grid,
-            "taken": taken,
+# Vista para mostrar todas las películas activas (o las que coinciden con ?q=)
+class PeliculasView(View):
+    template_name = "peliculas.html"
+    search_limit = 60
+
+    async def get(self, request):
+        q = request.GET.get("q", "").strip()
+        if q:
+            ranked = await sync_to_async(search.search)(q, self.search_limit)
+            found = await Movie.objects.ain_bulk([movie_id for movie_id, _ in ranked])
+            peliculas = [found[movie_id] for movie_id, _ in ranked if movie_id in found]
+        else:
+            peliculas = [m async for m in Movie.objects.filter(is_active=True).order_by("title")]
+        return await arender(request, self.template_name, {
+            "peliculas": peliculas,
+            "object_list": peliculas,
+            "q": q,
         })
 
 
-# Vista para mostrar todas las películas activas
-class PeliculasView(ListView):
-    model = Movie
-    template_name = "peliculas.html"
-    context_object_name = "peliculas"
+# Autocompletado: resultados directos del índice, sin consultas
+class MovieSearchView(View):
+    limit = 10
 
-    def get_queryset(self):
-        return Movie.objects.filter(is_active=True).order_by("title")
+    async def get(self, request):
+        results = await sync_to_async(search.suggest)(request.GET.get("q", ""), self.limit)
+        return JsonResponse({"results": [{"id": movie_id, "title": title} for movie_id, title in results]})
 
 
 # Vista para mostrar próximos estrenos
-class EstrenosView(ListView):
-    model = Movie
+class EstrenosView(View):
     template_name = "estrenos.html"
-    context_object_name = "peliculas"
 
-    def get_queryset(self):
-        return Movie.objects.filter(
+    async def get(self, request):
+        queryset = Movie.objects.filter(
             release_date__gte=timezone.now(),
             is_active=True
         ).order_by("release_date")
+        peliculas = [m async for m in queryset]
+        return await arender(request, self.template_name, {
+            "peliculas": peliculas,
+            "estrenos": peliculas,      # nombre que usa la plantilla
+            "object_list": peliculas,
+        })
+
+
+# API de cartelera con filtros y conteos por faceta (?city=&cinema=&date=&language=&format=&genre=)
+class CarteleraBrowseView(View):
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            limit = min(int(request.GET.get("limit", 50)), self.max_limit)
+            offset = max(int(request.GET.get("offset", 0)), 0)
+        except ValueError:
+            return JsonResponse({"error": "limit y offset deben ser enteros"}, status=400)
+        filters = {facet: request.GET.getlist(facet) for facet in facets.FACETS}
+        return JsonResponse(facets.browse(filters, limit=limit, offset=offset))
 
 
 # --- Clases para registro de usuario ---
@@ -235,6 +266,19 @@ class RegistrarView(FormView):
 from django.db import transaction
 from django.contrib.auth.mixins import LoginRequiredMixin
 from .models import Order, OrderTicket, PaymentMethod, Showtime, SnackItem
+from . import pricing, seatmap
+from .reservations import SeatUnavailable, reserve_seats
+from . import checkout, reporting, ticket_pdf
+
+
+def parse_seat_cells(values):
+    """Convierte los valores "fila-columna" del formulario en un set de tuplas."""
+    cells = set()
+    for value in values:
+        row, _, col = value.partition('-')
+        if row.isdigit() and col.isdigit():
+            cells.add((int(row), int(col)))
+    return cells
 
 
 class SeatSelectionView(LoginRequiredMixin, View):
@@ -243,37 +287,37 @@ class SeatSelectionView(LoginRequiredMixin, View):
 
 
    def get(self, request, pk):
+       # Función + sala + película + mapa de disponibilidad en una sola consulta
        showtime = get_object_or_404(
-           Showtime.objects.select_related("auditorium__cinema", "movie"),
+           Showtime.objects.select_related("auditorium__cinema", "movie", "seat_map"),
            pk=pk
        )
-       aud = showtime.auditorium
-       taken = set(
-           showtime.tickets
-           .filter(status__in=[ReservationStatus.RESERVED, ReservationStatus.PAID])
-           .values_list("seat_id", flat=True)
-       )
-       seats_qs = aud.seats.all().order_by("row", "col")
-       if not seats_qs.exists():
+       seat_map = seatmap.get_seat_map(showtime)
+       if not seat_map.has_seats:
            return render(request, self.template_name, {
                "showtime": showtime,
                "no_seats": True
            })
-       grid = {}
-       for seat in seats_qs:
-           grid.setdefault(seat.row, []).append(seat)
+       # Precio de cada butaca: la tabla ya compilada + el tipo guardado en Seat (como al cobrar)
+       prices = pricing.quote(showtime, seat_map)
+       grid = {
+           row: [(cell, prices[seat_map.seat_type(cell.row, cell.col)]) for cell in cells]
+           for row, cells in seat_map.grid().items()
+       }
+       seat_types = {seat_map.seat_type(cell.row, cell.col) for cells in grid.values() for cell, _ in cells
+                     if cell.is_seat}
        return render(request, self.template_name, {
            "showtime": showtime,
            "grid": grid,
-           "taken": taken,
+           "live_seats": realtime.is_available(request),
+           "price_list": sorted((seat_type, prices[seat_type]) for seat_type in seat_types),
        })
 
 
-   @transaction.atomic
    def post(self, request, pk):
        showtime = get_object_or_404(Showtime, pk=pk)
-       seat_ids = request.POST.getlist('seats')
-       if not seat_ids:
+       cells = parse_seat_cells(request.POST.getlist('seats'))
+       if not cells:
            return self.get(request, pk)
 
 
@@ -281,37 +325,83 @@ class SeatSelectionView(LoginRequiredMixin, View):
        customer, created = Customer.objects.get_or_create(user=request.user)
 
 
-       tickets, total = [], 0
-       for sid in seat_ids:
-           ticket, was_created = Ticket.objects.get_or_create(
-               showtime=showtime,
-               seat_id=sid,
-               defaults={
-                   'customer': customer,
-                   'status': ReservationStatus.RESERVED,
-                   'price': showtime.base_price
-               }
-           )
-           if not was_created and ticket.status != ReservationStatus.RESERVED:
-               ticket.status = ReservationStatus.RESERVED
-               ticket.customer = customer
-               ticket.price = showtime.base_price
-               ticket.save()
-           tickets.append(ticket)
-           total += float(ticket.price)
-
-
-       order = Order.objects.create(
-           customer=customer,
-           total_amount=total,
-           status=Order.Status.PENDING
-       )
-       for t in tickets:
-           OrderTicket.objects.create(order=order, ticket=t)
+       try:
+           order = reserve_seats(showtime, customer, cells)
+       except SeatUnavailable as exc:
+           messages.error(request, f"{exc}. Elige otros, por favor.")
+           return redirect('seat_selection', pk=showtime.pk)
 
 
        return redirect('order_confirm', order_id=order.id)
-  
+
+
+
+
+
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+from . import realtime
+
+
+class SeatStreamView(View):
+   """Cambios del mapa de asientos en vivo (Server-Sent Events).
+
+   Primero manda el mapa completo (``snapshot``) y luego sólo los cambios
+   (``seats``).  Requiere servir el proyecto con ASGI (``cine.asgi``); bajo
+   WSGI responde 204, que le indica al ``EventSource`` que no reintente.
+   """
+   heartbeat = 15     # segundos entre comentarios para mantener viva la conexión
+
+
+   async def get(self, request, pk):
+       if not realtime.is_available(request):
+           return HttpResponse(status=204)
+       if not await Showtime.objects.filter(pk=pk).aexists():
+           raise Http404
+       response = StreamingHttpResponse(self.events(pk), content_type='text/event-stream')
+       response['Cache-Control'] = 'no-cache'
+       response['X-Accel-Buffering'] = 'no'     # que nginx no lo acumule
+       return response
+
+
+   @staticmethod
+   def format(event, data):
+       return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+   async def snapshot(self, pk):
+       showtime = await Showtime.objects.select_related('auditorium', 'seat_map').aget(pk=pk)
+       seat_map = await sync_to_async(seatmap.get_seat_map)(showtime)
+       return self.format('snapshot', realtime.snapshot(seat_map))
+
+
+   async def events(self, pk):
+       # Nos suscribimos antes de leer el mapa: los cambios son estados absolutos,
+       # así que repetir alguno tras el snapshot no hace daño.
+       subscription = realtime.get_broker().subscribe(pk)
+       pending = asyncio.ensure_future(anext(subscription))
+       try:
+           yield 'retry: 3000\n\n'
+           yield await self.snapshot(pk)
+           while True:
+               done, _ = await asyncio.wait({pending}, timeout=self.heartbeat)
+               if not done:
+                   yield ': ping\n\n'
+                   continue
+               changes = pending.result()
+               pending = asyncio.ensure_future(anext(subscription))
+               if changes is realtime.RESYNC:
+                   yield await self.snapshot(pk)
+               else:
+                   yield self.format('seats', changes)
+       finally:
+           # La suscripción no se puede cerrar mientras el anext() sigue corriendo
+           pending.cancel()
+           await asyncio.wait({pending})
+           await subscription.aclose()
+
 
 
 
@@ -323,7 +413,11 @@ class OrderConfirmView(LoginRequiredMixin, View):
 
    def get(self, request, order_id):
        order = get_object_or_404(
-           Order, id=order_id, customer=request.user.customer
+           Order.objects.prefetch_related(
+               Prefetch('order_tickets', queryset=OrderTicket.objects.select_related('ticket__seat')),
+               Prefetch('order_snacks', queryset=OrderSnack.objects.select_related('snack')),
+           ),
+           id=order_id, customer=request.user.customer
        )
        return render(request, self.template_name, {
            'order': order,
@@ -332,14 +426,20 @@ class OrderConfirmView(LoginRequiredMixin, View):
 
 
    def post(self, request, order_id):
-       order = get_object_or_404(
-           Order, id=order_id, customer=request.user.customer
-       )
-       pm = request.POST.get('payment_method')
-       order.payment_method = pm
-       order.status = Order.Status.PAID
-       order.paid_at = timezone.now()
-       order.save()
+       # Cobro fuera de la transacción y asentado en bloque (ver cinema.checkout)
+       try:
+           order = checkout.settle(order_id, request.user.customer, request.POST.get('payment_method'))
+       except Order.DoesNotExist:
+           raise Http404
+       except checkout.InvalidPaymentMethod:
+           messages.error(request, "Elige una forma de pago válida.")
+           return redirect('order_confirm', order_id=order_id)
+       except checkout.PaymentDeclined as exc:
+           messages.error(request, f"{exc} Intenta con otra forma de pago.")
+           return redirect('order_confirm', order_id=order_id)
+       except checkout.CheckoutError:
+           messages.error(request, f"La orden #{order_id} expiró o ya no está pendiente.")
+           return redirect('orders_list')
        return redirect('order_success', order_id=order.id)
   
 class OrderSuccessView(LoginRequiredMixin, View):
@@ -348,24 +448,29 @@ class OrderSuccessView(LoginRequiredMixin, View):
 
 
    def get(self, request, order_id):
+       # Líneas precargadas con todo lo que pinta la plantilla
        order = get_object_or_404(
-           Order, id=order_id, customer__user=request.user
+           Order.objects.prefetch_related(
+               Prefetch('order_tickets', queryset=OrderTicket.objects.select_related(
+                   'ticket__seat', 'ticket__showtime__movie', 'ticket__showtime__auditorium__cinema',
+               ).order_by('id')),
+               Prefetch('order_snacks', queryset=OrderSnack.objects.select_related('snack')),
+           ),
+           id=order_id, customer__user=request.user
        )
-       has_tickets = order.order_tickets.exists()
-       has_snacks  = order.order_snacks.exists()
+       order_tickets = order.order_tickets.all()
+       has_tickets = bool(order_tickets)
+       has_snacks  = bool(order.order_snacks.all())
 
 
-       # <-- Aquí la corrección: -->
-       ticket_total = sum(
-           float(ot.ticket.price) for ot in order.order_tickets.all()
-       )
-       snack_total  = sum(
-           s.line_total() for s in order.order_snacks.all()
-       )
+       # Subtotales desnormalizados en la orden (ver cinema.totals)
+       ticket_total = order.ticket_total
+       snack_total  = order.snack_total
 
 
        return render(request, self.template_name, {
            'order': order,
+           'showtime':     order_tickets[0].ticket.showtime if has_tickets else None,
            'has_tickets':  has_tickets,
            'has_snacks':   has_snacks,
            'ticket_total': ticket_total,
@@ -379,102 +484,110 @@ class OrderListView(LoginRequiredMixin, ListView):
    template_name = 'orders_list.html'
    context_object_name = 'orders'
    login_url = 'login'
+   page_size = 10
 
 
    def get_queryset(self):
-       # Nos aseguramos de tener Customer
-       customer, _ = Customer.objects.get_or_create(user=self.request.user)
-       # Devolvemos las órdenes de este cliente, de más reciente a más antigua
-       return Order.objects.filter(customer=customer).order_by('-created')
-  
+       # Órdenes del cliente con conteos anotados y líneas precargadas:
+       # el número de consultas no depende del tamaño del historial.
+       orders = (
+           Order.objects
+           .filter(customer__user=self.request.user)
+           .annotate(
+               ticket_count=Count('order_tickets', distinct=True),
+               snack_count=Count('order_snacks', distinct=True),
+           )
+           .prefetch_related(
+               Prefetch(
+                   'order_tickets',
+                   queryset=OrderTicket.objects
+                   .select_related('ticket__seat', 'ticket__showtime__auditorium__cinema')
+                   .order_by('ticket__seat__row', 'ticket__seat__col'),
+               ),
+               Prefetch('order_snacks', queryset=OrderSnack.objects.select_related('snack')),
+           )
+       )
+       # Paginación por (created, id), de más reciente a más antigua
+       page, self.next_cursor = keyset_page(orders, self.request.GET.get('cursor'), self.page_size)
+       return page
+
 
+   def get_context_data(self, **kwargs):
+       ctx = super().get_context_data(**kwargs)
+       ctx['next_cursor'] = self.next_cursor
+       return ctx
 
-import io
-from django.http import FileResponse, Http404
 
 
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A6, landscape
-from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
-import qrcode
+import tempfile
+from django.conf import settings
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.http import FileResponse, HttpResponse, HttpResponseBadRequest
+from django.utils.cache import get_conditional_response
+
 
 class TicketPDFView(LoginRequiredMixin, View):
     login_url = 'login'
 
     def get(self, request, order_id):
-        order = get_object_or_404(Order, id=order_id, customer__user=request.user)
-        show = order.order_tickets.first().ticket.showtime
-
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=landscape(A6))
-        width, height = landscape(A6)
-
-        # Encabezado principal
-        p.setFont("Helvetica-Bold", 16)
-        p.drawCentredString(width / 2, height - 15 * mm, "MIAU PELIS CINE")
-        p.setLineWidth(1)
-        p.line(5 * mm, height - 17 * mm, width - 5 * mm, height - 17 * mm)
-        p.setLineWidth(0.3)
-        p.line(5 * mm, height - 18 * mm, width - 5 * mm, height - 18 * mm)
-
-        # Información de la orden
-        p.setFont("Helvetica", 9)
-        y = height - 24 * mm
-        p.drawString(5 * mm, y, f"Orden #: {order.id}")
-        y -= 5 * mm
-        p.drawString(5 * mm, y, f"Película: {show.movie.title}")
-        y -= 5 * mm
-        p.drawString(5 * mm, y, f"Función: {show.start_time.strftime('%d/%m/%Y %H:%M')}")
-        y -= 5 * mm
-        p.drawString(5 * mm, y, f"Sala: {show.auditorium.name} ({show.auditorium.cinema.name})")
-
-        y -= 7 * mm
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(5 * mm, y, "Asientos:")
-
-        # Lista de asientos
-        p.setFont("Helvetica", 9)
-        x = 25 * mm
-        for ot in order.order_tickets.all():
-            p.drawString(x, y, f"{ot.ticket.seat.row}-{ot.ticket.seat.col}")
-            x += 15 * mm
-            if x > width - 20 * mm:
-                x = 25 * mm
-                y -= 5 * mm
-
-        y -= 10 * mm
-
-        # Total pagado
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(5 * mm, y, f"Total Pagado: ${order.total_amount:.2f}")
-
-        # Código QR
-        qr_data = f"ORDER-{order.id}-USER-{request.user.id}"
-        qr_img = qrcode.make(qr_data)
-        qr_buffer = io.BytesIO()
-        qr_img.save(qr_buffer, format="PNG")
-        qr_buffer.seek(0)
-        qr_reader = ImageReader(qr_buffer)
-
-        # Posición del QR
-        p.drawImage(qr_reader, width - 35 * mm, 5 * mm, 30 * mm, 30 * mm)
-
-        # Leyenda QR
-        p.setFont("Helvetica-Oblique", 6)
-        p.drawCentredString(width - 20 * mm, 4 * mm, "Escanea para validar tu entrada")
-
-        # Finalizamos PDF
-        p.showPage()
-        p.save()
-
-        buffer.seek(0)
-        return FileResponse(
-            buffer,
-            as_attachment=True,
-            filename=f"ticket_{order.id}.pdf"
+        order = get_object_or_404(
+            Order.objects.select_related('customer'), id=order_id, customer__user=request.user
         )
-    
+        filename = f"ticket_{order.id}.pdf"
+
+        # Órdenes sin pagar: PDF al vuelo, sin guardarlo
+        if order.status != Order.Status.PAID:
+            pdf = ticket_pdf.render_order_pdf(ticket_pdf.order_ticket_data(order))
+            response = HttpResponse(pdf, content_type='application/pdf')
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+
+        # Pagadas: se sirve el archivo pregenerado (o se genera una vez si falta)
+        if not order.ticket_pdf or not order.ticket_pdf.storage.exists(order.ticket_pdf.name):
+            order = ticket_pdf.generate_order_assets(order.id)
+
+        etag = f'"{order.id}-{order.updated.timestamp():.6f}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = FileResponse(order.ticket_pdf.open('rb'), as_attachment=True, filename=filename)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        return response
+
+
+class TicketBatchExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Impresión de taquilla: ?order=…&showtime=…&format=pdf|zip (sólo staff)."""
+    login_url = 'login'
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        order_ids = [int(v) for v in request.GET.getlist('order') if v.isdigit()]
+        showtime_ids = [int(v) for v in request.GET.getlist('showtime') if v.isdigit()]
+        if not order_ids and not showtime_ids:
+            return HttpResponseBadRequest("Indica al menos una orden o función.")
+        fmt = 'zip' if request.GET.get('format') == 'zip' else 'pdf'
+        workers = getattr(settings, 'TICKET_EXPORT_WORKERS', 2)
+
+        # En disco a partir de cierto tamaño; luego se envía por bloques
+        out = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        batch = ticket_pdf.iter_batch_orders(order_ids=order_ids, showtime_ids=showtime_ids)
+        if fmt == 'zip':
+            ticket_pdf.export_zip(batch, out, workers=workers)
+        else:
+            ticket_pdf.export_pdf(batch, out, workers=workers)
+        out.seek(0)
+        return FileResponse(out, as_attachment=True, filename=f"boletos.{fmt}")
+
+
+from collections import defaultdict
+from .models import SeatState
+from .totals import refresh_order_totals
+
+
 class CancelOrderView(LoginRequiredMixin, View):
    login_url = 'login'
 
@@ -486,22 +599,37 @@ class CancelOrderView(LoginRequiredMixin, View):
            customer__user=request.user,
            status=Order.Status.PENDING
        )
+       now = timezone.now()
+
+
+       # Como el barrido de apartados: todo en una transacción y en bloque
+       with transaction.atomic():
+           # Primero los boletos y luego la orden, el mismo orden de candados que el pago
+           tickets = list(
+               Ticket.objects
+               .select_for_update()
+               .filter(orderticket__order=order, status=ReservationStatus.RESERVED)
+               .order_by('id')
+               .values_list('id', 'showtime_id', 'seat__row', 'seat__col')
+           )
+           # UPDATE condicional: si el pago ganó la carrera, no se cancela nada
+           if not Order.objects.filter(pk=order.pk, status=Order.Status.PENDING).update(
+               status=Order.Status.CANCELED, updated=now,
+           ):
+               messages.error(request, f"La orden #{order.id} ya no está pendiente.")
+               return redirect('orders_list')
+
+           Ticket.objects.filter(id__in=[tid for tid, *_ in tickets]).update(
+               status=ReservationStatus.CANCELED, customer=None, hold_expires_at=None, updated=now,
+           )
+           OrderTicket.objects.filter(order=order).delete()
+           refresh_order_totals([order.pk])
 
-
-       # Para cada relación OrderTicket, liberamos el ticket y borramos la línea
-       for ot in list(order.order_tickets.all()):
-           ticket = ot.ticket
-           # 1) Marcamos el ticket como cancelado y lo desvinculamos del cliente
-           ticket.status = ReservationStatus.CANCELED
-           ticket.customer = None
-           ticket.save()
-           # 2) Eliminamos la asociación con la orden
-           ot.delete()
-
-
-       # Finalmente marcamos la orden como cancelada
-       order.status = Order.Status.CANCELED
-       order.save()
+           changes = defaultdict(list)
+           for _, showtime_id, row, col in tickets:
+               changes[showtime_id].append((row, col, SeatState.FREE))
+           for showtime_id, cells in changes.items():
+               seatmap.apply(showtime_id, cells)
 
 
        messages.success(
@@ -509,3 +637,34 @@ class CancelOrderView(LoginRequiredMixin, View):
            f"Orden #{order.id} cancelada y asientos liberados correctamente."
        )
        return redirect('orders_list')
+
+
+# Métricas por vista (consultas, tiempo en base/plantillas, latencias); sólo local o staff
+from .profiling import registry
+
+
+class MetricsView(View):
+   def get(self, request):
+       local = request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+       if not (local or request.user.is_staff):
+           raise Http404
+       if request.GET.get('reset'):
+           registry.reset()
+       return JsonResponse(registry.snapshot())
+
+
+# Reportes de ventas (tablas resumen de cinema.reporting); sólo staff
+from datetime import timedelta
+from django.utils.dateparse import parse_date
+
+
+class ReportsView(View):
+   def get(self, request):
+       if not request.user.is_staff:
+           raise Http404
+       try:
+           end = parse_date(request.GET.get('hasta', '')) or timezone.localdate()
+           start = parse_date(request.GET.get('desde', '')) or end - timedelta(days=29)
+       except ValueError:
+           return JsonResponse({'error': 'Fechas inválidas (AAAA-MM-DD).'}, status=400)
+       return JsonResponse(reporting.summary(start, end))